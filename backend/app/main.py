@@ -1,36 +1,138 @@
 import os
+import asyncio
+import json
 import logging
-import re
+import tempfile
+import time
 from pathlib import Path
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Literal, Optional
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
 import httpx
 import jwt
-from jwt import PyJWKClient
 
 from .services.openai_service import (
-    generate_latex_via_openai,
-    edit_latex_via_openai,
-    generate_latex_from_linkedin_html,
+    PromptTooLarge,
+    generate_latex_with_report,
+    generate_cv_data_via_openai,
+    edit_latex_with_report,
+    generate_latex_from_linkedin_profile,
+    stream_generate_latex_via_openai,
+    stream_edit_latex_via_openai,
+    stream_latex_from_linkedin_profile,
+    LatexStreamExtractor,
+    llm_cache,
+    llm_flight,
+    usage_totals,
 )
-from .services.latex_service import compile_latex_to_pdf
+from .services.cv_render import LayoutError, render_cv
+from .services.fragment_render import FragmentRenderUnsupported, create_fragment_renderer
+from .services.linkedin_extract import ProfileTextExtractor
+from .services.latex_source import analyze_source
+from .services.latex_service import (
+    INLINE_PDF_MAX_BYTES,
+    CompileResult,
+    CompileTimeout,
+    available_engines,
+    compile_latex,
+    pdf_optimizer,
+    release_workdir,
+    select_engine,
+    workspace_pool,
+)
+from .services import http_clients, metrics
+from .services.auth_cache import AuthStats, JWKSCache, TokenCache
+from .services.batch_service import BatchJob, create_batch_store, run_batch, zip_stream
+from .services.job_queue import JobQueue, TERMINAL_STATUSES, create_job_queue
+from .services.compile_pool import CompileQueueFull, create_compile_pool
+from .services.preview_service import (
+    MEDIA_TYPES,
+    clamp_dpi,
+    compile_preview,
+    create_preview_cache,
+    etag_matches,
+    preview_cache_key,
+    preview_format,
+    rasterize_first_page,
+)
+from .services.render_cache import CachedPdf, create_render_cache, render_cache_key
+from .services.settings import env_float, env_int
+from .services.single_flight import SingleFlight
+from .services.template_registry import DEFAULT_TEMPLATE_ID, TemplateRegistry
 
 
 # --------------------------- Models ---------------------------
 
 
+class CVContact(BaseModel):
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    location: Optional[str] = None
+    linkedin: Optional[str] = None
+    github: Optional[str] = None
+    website: Optional[str] = None
+
+
+class CVEntry(BaseModel):
+    # Station in Ausbildung oder Beruf
+    title: str
+    organization: str = ""
+    location: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    highlights: list[str] = []
+
+
+class CVProject(BaseModel):
+    name: str
+    technologies: list[str] = []
+    highlights: list[str] = []
+
+
+class CVSkillGroup(BaseModel):
+    category: str
+    skills: list[str] = []
+
+
+class CVData(BaseModel):
+    """Structured CV as produced in `structured` mode; rendered locally into a template layout."""
+
+    name: str
+    headline: Optional[str] = None
+    contact: CVContact = CVContact()
+    education: list[CVEntry] = []
+    experience: list[CVEntry] = []
+    projects: list[CVProject] = []
+    skills: list[CVSkillGroup] = []
+    languages: list[str] = []
+
+
+CV_DATA_SCHEMA = CVData.model_json_schema()
+
+
 class GenerateRequest(BaseModel):
     input_text: str
     template_override: Optional[str] = None
     template_id: Optional[str] = None
+    # "structured": Modell liefert CVData als JSON, LaTeX wird lokal aus dem Layout der Vorlage erzeugt
+    mode: Literal["latex", "structured"] = "latex"
 
 
 class GenerateResponse(BaseModel):
     latex: str
+    # Modus, Token-Verbrauch (inkl. gecachter Prompt-Tokens) und Latenz (bei /api/generate und /api/edit)
+    report: Optional[dict] = None
+    # Strukturierte Daten (nur im Modus "structured"); mit /api/template/apply in andere Vorlagen übertragbar
+    data: Optional[CVData] = None
+
+
+class TemplateApplyRequest(BaseModel):
+    data: CVData
+    template_id: Optional[str] = None
 
 
 class TemplateUpdateRequest(BaseModel):
@@ -39,11 +141,29 @@ class TemplateUpdateRequest(BaseModel):
 
 class RenderRequest(BaseModel):
     latex: str
+    # "incremental": Abschnitte einzeln kompilieren und cachen, nur als Vorschau (Fallback auf "full")
+    mode: Literal["full", "incremental"] = "full"
+
+
+class PreviewRequest(BaseModel):
+    latex: str
+    # Ohne Angabe PREVIEW_DPI; begrenzt auf 36..PREVIEW_MAX_DPI
+    dpi: Optional[int] = None
+    # "webp" nur mit installiertem Pillow, sonst PNG
+    format: Literal["png", "webp"] = "png"
 
 
 class EditRequest(BaseModel):
     latex: str
     instruction: str
+    # "patch": Modell liefert nur geänderte Abschnitte (Fallback auf "full")
+    mode: Literal["full", "patch"] = "full"
+
+
+class BatchGenerateRequest(BaseModel):
+    items: list[GenerateRequest]
+    # "zip": gestreamtes ZIP mit PDFs; "job": sofort Batch-ID zurückgeben und Status abfragen
+    output: Literal["zip", "job"] = "zip"
 
 
 class LinkedInImportRequest(BaseModel):
@@ -59,85 +179,75 @@ def get_template_dir() -> Path:
     return Path(os.getenv("TEMPLATE_DIR", "/app/templates")).resolve()
 
 
-def get_default_template_path() -> Path:
-    tmpl_dir = get_template_dir()
-    tmpl_dir.mkdir(parents=True, exist_ok=True)
-    return tmpl_dir / "cv_template.tex"
+template_registry = TemplateRegistry(
+    template_dir=get_template_dir(),
+    packaged_dir=Path(__file__).parent / "templates",
+    refresh_interval=env_float("TEMPLATE_REFRESH_INTERVAL", 1.0),
+)
 
 
 def read_template() -> str:
-    path = get_default_template_path()
-    if not path.exists():
-        # Fallback zu paketierter Default-Datei
-        packaged = Path(__file__).parent / "templates" / "cv_template.tex"
-        if packaged.exists():
-            return packaged.read_text(encoding="utf-8")
-        raise FileNotFoundError("No LaTeX template found.")
-    return path.read_text(encoding="utf-8")
+    return template_registry.default()
 
 
 def write_template(content: str) -> None:
-    path = get_default_template_path()
-    path.write_text(content, encoding="utf-8")
+    template_registry.write(DEFAULT_TEMPLATE_ID, content)
 
 
 def strip_code_fences(text: str) -> str:
     # Entferne ```latex ... ``` oder ``` ... ```-Blöcke
-    code_block = re.search(r"```(?:latex)?\n([\s\S]*?)```", text, re.IGNORECASE)
-    if code_block:
-        return code_block.group(1).strip()
-    return text.strip()
+    return analyze_source(text).stripped
 
 
 def read_template_by_id(template_id: str) -> str:
     """Read a template by its id (= filename stem)."""
-    tmpl_dir = get_template_dir()
-    safe_id = re.sub(r"[^a-zA-Z0-9_\-]", "", template_id or "").strip()
-    if not safe_id:
-        raise FileNotFoundError("Invalid template id")
-    candidate = tmpl_dir / f"{safe_id}.tex"
-    if candidate.exists():
-        return candidate.read_text(encoding="utf-8")
-    packaged = Path(__file__).parent / "templates" / f"{safe_id}.tex"
-    if packaged.exists():
-        return packaged.read_text(encoding="utf-8")
-    raise FileNotFoundError(f"Template not found: {safe_id}")
+    return template_registry.get(template_id)
 
 
 def list_templates() -> list[dict]:
     """List available templates from TEMPLATE_DIR and packaged defaults."""
-    tmpl_dir = get_template_dir()
-    items = []
-    seen = set()
-    if tmpl_dir.exists():
-        for p in sorted(tmpl_dir.glob("*.tex")):
-            items.append({
-                "id": p.stem,
-                "name": p.stem.replace("_", " ").title(),
-                "source": "custom",
-            })
-            seen.add(p.stem)
-    packaged_dir = Path(__file__).parent / "templates"
-    if packaged_dir.exists():
-        for p in sorted(packaged_dir.glob("*.tex")):
-            if p.stem in seen:
-                continue
-            items.append({
-                "id": p.stem,
-                "name": p.stem.replace("_", " ").title(),
-                "source": "builtin",
-            })
-    if not items:
-        # Ensure at least default is shown by id
-        items.append({"id": "cv_template", "name": "Cv Template", "source": "implicit"})
-    return items
+    return template_registry.list()
 
 
 # --------------------------- App & Logging ---------------------------
 
-app = FastAPI(title="CV Generator API")
+# Muss unter gunicorns graceful_timeout liegen, sonst wird der Worker vorher beendet
+SHUTDOWN_DRAIN_TIMEOUT = env_float("SHUTDOWN_DRAIN_TIMEOUT", 25.0)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Gemeinsame HTTP-/OpenAI-Clients für die gesamte App-Laufzeit (Keep-Alive, Pooling)
+    await http_clients.startup()
+    if jwks_cache is not None:
+        await jwks_cache.start()
+    # Engine-Suche einmal beim Start statt shutil.which pro Request
+    logger.info("LaTeX engines: %s", ", ".join(available_engines()) or "none")
+    try:
+        yield
+    finally:
+        # Graceful Shutdown: laufende Batches und verwaiste Kompilierungen noch abschließen
+        deadline = time.monotonic() + SHUTDOWN_DRAIN_TIMEOUT
+        drained = await batch_store.drain(SHUTDOWN_DRAIN_TIMEOUT)
+        drained = await compile_pool.drain(max(0.0, deadline - time.monotonic())) and drained
+        if not drained:
+            logger.warning("Shutdown drain timed out after %.0fs", SHUTDOWN_DRAIN_TIMEOUT)
+        if jwks_cache is not None:
+            await jwks_cache.stop()
+        await http_clients.shutdown()
+
+
+app = FastAPI(title="CV Generator API", lifespan=lifespan)
 logger = logging.getLogger(__name__)
 
+render_cache = create_render_cache()
+render_flight = SingleFlight("render")
+preview_cache = create_preview_cache()
+preview_flight = SingleFlight("preview")
+fragment_renderer = create_fragment_renderer()
+compile_pool = create_compile_pool()
+batch_store = create_batch_store()
+
 
 # --------------------------- Error mapping ---------------------------
 
@@ -166,6 +276,22 @@ async def http_exc_handler(request: Request, exc: HTTPException):
     return JSONResponse(status_code=mapped, content={"detail": detail})
 
 
+@app.exception_handler(CompileQueueFull)
+async def compile_queue_full_handler(request: Request, exc: CompileQueueFull):
+    logger.warning("Compile queue full, rejecting %s", request.url.path)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(PromptTooLarge)
+async def prompt_too_large_handler(request: Request, exc: PromptTooLarge):
+    logger.info("Rejecting %s: %s prompt tokens > %s", request.url.path, exc.tokens, exc.budget)
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+
 # --------------------------- CORS ---------------------------
 # (Passe Origins/Methoden/Headers nach Bedarf an)
 app.add_middleware(
@@ -183,8 +309,17 @@ AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")  # z.B. your-tenant.eu.auth0.com
 AUTH0_AUDIENCE = os.getenv("AUTH0_AUDIENCE")  # z.B. https://api.example.com
 AUTH0_ISSUER = f"https://{AUTH0_DOMAIN}/" if AUTH0_DOMAIN else None
 
-_JWKS_URL = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json" if AUTH0_DOMAIN else None
-_JWKS = PyJWKClient(_JWKS_URL) if _JWKS_URL else None
+_JWKS_URL = os.getenv("AUTH0_JWKS_URL") or (
+    f"https://{AUTH0_DOMAIN}/.well-known/jwks.json" if AUTH0_DOMAIN else None
+)
+# JWKS wird beim Start vorab geladen und im Hintergrund aktualisiert (kein Sync-Fetch im Request)
+jwks_cache = (
+    JWKSCache(_JWKS_URL, refresh_interval=env_float("AUTH0_JWKS_REFRESH_INTERVAL", 3600.0))
+    if _JWKS_URL
+    else None
+)
+token_cache = TokenCache(max_entries=env_int("AUTH_TOKEN_CACHE_SIZE", 1024))
+auth_stats = AuthStats()
 
 
 def _unauth(detail: str = "Unauthorized", code: int = 401):
@@ -193,12 +328,12 @@ def _unauth(detail: str = "Unauthorized", code: int = 401):
 
 @app.middleware("http")
 async def auth_middleware(request: Request, call_next):
-    # Schütze alle /api/* außer /api/health
+    # Schütze alle /api/* außer /api/health und /api/metrics (eigenes Token, s.u.)
     path = request.url.path
-    if not (path.startswith("/api/") and path != "/api/health"):
+    if not (path.startswith("/api/") and path not in ("/api/health", "/api/metrics")):
         return await call_next(request)
 
-    if not AUTH0_DOMAIN or not AUTH0_AUDIENCE or not AUTH0_ISSUER or not _JWKS:
+    if not AUTH0_DOMAIN or not AUTH0_AUDIENCE or not AUTH0_ISSUER or not jwks_cache:
         return _unauth("Auth not configured", 500)
 
     auth = request.headers.get("Authorization", "")
@@ -206,29 +341,62 @@ async def auth_middleware(request: Request, call_next):
         return _unauth("Missing bearer token")
 
     token = auth.split(" ", 1)[1].strip()
-    try:
-        signing_key = _JWKS.get_signing_key_from_jwt(token).key
-        claims = jwt.decode(
-            token,
-            signing_key,
-            algorithms=["RS256"],
-            audience=AUTH0_AUDIENCE,
-            issuer=AUTH0_ISSUER,
-            options={"leeway": 10},  # kleine Clock-Skew-Toleranz
-        )
-        request.state.user = claims
-    except jwt.ExpiredSignatureError:
-        return _unauth("Token expired")
-    except jwt.InvalidAudienceError:
-        return _unauth("Invalid audience")
-    except jwt.InvalidIssuerError:
-        return _unauth("Invalid issuer")
-    except Exception:
-        return _unauth("Token validation failed")
+    started = time.perf_counter()
+    claims = token_cache.get(token)
+    cached = claims is not None
+    if claims is None:
+        try:
+            signing_key = await jwks_cache.get_signing_key(token)
+            claims = jwt.decode(
+                token,
+                signing_key,
+                algorithms=["RS256"],
+                audience=AUTH0_AUDIENCE,
+                issuer=AUTH0_ISSUER,
+                options={"leeway": 10},  # kleine Clock-Skew-Toleranz
+            )
+        except jwt.ExpiredSignatureError:
+            auth_stats.record(time.perf_counter() - started, cached, ok=False)
+            return _unauth("Token expired")
+        except jwt.InvalidAudienceError:
+            auth_stats.record(time.perf_counter() - started, cached, ok=False)
+            return _unauth("Invalid audience")
+        except jwt.InvalidIssuerError:
+            auth_stats.record(time.perf_counter() - started, cached, ok=False)
+            return _unauth("Invalid issuer")
+        except Exception:
+            auth_stats.record(time.perf_counter() - started, cached, ok=False)
+            return _unauth("Token validation failed")
+        token_cache.put(token, claims)
+    auth_stats.record(time.perf_counter() - started, cached)
+    metrics.record_span("auth", time.perf_counter() - started)
+    request.state.user = claims
 
     return await call_next(request)
 
 
+async def metrics_middleware(request: Request, call_next):
+    # Nur registriert, wenn METRICS_ENABLED gesetzt ist
+    timings = metrics.start_request_timings()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    label = getattr(route, "path", "unmatched")
+    metrics.request_seconds.observe(elapsed, label, response.status_code)
+    length = response.headers.get("content-length")
+    if length is not None:
+        metrics.response_bytes.observe(int(length), label)
+    timings.append(("total", elapsed))
+    response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+    return response
+
+
+if metrics.ENABLED:
+    # Außen um die Auth-Middleware, damit deren Span mitgezählt wird
+    app.middleware("http")(metrics_middleware)
+
+
 # Optional: Scopes-Helfer, falls du Berechtigungen pro Route prüfen möchtest
 # from fastapi import HTTPException as _HTTPExc
 # def require_scopes(request: Request, *required: str):
@@ -246,6 +414,39 @@ def health():
     return {"status": "ok"}
 
 
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+@app.get("/api/metrics")
+def get_metrics(request: Request):
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled (METRICS_ENABLED=0).")
+    if METRICS_TOKEN and request.headers.get("Authorization", "") != f"Bearer {METRICS_TOKEN}":
+        return _unauth()
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/stats")
+def stats():
+    return {
+        "render_cache": render_cache.stats(),
+        "preview_cache": preview_cache.stats(),
+        "fragments": fragment_renderer.stats(),
+        "compile_pool": compile_pool.stats(),
+        "workspaces": workspace_pool.stats(),
+        "pdf_optimize": pdf_optimizer.stats(),
+        "llm_cache": llm_cache.stats(),
+        "prompt_usage": usage_totals.stats(),
+        "coalescing": {
+            "render": render_flight.stats(),
+            "preview": preview_flight.stats(),
+            "openai": llm_flight.stats(),
+        },
+        "templates": template_registry.stats(),
+        "auth": {**auth_stats.to_dict(), "cached_tokens": len(token_cache)},
+    }
+
+
 @app.get("/api/templates")
 def get_templates():
     return {"templates": list_templates()}
@@ -268,83 +469,604 @@ def update_template(req: TemplateUpdateRequest):
     return {"status": "updated"}
 
 
-@app.post("/api/generate", response_model=GenerateResponse)
-def generate(req: GenerateRequest):
-    if req.template_override:
-        template = req.template_override
-    elif req.template_id:
+@app.post("/api/template/apply", response_model=GenerateResponse)
+def apply_template(req: TemplateApplyRequest):
+    # Vorlagenwechsel für vorhandene strukturierte Daten: rein lokal, ohne LLM-Aufruf
+    try:
+        template, layout = template_registry.layout(req.template_id or DEFAULT_TEMPLATE_ID)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    try:
+        latex = render_cv_data(req.data, template, layout)
+    except LayoutError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return GenerateResponse(latex=latex, data=req.data)
+
+
+def resolve_template(template_override: Optional[str], template_id: Optional[str]) -> str:
+    if template_override:
+        return template_override
+    if template_id:
         try:
-            template = read_template_by_id(req.template_id)
+            return read_template_by_id(template_id)
         except FileNotFoundError as e:
             raise HTTPException(status_code=404, detail=str(e))
-    else:
-        template = read_template()
+    return read_template()
+
+
+def resolve_generation(req: GenerateRequest) -> tuple[str, Optional[str]]:
+    """Template source and, in structured mode, its layout (404 if the template has none)."""
+    if req.mode != "structured":
+        return resolve_template(req.template_override, req.template_id), None
+    if req.template_override:
+        raise HTTPException(
+            status_code=400, detail="Structured mode needs a template with a layout, not template_override."
+        )
+    try:
+        return template_registry.layout(req.template_id or DEFAULT_TEMPLATE_ID)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+def render_cv_data(data: CVData, template: str, layout: str) -> str:
+    return render_cv(data.model_dump(), template, layout)
+
+
+async def generate_cv(
+    input_text: str, template: str, layout: Optional[str] = None
+) -> tuple[str, Optional[CVData], dict]:
+    """
+    Generates LaTeX for the notes. With a layout the model only returns CVData as JSON,
+    which is validated and rendered into the template locally. Returns (latex, data, usage).
+    """
+    if layout is None:
+        latex, usage = await generate_latex_with_report(input_text=input_text, template=template)
+        return latex, None, usage
+    raw, usage = await generate_cv_data_via_openai(input_text, CV_DATA_SCHEMA)
+    try:
+        data = CVData.model_validate(raw)
+    except ValidationError as e:
+        raise ValueError(f"Model returned invalid CV data: {e.error_count()} validation errors")
+    return render_cv_data(data, template, layout), data, usage
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_latex_stream(tokens: AsyncIterator[str], error_prefix: str) -> StreamingResponse:
+    """
+    Wraps a token stream from the OpenAI service as Server-Sent Events.
+    Only LaTeX is forwarded (`latex` events); a `meta` event reports the
+    time to the first LaTeX byte and `done` carries the complete document.
+    """
+
+    async def events() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        extractor = LatexStreamExtractor()
+        first_latex_ms = None
+        parts = []
+        try:
+            async for token in tokens:
+                delta = extractor.feed(token)
+                if not delta:
+                    continue
+                if first_latex_ms is None:
+                    first_latex_ms = round((time.perf_counter() - started) * 1000)
+                    yield _sse("meta", {"time_to_first_latex_ms": first_latex_ms})
+                parts.append(delta)
+                yield _sse("latex", {"delta": delta})
+            tail = extractor.finish()
+            if tail:
+                if first_latex_ms is None:
+                    first_latex_ms = round((time.perf_counter() - started) * 1000)
+                    yield _sse("meta", {"time_to_first_latex_ms": first_latex_ms})
+                parts.append(tail)
+                yield _sse("latex", {"delta": tail})
+        except Exception as e:
+            logger.warning("Streaming failed: %s", e)
+            yield _sse("error", {"detail": f"{error_prefix}: {e}"})
+            return
+        total_ms = round((time.perf_counter() - started) * 1000)
+        logger.info("Stream finished: first_latex_ms=%s total_ms=%s", first_latex_ms, total_ms)
+        yield _sse(
+            "done",
+            {
+                "latex": strip_code_fences("".join(parts)),
+                "time_to_first_latex_ms": first_latex_ms,
+                "total_ms": total_ms,
+            },
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # nginx soll SSE nicht puffern
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/generate", response_model=GenerateResponse)
+async def generate(req: GenerateRequest):
+    template, layout = resolve_generation(req)
     try:
-        latex = generate_latex_via_openai(input_text=req.input_text, template=template)
+        latex, data, usage = await generate_cv(req.input_text, template, layout)
+    except PromptTooLarge:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OpenAI generation failed: {e}")
-    latex = strip_code_fences(latex)
-    return GenerateResponse(latex=latex)
+    return GenerateResponse(latex=latex, report=usage, data=data)
+
+
+def _compile_headers(result: CompileResult) -> dict:
+    headers = {
+        "X-Latex-Engine": result.engine,
+        "X-Latex-Passes": str(result.passes),
+        "X-Latex-Pass-Durations-Ms": ",".join(
+            f"{d * 1000:.0f}" for d in result.pass_durations
+        ),
+    }
+    if result.optimized is not None:
+        headers.update(result.optimized.headers())
+    return headers
+
+
+def _iter_file(fh, chunk_size: int = 64 * 1024):
+    with fh:
+        while chunk := fh.read(chunk_size):
+            yield chunk
+
+
+def _cached_file_response(
+    entry: CachedPdf, media_type: str, headers: dict, filename: Optional[str] = None
+) -> Response:
+    """
+    Streams a cache entry from an already open file descriptor. FileResponse opens the
+    path only when sending; an eviction by another worker could unlink it before that.
+    """
+    # Gepinnte HIT-Einträge gehören dem Aufrufer; geteilte MISS-Einträge bekommen je Antwort einen eigenen Deskriptor
+    fh, entry.file = entry.file, None
+    fh = fh or open(entry.path, "rb")
+    headers = {**headers, "Content-Length": str(os.fstat(fh.fileno()).st_size)}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return StreamingResponse(_iter_file(fh), media_type=media_type, headers=headers)
+
+
+def _pdf_response(
+    entry: CachedPdf, cache_status: str, extra_headers: Optional[dict] = None, filename: str = "cv.pdf"
+) -> Response:
+    headers = {"X-Render-Cache": cache_status, **(extra_headers or {})}
+    if entry.data is not None:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return Response(content=entry.data, media_type="application/pdf", headers=headers)
+    if cache_status != "BYPASS":
+        return _cached_file_response(entry, "application/pdf", headers, filename)
+    # Eigenes Arbeitsverzeichnis: räumt niemand sonst, FileResponse genügt
+    return FileResponse(
+        path=entry.path, media_type="application/pdf", filename=filename, headers=headers
+    )
+
+
+async def _compile_incremental(
+    latex: str, engine: str, inline_max_bytes: int = 0
+) -> tuple[CompileResult, dict]:
+    """Section-level render; falls back to a full compile if the document does not qualify."""
+    try:
+        result, info = await compile_pool.submit(fragment_renderer.render, latex, engine)
+        return result, {
+            "X-Render-Mode": "incremental-preview",
+            "X-Fragments": str(info["fragments"]),
+            "X-Fragments-Reused": str(info["fragments_reused"]),
+        }
+    except (CompileQueueFull, CompileTimeout):
+        raise
+    except FragmentRenderUnsupported as e:
+        logger.info("Incremental render not possible: %s", e)
+    except RuntimeError as e:
+        # Fragmentfehler sagen nichts über das Gesamtdokument -> komplett kompilieren
+        logger.info("Incremental render failed, compiling in full: %s", e)
+    fragment_renderer.fallbacks += 1
+    result = await compile_pool.submit(
+        compile_latex, latex, engine=engine, inline_max_bytes=inline_max_bytes
+    )
+    return result, {"X-Render-Mode": "full"}
+
+
+def _render_key(latex: str, mode: str, engine: str) -> str:
+    # Inkrementell zusammengesetzte PDFs sind nur Vorschau -> eigener, als solcher erkennbarer Key;
+    # optimierte Vollbuilds ebenso, damit Umschalten von PDF_OPTIMIZE keine alten PDFs liefert
+    variant = f"{engine}:{mode}-preview" if mode != "full" else (
+        f"{engine}:optimized" if pdf_optimizer.enabled else engine
+    )
+    return render_cache_key(latex, variant)
+
+
+async def compile_cached(
+    latex: str, mode: str = "full", engine: Optional[str] = None
+) -> tuple[CachedPdf, str, dict]:
+    """
+    Compile LaTeX through the compile pool, or take it from the render cache.
+    Concurrent calls for the same document wait for one compile and share its result.
+    Returns (entry, cache status, compile headers). With status BYPASS and a file entry the
+    caller owns entry.path and releases it with release_workdir() once the PDF is sent.
+    """
+    engine = engine or select_engine(latex)
+    key = _render_key(latex, mode, engine)
+    cached = render_cache.get(key)
+    # Sofort öffnen: zwischen Lookup und Senden kann ein anderer Worker den Eintrag räumen
+    if cached is not None and cached.pin():
+        return cached, "HIT", {}
+    # Gleiches Dokument wird schon kompiliert (erneuter Klick, zweiter Tab) -> mitwarten
+    return await render_flight.do(
+        key, lambda: _compile_into_cache(latex, key, mode, engine), share=_share_compiled
+    )
+
+
+async def _compile_into_cache(
+    latex: str, key: str, mode: str, engine: str
+) -> tuple[CachedPdf, str, dict]:
+    # Ohne Render-Cache kleine PDFs gleich als Bytes übernehmen
+    inline_max_bytes = 0 if render_cache.enabled else INLINE_PDF_MAX_BYTES
+    if mode == "incremental":
+        result, mode_headers = await _compile_incremental(latex, engine, inline_max_bytes)
+    else:
+        result = await compile_pool.submit(
+            compile_latex,
+            latex,
+            engine=engine,
+            inline_max_bytes=inline_max_bytes,
+            optimize=pdf_optimizer.enabled,
+        )
+        mode_headers = {}
+    compile_headers = {**_compile_headers(result), **mode_headers}
+    if result.data is not None:
+        return CachedPdf(key, data=result.data), "BYPASS", compile_headers
+    try:
+        entry = render_cache.put(key, Path(result.pdf_path))
+    except BaseException:
+        result.cleanup()
+        raise
+    if entry is not None:
+        # PDF ist in den Cache verschoben; Rest des Arbeitsverzeichnisses abseits des Requests löschen
+        asyncio.get_running_loop().run_in_executor(None, result.cleanup)
+        return entry, "MISS", compile_headers
+    return CachedPdf(key, path=Path(result.pdf_path)), "BYPASS", compile_headers
+
+
+async def _share_compiled(compiled: tuple[CachedPdf, str, dict]) -> tuple[CachedPdf, str, dict]:
+    # Ein PDF im Arbeitsverzeichnis gehört genau einem Aufrufer -> für mehrere als Bytes übergeben
+    entry, cache_status, compile_headers = compiled
+    if entry.path is None or cache_status != "BYPASS":
+        return compiled
+    loop = asyncio.get_running_loop()
+    try:
+        data = await loop.run_in_executor(None, entry.path.read_bytes)
+    finally:
+        loop.run_in_executor(None, release_workdir, entry.path)
+    return CachedPdf(entry.key, data=data), cache_status, compile_headers
+
+
+async def render_latex_cached(
+    latex: str, background: BackgroundTasks, mode: str = "full", engine: Optional[str] = None
+) -> Response:
+    """Compile LaTeX (or serve it from the render cache) and build the PDF response."""
+    entry, cache_status, compile_headers = await compile_cached(latex, mode, engine)
+    if cache_status == "BYPASS" and entry.path is not None:
+        # Direkt aus dem Arbeitsverzeichnis streamen; aufräumen, wenn die Antwort raus ist
+        background.add_task(release_workdir, entry.path)
+    if mode == "incremental":
+        # Auch bei Cache-Treffern (ohne Compile-Header) als Vorschau kennzeichnen
+        compile_headers = {**compile_headers, "X-Render-Preview": "1"}
+        return _pdf_response(entry, cache_status, compile_headers, filename="cv-preview.pdf")
+    # Cache-Treffer werden direkt aus dem Cache gestreamt, ohne Temp-Kopie
+    return _pdf_response(entry, cache_status, compile_headers)
 
 
 @app.post("/api/render")
-def render_pdf(req: RenderRequest, background: BackgroundTasks):
-    latex = strip_code_fences(req.latex)
+async def render_pdf(req: RenderRequest, background: BackgroundTasks):
+    # Ein Scan liefert LaTeX ohne Fences und die Engine-Anforderungen
+    analysis = analyze_source(req.latex)
     try:
-        pdf_path = compile_latex_to_pdf(latex)
+        return await render_latex_cached(
+            analysis.stripped, background, req.mode, select_engine(analysis)
+        )
+    except CompileQueueFull:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LaTeX compilation failed: {e}")
-    filename = "cv.pdf"
-    background.add_task(Path(pdf_path).unlink, missing_ok=True)
-    return FileResponse(path=pdf_path, media_type="application/pdf", filename=filename)
 
 
-@app.post("/api/generate-pdf")
-def generate_and_render(req: GenerateRequest, background: BackgroundTasks):
-    if req.template_override:
-        template = req.template_override
-    elif req.template_id:
+async def _preview_into_cache(
+    latex: str, engine: str, key: str, dpi: int, fmt: str
+) -> tuple[CachedPdf, str]:
+    # Liegt das vollständige PDF schon im Render-Cache, nur noch Seite 1 rastern
+    pdf = render_cache.get(_render_key(latex, "full", engine))
+    with tempfile.TemporaryDirectory(prefix="cv-preview-") as tmpdir:
+        out_dir = Path(tmpdir)
+        if pdf is not None and pdf.pin():
+            # Eigene Kopie rastern: der Cache-Eintrag kann währenddessen geräumt werden
+            pdf_path = out_dir / "cached.pdf"
+            pdf_path.write_bytes(pdf.read_bytes())
+            image = await compile_pool.submit(rasterize_first_page, pdf_path, out_dir, dpi, fmt)
+            source = "render-cache"
+        else:
+            image = await compile_pool.submit(compile_preview, latex, engine, dpi, fmt, out_dir)
+            source = "draft"
+        entry = preview_cache.put(key, image)
+        if entry is None:
+            entry = CachedPdf(key, data=image.read_bytes())
+    return entry, source
+
+
+@app.post("/api/render/preview")
+async def render_preview(req: PreviewRequest, request: Request):
+    """
+    PNG/WebP of page 1 for interactive editing. The ETag is derived from the request alone,
+    so a client sending it back in If-None-Match gets a 304 without any compile.
+    """
+    analysis = analyze_source(req.latex)
+    fmt = preview_format(req.format)
+    dpi = clamp_dpi(req.dpi)
+    try:
+        engine = select_engine(analysis)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"LaTeX compilation failed: {e}")
+    key = preview_cache_key(analysis.stripped, engine, dpi, fmt)
+    headers = {"ETag": f'"{key[:32]}"', "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    entry = preview_cache.get(key)
+    headers.update({"X-Preview-Cache": "HIT", "X-Preview-Dpi": str(dpi)})
+    if entry is None or not entry.pin():
         try:
-            template = read_template_by_id(req.template_id)
-        except FileNotFoundError as e:
-            raise HTTPException(status_code=404, detail=str(e))
-    else:
-        template = read_template()
+            entry, source = await preview_flight.do(
+                key, lambda: _preview_into_cache(analysis.stripped, engine, key, dpi, fmt)
+            )
+        except CompileQueueFull:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Preview rendering failed: {e}")
+        headers.update({"X-Preview-Cache": "MISS", "X-Preview-Source": source})
+    if entry.data is not None:
+        return Response(content=entry.data, media_type=MEDIA_TYPES[fmt], headers=headers)
+    return _cached_file_response(entry, MEDIA_TYPES[fmt], headers)
+
+
+@app.post("/api/generate-pdf")
+async def generate_and_render(req: GenerateRequest, background: BackgroundTasks):
+    template, layout = resolve_generation(req)
     try:
-        latex = generate_latex_via_openai(input_text=req.input_text, template=template)
-        latex = strip_code_fences(latex)
-        pdf_path = compile_latex_to_pdf(latex)
+        latex, _, _ = await generate_cv(req.input_text, template, layout)
+        return await render_latex_cached(latex, background)
+    except (CompileQueueFull, PromptTooLarge):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Generation or compilation failed: {e}"
         )
-    background.add_task(Path(pdf_path).unlink, missing_ok=True)
+
+
+# --------------------------- Batch ---------------------------
+
+BATCH_MAX_ITEMS = env_int("BATCH_MAX_ITEMS", 50)
+BATCH_MAX_CONCURRENCY = env_int("BATCH_MAX_CONCURRENCY", 4)
+_batch_llm_slots = asyncio.Semaphore(max(1, BATCH_MAX_CONCURRENCY))
+
+
+async def _generate_batch_item(index: int, item: GenerateRequest) -> bytes:
+    template, layout = resolve_generation(item)
+    # Nur die LLM-Aufrufe begrenzen; fertiges LaTeX geht direkt in den Compile-Pool
+    async with _batch_llm_slots:
+        latex, _, _ = await generate_cv(item.input_text, template, layout)
+    while True:
+        try:
+            entry, cache_status, _ = await compile_cached(latex)
+            break
+        except CompileQueueFull as e:
+            # Im Batch nicht abweisen, sondern auf einen freien Slot warten
+            await asyncio.sleep(e.retry_after)
+    try:
+        return entry.read_bytes()
+    finally:
+        if cache_status == "BYPASS":
+            release_workdir(entry.path)
+
+
+def _job_owner(request: Request) -> Optional[str]:
+    user = getattr(request.state, "user", None) or {}
+    return user.get("sub")
+
+
+@app.post("/api/batch/generate-pdf")
+async def batch_generate_pdf(req: BatchGenerateRequest, request: Request):
+    if not req.items:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one item.")
+    if len(req.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400, detail=f"Batch too large (max {BATCH_MAX_ITEMS} items)."
+        )
+    if req.output == "job":
+        job = batch_store.start(req.items, _generate_batch_item, owner=_job_owner(request))
+        return {"batch_id": job.id, "status_url": f"/api/batch/{job.id}"}
+    return StreamingResponse(
+        zip_stream(run_batch(req.items, _generate_batch_item)),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="cvs.zip"'},
+    )
+
+
+def _load_batch(request: Request, batch_id: str) -> BatchJob:
+    # Fremde Batches wie nicht vorhandene behandeln (wie bei /api/jobs)
+    job = batch_store.get(batch_id)
+    if job is None or job.owner != _job_owner(request):
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    return job
+
+
+@app.get("/api/batch/{batch_id}")
+def get_batch(batch_id: str, request: Request):
+    return _load_batch(request, batch_id).to_dict()
+
+
+@app.get("/api/batch/{batch_id}/items/{index}")
+def get_batch_item(batch_id: str, index: int, request: Request):
+    job = _load_batch(request, batch_id)
+    pdf_path = job.pdf_path(index)
+    if pdf_path is None or not pdf_path.exists():
+        raise HTTPException(status_code=404, detail="PDF not available.")
+    return FileResponse(path=pdf_path, media_type="application/pdf", filename=pdf_path.name)
+
+
+# --------------------------- Jobs ---------------------------
+# Lange generate-pdf-Läufe als Job: submit -> job id -> Status pollen/streamen -> PDF abholen.
+# Abgearbeitet werden die Jobs vom separaten Worker-Prozess (python -m app.worker).
+
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = create_job_queue()
+    return _job_queue
+
+
+def _load_job(request: Request, job_id: str) -> dict:
+    job = get_job_queue().get(job_id)
+    if job is None or job["owner"] != _job_owner(request):
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+def _job_status(job: dict) -> dict:
+    status = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "attempts": job["attempts"],
+        "created": job["created"],
+        "updated": job["updated"],
+    }
+    if job["error"]:
+        status["error"] = job["error"]
+    if job["status"] == "done":
+        status["pdf_url"] = f"/api/jobs/{job['id']}/pdf"
+    return status
+
+
+@app.post("/api/jobs", status_code=202)
+def submit_job(req: GenerateRequest, request: Request):
+    if req.mode == "structured":
+        raise HTTPException(status_code=400, detail="Structured mode is not supported for jobs.")
+    # Vorlage schon beim Einreichen auflösen, damit 404 sofort zurückkommt
+    template = resolve_template(req.template_override, req.template_id)
+    job_id = get_job_queue().submit(
+        "generate-pdf",
+        {"input_text": req.input_text, "template": template},
+        owner=_job_owner(request),
+    )
+    return {"job_id": job_id, "status_url": f"/api/jobs/{job_id}"}
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str, request: Request):
+    return _job_status(_load_job(request, job_id))
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    job = await asyncio.to_thread(_load_job, request, job_id)
+
+    async def events() -> AsyncIterator[str]:
+        current = job
+        last = None
+        while True:
+            status = _job_status(current)
+            if status != last:
+                yield _sse("status", status)
+                last = status
+            if current["status"] in TERMINAL_STATUSES or await request.is_disconnected():
+                return
+            await asyncio.sleep(1.0)
+            current = await asyncio.to_thread(get_job_queue().get, job_id) or current
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/jobs/{job_id}/pdf")
+def get_job_pdf(job_id: str, request: Request):
+    job = _load_job(request, job_id)
+    if job["status"] != "done":
+        raise HTTPException(status_code=404, detail="PDF not available yet.")
+    pdf_path = Path(job["artifact"])
+    if not pdf_path.exists():
+        raise HTTPException(status_code=404, detail="PDF expired.")
     return FileResponse(path=pdf_path, media_type="application/pdf", filename="cv.pdf")
 
 
+@app.post("/api/generate/stream")
+async def generate_stream(req: GenerateRequest):
+    if req.mode == "structured":
+        raise HTTPException(status_code=400, detail="Structured mode cannot be streamed; use /api/generate.")
+    template = resolve_template(req.template_override, req.template_id)
+    tokens = stream_generate_latex_via_openai(input_text=req.input_text, template=template)
+    return sse_latex_stream(tokens, "OpenAI generation failed")
+
+
 @app.post("/api/edit", response_model=GenerateResponse)
-def edit(req: EditRequest):
+async def edit(req: EditRequest):
     if not req.latex.strip():
         raise HTTPException(status_code=400, detail="LaTeX must not be empty.")
     if not req.instruction.strip():
         raise HTTPException(status_code=400, detail="Instruction must not be empty.")
     try:
-        updated = edit_latex_via_openai(
-            current_latex=req.latex, instruction=req.instruction
+        updated, report = await edit_latex_with_report(
+            current_latex=req.latex, instruction=req.instruction, mode=req.mode
         )
+    except PromptTooLarge:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OpenAI edit failed: {e}")
-    updated = strip_code_fences(updated)
-    return GenerateResponse(latex=updated)
+    logger.info(
+        "Edit finished: mode=%s fallback=%s tokens=%s latency_ms=%s",
+        report["mode"],
+        report["fallback"],
+        report["total_tokens"],
+        report["latency_ms"],
+    )
+    return GenerateResponse(latex=updated, report=report)
+
+
+@app.post("/api/edit/stream")
+async def edit_stream(req: EditRequest):
+    if not req.latex.strip():
+        raise HTTPException(status_code=400, detail="LaTeX must not be empty.")
+    if not req.instruction.strip():
+        raise HTTPException(status_code=400, detail="Instruction must not be empty.")
+    tokens = stream_edit_latex_via_openai(current_latex=req.latex, instruction=req.instruction)
+    return sse_latex_stream(tokens, "OpenAI edit failed")
 
 
-@app.post("/api/import/linkedin", response_model=GenerateResponse)
-def import_linkedin(req: LinkedInImportRequest):
+LINKEDIN_MAX_HTML_BYTES = env_int("LINKEDIN_MAX_HTML_BYTES", 5 * 1024 * 1024)
+LINKEDIN_TEXT_MAX_CHARS = env_int("LINKEDIN_TEXT_MAX_CHARS", 40_000)
+
+
+async def fetch_linkedin_profile_text(url: str) -> str:
+    """
+    Stream the public profile page through the HTML-to-text extractor.
+    Only the compact text (JSON-LD, meta tags, visible sections) reaches the LLM.
+    """
     from http import HTTPStatus
 
-    if not req.url or not req.url.lower().startswith(("http://", "https://")):
+    if not url or not url.lower().startswith(("http://", "https://")):
         raise HTTPException(status_code=400, detail="Ungültige URL.")
-    if "linkedin.com" not in req.url.lower():
+    if "linkedin.com" not in url.lower():
         raise HTTPException(status_code=400, detail="Bitte gib eine LinkedIn-URL an.")
 
     headers = {
@@ -354,66 +1076,85 @@ def import_linkedin(req: LinkedInImportRequest):
         ),
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
     }
+    extractor = ProfileTextExtractor(max_chars=LINKEDIN_TEXT_MAX_CHARS)
+    received = 0
+    started = time.perf_counter()
     try:
-        with httpx.Client(
-            follow_redirects=True, timeout=20.0, headers=headers
-        ) as client:
-            resp = client.get(req.url)
+        async with http_clients.get_http_client().stream("GET", url, headers=headers) as resp:
+            if resp.status_code >= 400:
+                original = resp.status_code
+                try:
+                    valid_status = HTTPStatus(original).value
+                except Exception:
+                    valid_status = None
+
+                if valid_status is None:
+                    mapped = 403 if original == 999 else 502
+                else:
+                    mapped = original if original in (401, 403, 404) else 502
+
+                logger.info(
+                    "LinkedIn upstream error: status=%s mapped=%s url=%s ctype=%s",
+                    original,
+                    mapped,
+                    url,
+                    resp.headers.get("content-type", ""),
+                )
+                raise HTTPException(
+                    status_code=mapped,
+                    detail="Profil nicht abrufbar (Login erforderlich oder nicht öffentlich).",
+                )
+
+            ctype = resp.headers.get("content-type", "").lower()
+            if "text/html" not in ctype:
+                raise HTTPException(
+                    status_code=400, detail="Unerwarteter Inhaltstyp. Erwartet HTML."
+                )
+
+            # Während des Downloads parsen; abbrechen, sobald genug Text vorliegt
+            async for chunk in resp.aiter_text():
+                received += len(chunk)
+                extractor.feed(chunk)
+                if extractor.truncated or received >= LINKEDIN_MAX_HTML_BYTES:
+                    break
     except httpx.HTTPError as e:
         logger.warning("LinkedIn fetch failed: %s", e)
         raise HTTPException(status_code=502, detail=f"Konnte Profil nicht laden: {e}")
 
-    if resp.status_code >= 400:
-        original = resp.status_code
-        try:
-            valid_status = HTTPStatus(original).value
-        except Exception:
-            valid_status = None
-
-        if valid_status is None:
-            mapped = 403 if original == 999 else 502
-        else:
-            mapped = original if original in (401, 403, 404) else 502
-
-        logger.info(
-            "LinkedIn upstream error: status=%s mapped=%s url=%s ctype=%s",
-            original,
-            mapped,
-            req.url,
-            resp.headers.get("content-type", ""),
-        )
-        raise HTTPException(
-            status_code=mapped,
-            detail="Profil nicht abrufbar (Login erforderlich oder nicht öffentlich).",
-        )
-
-    ctype = resp.headers.get("content-type", "").lower()
-    if "text/html" not in ctype:
-        raise HTTPException(
-            status_code=400, detail="Unerwarteter Inhaltstyp. Erwartet HTML."
-        )
+    text = extractor.finish()
+    logger.info(
+        "LinkedIn profile extracted: html=%s chars text=%s chars truncated=%s in %.0f ms",
+        received,
+        len(text),
+        extractor.truncated,
+        (time.perf_counter() - started) * 1000,
+    )
+    if not text.strip():
+        raise HTTPException(status_code=422, detail="Kein Profilinhalt gefunden.")
+    return text
 
-    html = resp.text
-    if len(html) > 150_000:
-        html = html[:150_000]
 
-    if req.template_override:
-        template = req.template_override
-    elif req.template_id:
-        try:
-            template = read_template_by_id(req.template_id)
-        except FileNotFoundError as e:
-            raise HTTPException(status_code=404, detail=str(e))
-    else:
-        template = read_template()
+@app.post("/api/import/linkedin", response_model=GenerateResponse)
+async def import_linkedin(req: LinkedInImportRequest):
+    profile_text = await fetch_linkedin_profile_text(req.url)
+    template = resolve_template(req.template_override, req.template_id)
     try:
-        latex = generate_latex_from_linkedin_html(profile_html=html, template=template)
+        latex = await generate_latex_from_linkedin_profile(profile_text=profile_text, template=template)
+    except PromptTooLarge:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"OpenAI-Generierung fehlgeschlagen: {e}"
         )
 
-    latex = strip_code_fences(latex)
     if not latex.strip():
         raise HTTPException(status_code=500, detail="Kein LaTeX erzeugt.")
     return GenerateResponse(latex=latex)
+
+
+@app.post("/api/import/linkedin/stream")
+async def import_linkedin_stream(req: LinkedInImportRequest):
+    profile_text = await fetch_linkedin_profile_text(req.url)
+    template = resolve_template(req.template_override, req.template_id)
+    tokens = stream_latex_from_linkedin_profile(profile_text=profile_text, template=template)
+    return sse_latex_stream(tokens, "OpenAI-Generierung fehlgeschlagen")
@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import jwt
+
+from .http_clients import get_http_client
+
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSCache:
+    """
+    Signing keys from a JWKS endpoint, fetched asynchronously and refreshed in the background.
+    An unknown `kid` (key rotation) triggers a refetch, rate-limited by `min_refetch_interval`.
+    """
+
+    def __init__(self, jwks_url: str, refresh_interval: float = 3600.0, min_refetch_interval: float = 30.0):
+        self.jwks_url = jwks_url
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self._keys: dict[str, Any] = {}
+        self._fetched = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.fetches = 0
+
+    async def refresh(self) -> None:
+        async with self._lock:
+            resp = await get_http_client().get(self.jwks_url, timeout=10.0)
+            resp.raise_for_status()
+            keyset = jwt.PyJWKSet.from_dict(resp.json())
+            self._keys = {k.key_id: k.key for k in keyset.keys if k.key_id}
+            self._fetched = time.monotonic()
+            self.fetches += 1
+
+    async def get_signing_key(self, token: str) -> Any:
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        # Unbekannte kid: evtl. Schlüsselrotation -> neu laden (aber nicht bei jedem Request)
+        if time.monotonic() - self._fetched >= self.min_refetch_interval or not self._keys:
+            await self.refresh()
+            key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+        return key
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("JWKS refresh failed: %s", e)
+
+    async def start(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Start nicht blockieren; beim ersten Request wird erneut geladen
+            logger.warning("JWKS prefetch failed: %s", e)
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class TokenCache:
+    """Bounded LRU of already validated tokens (by digest); entries expire at their `exp` claim."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        if self.max_entries <= 0:
+            return None
+        digest = self._digest(token)
+        with self._lock:
+            item = self._items.get(digest)
+            if item is None:
+                return None
+            exp, claims = item
+            if time.time() >= exp:
+                del self._items[digest]
+                return None
+            self._items.move_to_end(digest)
+            return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        exp = claims.get("exp")
+        if self.max_entries <= 0 or not isinstance(exp, (int, float)):
+            return
+        digest = self._digest(token)
+        with self._lock:
+            self._items[digest] = (float(exp), claims)
+            self._items.move_to_end(digest)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class AuthStats:
+    """Per-request auth overhead (seconds) and token cache hit counters."""
+
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float, cached: bool, ok: bool = True) -> None:
+        self.requests += 1
+        self.cache_hits += int(cached)
+        self.failures += int(not ok)
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "token_cache_hits": self.cache_hits,
+            "failures": self.failures,
+            "avg_overhead_ms": round(self.total_seconds / self.requests * 1000, 3) if self.requests else 0.0,
+            "max_overhead_ms": round(self.max_seconds * 1000, 3),
+        }
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from .settings import env_float
+
+
+class BatchItemResult:
+    """Outcome of one batch item: PDF bytes on success, an error message otherwise."""
+
+    def __init__(self, index: int, pdf: Optional[bytes] = None, error: Optional[str] = None):
+        self.index = index
+        self.pdf = pdf
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def filename(self) -> str:
+        return f"cv-{self.index + 1:03d}.pdf"
+
+    def summary(self) -> dict:
+        item = {"index": self.index, "status": "done" if self.ok else "failed"}
+        if self.ok:
+            item["filename"] = self.filename
+            item["size"] = len(self.pdf or b"")
+        else:
+            item["error"] = self.error
+        return item
+
+
+async def run_batch(
+    items: list[Any], process: Callable[[int, Any], Awaitable[bytes]]
+) -> AsyncIterator[BatchItemResult]:
+    """
+    Processes all items concurrently and yields results in completion order.
+    Exceptions are captured per item, so one failure never aborts the batch.
+    `process` is responsible for bounding its own concurrency (LLM cap, compile pool).
+    """
+
+    async def _one(index: int, item: Any) -> BatchItemResult:
+        try:
+            return BatchItemResult(index, pdf=await process(index, item))
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e) or e.__class__.__name__
+            return BatchItemResult(index, error=str(detail))
+
+    tasks = [asyncio.create_task(_one(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client hat abgebrochen -> restliche Arbeit stoppen
+        for task in tasks:
+            task.cancel()
+
+
+class _ZipSink:
+    """Write-only, non-seekable sink; zipfile then writes data descriptors so we can stream."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def zip_stream(results: AsyncIterator[BatchItemResult]) -> AsyncIterator[bytes]:
+    """Streams a ZIP archive with one PDF per successful item plus a manifest.json."""
+    sink = _ZipSink()
+    summaries = []
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        async for result in results:
+            summaries.append(result.summary())
+            if result.ok:
+                zf.writestr(result.filename, result.pdf)
+                yield sink.drain()
+        summaries.sort(key=lambda item: item["index"])
+        zf.writestr(
+            "manifest.json",
+            json.dumps({"items": summaries}, ensure_ascii=False, indent=2),
+        )
+    yield sink.drain()
+
+
+class BatchJob:
+    STATE_FILE = "state.json"
+
+    def __init__(
+        self,
+        batch_id: str,
+        total: int,
+        workdir: Path,
+        created: Optional[float] = None,
+        owner: Optional[str] = None,
+    ):
+        self.id = batch_id
+        self.total = total
+        self.workdir = workdir
+        # sub-Claim des Erstellers; nur er darf Status und PDFs abrufen
+        self.owner = owner
+        self.created = created if created is not None else time.time()
+        self.items: dict[int, dict] = {i: {"index": i, "status": "pending"} for i in range(total)}
+        self.task: Optional[asyncio.Task] = None
+
+    def save(self) -> None:
+        """Writes the job state next to its PDFs (atomically) for the other workers."""
+        state = {
+            "batch_id": self.id,
+            "total": self.total,
+            "created": self.created,
+            "owner": self.owner,
+            "items": self.to_dict()["items"],
+        }
+        fd, tmp_name = tempfile.mkstemp(dir=self.workdir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+        os.replace(tmp_name, self.workdir / self.STATE_FILE)
+
+    @classmethod
+    def load(cls, workdir: Path) -> Optional["BatchJob"]:
+        """Read-only view of a job started by another worker; None if absent or unreadable."""
+        try:
+            state = json.loads((workdir / cls.STATE_FILE).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        job = cls(state["batch_id"], state["total"], workdir, created=state["created"], owner=state.get("owner"))
+        job.items = {item["index"]: item for item in state["items"]}
+        return job
+
+    @property
+    def status(self) -> str:
+        states = {item["status"] for item in self.items.values()}
+        if "pending" in states:
+            return "running"
+        return "failed" if states == {"failed"} else "done"
+
+    def to_dict(self) -> dict:
+        items = [self.items[i] for i in sorted(self.items)]
+        return {
+            "batch_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "done": sum(1 for item in items if item["status"] == "done"),
+            "failed": sum(1 for item in items if item["status"] == "failed"),
+            "items": items,
+        }
+
+    def pdf_path(self, index: int) -> Optional[Path]:
+        item = self.items.get(index)
+        if not item or item["status"] != "done":
+            return None
+        return self.workdir / item["filename"]
+
+
+class BatchStore:
+    """
+    Registry of batch jobs; PDFs and a state.json are kept in `batch_dir/<id>/` until the
+    TTL expires. Jobs run in the worker that started them, but any worker sharing
+    `batch_dir` can report their status and serve their PDFs.
+    """
+
+    def __init__(self, ttl: float, batch_dir: Path):
+        self.ttl = ttl
+        self.batch_dir = batch_dir
+        self._jobs: dict[str, BatchJob] = {}
+        self._swept = 0.0
+
+    def _purge(self) -> None:
+        now = time.time()
+        for batch_id, job in list(self._jobs.items()):
+            if job.status != "running" and now - job.created > self.ttl:
+                shutil.rmtree(job.workdir, ignore_errors=True)
+                del self._jobs[batch_id]
+        # Verwaiste Verzeichnisse anderer (auch beendeter) Worker höchstens einmal pro Minute räumen
+        if now - self._swept < min(60.0, self.ttl):
+            return
+        self._swept = now
+        for workdir in self.batch_dir.glob("*"):
+            if workdir.name in self._jobs:
+                continue
+            # Laufende Jobs aktualisieren state.json pro Eintrag
+            state = workdir / BatchJob.STATE_FILE
+            try:
+                idle = now - (state if state.exists() else workdir).stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if idle > self.ttl:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    def get(self, batch_id: str) -> Optional[BatchJob]:
+        self._purge()
+        job = self._jobs.get(batch_id)
+        if job is None and re.fullmatch(r"[0-9a-f]{32}", batch_id or ""):
+            # Von einem anderen Worker gestartet
+            job = BatchJob.load(self.batch_dir / batch_id)
+        return job
+
+    def start(
+        self,
+        items: list[Any],
+        process: Callable[[int, Any], Awaitable[bytes]],
+        owner: Optional[str] = None,
+    ) -> BatchJob:
+        self._purge()
+        batch_id = uuid.uuid4().hex
+        workdir = self.batch_dir / batch_id
+        workdir.mkdir(parents=True)
+        job = BatchJob(batch_id, len(items), workdir, owner=owner)
+        job.save()
+
+        async def _run() -> None:
+            async for result in run_batch(items, process):
+                if result.ok:
+                    (job.workdir / result.filename).write_bytes(result.pdf)
+                job.items[result.index] = result.summary()
+                job.save()
+
+        job.task = asyncio.create_task(_run())
+        self._jobs[job.id] = job
+        return job
+
+    async def drain(self, timeout: float) -> bool:
+        """Waits for running batches on shutdown; cancels them and returns False after `timeout`."""
+        tasks = [job.task for job in self._jobs.values() if job.task and not job.task.done()]
+        if not tasks:
+            return True
+        _, pending = await asyncio.wait(tasks, timeout=max(0.0, timeout))
+        for task in pending:
+            task.cancel()
+        return not pending
+
+
+def create_batch_store() -> BatchStore:
+    batch_dir = Path(os.getenv("BATCH_DIR", str(Path(tempfile.gettempdir()) / "cv-batches")))
+    return BatchStore(ttl=env_float("BATCH_TTL", 3600.0), batch_dir=batch_dir)
@@ -0,0 +1,102 @@
+import asyncio
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from . import metrics
+from .settings import env_float, env_int
+
+
+class CompileQueueFull(RuntimeError):
+    """Raised when the compile queue is full; `retry_after` is a hint in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("LaTeX compile queue is full. Please retry later.")
+        self.retry_after = retry_after
+
+
+class CompilePool:
+    """
+    Bounded executor for LaTeX compiles.
+    At most `max_parallel` jobs run at once, at most `max_queue` jobs wait for a slot;
+    further submissions are rejected with CompileQueueFull instead of piling up.
+    """
+
+    def __init__(self, max_parallel: int, max_queue: int, timeout: Optional[float]):
+        self.max_parallel = max(1, max_parallel)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(self.max_parallel)
+        self._waiting = 0
+        self._running = 0
+        self._avg_duration = 2.0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _retry_after(self) -> int:
+        backlog = self._waiting + self._running
+        return max(1, math.ceil(self._avg_duration * backlog / self.max_parallel))
+
+    async def submit(self, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        """Runs `func(*args, timeout=..., **kwargs)` once a compile slot is free."""
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise CompileQueueFull(self._retry_after())
+
+        self._waiting += 1
+        queued = time.perf_counter()
+        try:
+            with metrics.span("queue"):
+                await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        metrics.observe_queue_wait(time.perf_counter() - queued)
+
+        self._running += 1
+        started = time.perf_counter()
+        try:
+            kwargs.setdefault("timeout", self.timeout)
+            result = await func(*args, **kwargs)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            # Gleitender Mittelwert für die Retry-After-Schätzung
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * elapsed
+            self._running -= 1
+            self._slots.release()
+
+    async def drain(self, timeout: float) -> bool:
+        """Waits until running and queued compiles have finished; False if `timeout` expired first."""
+        deadline = time.monotonic() + timeout
+        while self._running or self._waiting:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "max_parallel": self.max_parallel,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "waiting": self._waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_duration_s": round(self._avg_duration, 3),
+        }
+
+
+def create_compile_pool() -> CompilePool:
+    timeout = env_float("LATEX_COMPILE_TIMEOUT", 60.0)
+    return CompilePool(
+        max_parallel=env_int("LATEX_MAX_PARALLEL", os.cpu_count() or 2),
+        max_queue=env_int("LATEX_MAX_QUEUE", 16),
+        timeout=timeout or None,
+    )
@@ -0,0 +1,125 @@
+import re
+from functools import lru_cache
+from typing import Optional
+
+import jinja2
+from markupsafe import Markup
+
+from .latex_service import split_preamble
+
+
+# LaTeX-taugliche Jinja-Syntax: \VAR{...}, \BLOCK{...}, \#{...}; kollidiert nicht mit {} und %
+_LATEX_SPECIALS = {
+    "\\": r"\textbackslash{}",
+    "&": r"\&",
+    "%": r"\%",
+    "$": r"\$",
+    "#": r"\#",
+    "_": r"\_",
+    "{": r"\{",
+    "}": r"\}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+}
+_LATEX_SPECIALS_RE = re.compile("|".join(re.escape(c) for c in _LATEX_SPECIALS))
+_URL_SPECIALS_RE = re.compile(r"[%#\\{}]")
+_SCHEME_RE = re.compile(r"^[a-z][a-z0-9+.-]*:", re.IGNORECASE)
+
+
+def escape_latex(text: str) -> str:
+    return _LATEX_SPECIALS_RE.sub(lambda m: _LATEX_SPECIALS[m.group(0)], text)
+
+
+def _finalize(value):
+    # Jeder \VAR-Ausdruck wird escaped, außer er ist ausdrücklich als LaTeX markiert (Markup)
+    if value is None:
+        return ""
+    if isinstance(value, Markup):
+        return value
+    return escape_latex(str(value))
+
+
+def _url(value: Optional[str]) -> Markup:
+    """URL for \\href: prefixed with https:// if it has no scheme, only %, # and braces escaped."""
+    url = (value or "").strip()
+    if url and not _SCHEME_RE.match(url):
+        url = f"https://{url}"
+    return Markup(_URL_SPECIALS_RE.sub(lambda m: "\\" + m.group(0) if m.group(0) in "%#" else "", url))
+
+
+def _display_url(value: Optional[str]) -> str:
+    return re.sub(r"^(https?://)?(www\.)?", "", (value or "").strip()).rstrip("/")
+
+
+def _daterange(entry: dict) -> str:
+    start, end = entry.get("start"), entry.get("end")
+    if start and end:
+        return f"{start} -- {end}"
+    return start or end or ""
+
+
+_env = jinja2.Environment(
+    block_start_string=r"\BLOCK{",
+    block_end_string="}",
+    variable_start_string=r"\VAR{",
+    variable_end_string="}",
+    comment_start_string=r"\#{",
+    comment_end_string="}",
+    trim_blocks=True,
+    lstrip_blocks=True,
+    autoescape=False,
+    keep_trailing_newline=True,
+    finalize=_finalize,
+    undefined=jinja2.ChainableUndefined,
+)
+_env.filters["url"] = _url
+_env.filters["display_url"] = _display_url
+_env.filters["daterange"] = _daterange
+_env.filters["latex"] = Markup
+
+
+class LayoutError(ValueError):
+    """The layout template is invalid or failed to render."""
+
+
+@lru_cache(maxsize=64)
+def _compile(layout: str) -> jinja2.Template:
+    # Ein Layout wird einmal übersetzt; danach kostet ein Rendern nur Millisekunden
+    try:
+        return _env.from_string(layout)
+    except jinja2.TemplateSyntaxError as e:
+        raise LayoutError(f"Invalid layout (line {e.lineno}): {e.message}")
+
+
+def contact_links(contact: dict) -> list[dict]:
+    """Contact details in display order as {label, url}; url is None for plain text."""
+    links = []
+    if contact.get("phone"):
+        links.append({"label": contact["phone"], "url": None})
+    if contact.get("email"):
+        links.append({"label": contact["email"], "url": f"mailto:{contact['email']}"})
+    for key in ("linkedin", "github", "website"):
+        if contact.get(key):
+            links.append({"label": _display_url(contact[key]), "url": contact[key]})
+    if contact.get("location"):
+        links.append({"label": contact["location"], "url": None})
+    return links
+
+
+def render_cv(data: dict, template_source: str, layout: str) -> str:
+    """
+    Renders validated CV data (CVData.model_dump()) with a layout into a full document.
+
+    `layout` is the document body in Jinja syntax with LaTeX-friendly delimiters
+    (\\VAR{...}, \\BLOCK{...}); the preamble is taken from `template_source`, so
+    edits to a template's preamble apply to both generation modes. Values are
+    LaTeX-escaped unless passed through the `latex` filter.
+    """
+    parts = split_preamble(template_source)
+    if parts is None:
+        raise LayoutError("Template has no \\begin{document}.")
+    try:
+        body = _compile(layout).render(**data, contact_links=contact_links(data.get("contact") or {}))
+    except jinja2.TemplateError as e:
+        raise LayoutError(f"Layout failed to render: {e}")
+    return f"{parts[0]}\\begin{{document}}\n{body.strip()}\n\\end{{document}}\n"
@@ -0,0 +1,31 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: Path, shared: bool = False) -> Iterator[None]:
+    """
+    Advisory lock on `path` (created if missing) shared by all processes on the host.
+
+    Serializes read-modify-write sequences on shared directories between workers
+    (gunicorn, separate job worker). The lock is released when the file descriptor
+    is closed, so a crashed process never leaves it held. Without fcntl (Windows)
+    this is a no-op and only a single worker is safe.
+    """
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
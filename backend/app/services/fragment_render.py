@@ -0,0 +1,180 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from .latex_patch import PatchError, split_sections
+from .latex_source import analyze_source
+from .latex_service import CompileResult, compile_latex, split_preamble
+from .render_cache import RenderCache
+from .settings import env_int
+
+
+logger = logging.getLogger(__name__)
+
+
+class FragmentRenderUnsupported(RuntimeError):
+    """The document does not qualify for section-level rendering; compile it in full."""
+
+
+# Alles, was Seitenumbrüche oder Verweise über Abschnittsgrenzen hinweg beeinflusst
+_UNPREDICTABLE_RE = re.compile(
+    r"\\(?:ref|pageref|label|cite|tableofcontents|listoffigures|listoftables"
+    r"|newpage|clearpage|pagebreak|twocolumn|footnote)\b"
+    r"|\\begin\s*\{\s*(?:multicols|figure|table)\*?\s*\}"
+)
+_OVERFULL_VBOX_RE = re.compile(r"Overfull \\vbox")
+
+
+def _fragment_source(preamble: str, segment: str, lead: bool = False) -> str:
+    # Jedes preview wird als eigene Seite gesetzt; Leerraum am Seitenanfang verwirft TeX.
+    # Ein leerer Kasten davor erhält den Abstand vor \section aus der Präambel (titlesec,
+    # \titlespacing, article), statt ihn beim Zusammensetzen zu schätzen.
+    return (
+        preamble
+        + "\\usepackage[active,tightpage]{preview}\n"
+        + "\\setlength\\PreviewBorder{0pt}\n"
+        + "\\begin{document}\n\\begin{preview}\n"
+        + ("\\null\n" if lead else "")
+        + segment.strip("\n")
+        + "\n\\end{preview}\n\\end{document}\n"
+    )
+
+
+def _assembly_source(preamble: str, fragment_paths: list[Path]) -> str:
+    body = "".join(
+        f"\\noindent\\includegraphics{{{p.as_posix()}}}\\par\n" for p in fragment_paths
+    )
+    # Seitenstil der Präambel bleibt (Seitenzahlen wie im Vollbuild); Abstände stecken in den Fragmenten
+    return (
+        preamble
+        + "\\usepackage{graphicx}\n"
+        + "\\begin{document}\n"
+        + "\\setlength{\\parskip}{0pt}\n"
+        + body
+        + "\\end{document}\n"
+    )
+
+
+def fragment_key(engine: str, preamble: str, segment: str, lead: bool = False) -> str:
+    digest = hashlib.sha256()
+    for part in (engine, preamble.strip(), segment.strip(), "lead" if lead else ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def check_eligible(latex_source: str, engine: str) -> tuple[str, list[tuple[str, str]]]:
+    """Returns (preamble, segments) if the document breaks pages predictably, else raises."""
+    if engine != "pdflatex":
+        raise FragmentRenderUnsupported(f"engine {engine} not supported")
+    parts = split_preamble(latex_source)
+    if parts is None or analyze_source(latex_source).document_class != "article":
+        raise FragmentRenderUnsupported("not an article document")
+    try:
+        _, segments, _ = split_sections(latex_source)
+    except PatchError as e:
+        raise FragmentRenderUnsupported(str(e))
+    if len(segments) < 2:
+        raise FragmentRenderUnsupported("no sections")
+    if _UNPREDICTABLE_RE.search(parts[1]):
+        raise FragmentRenderUnsupported("cross-references or manual page breaks")
+    return parts[0], [(key, text) for key, text in segments if text.strip()]
+
+
+class FragmentRenderer:
+    """
+    Renders a document section by section: every top-level segment is compiled as a
+    standalone fragment against the shared preamble and cached by content hash;
+    the final PDF stacks the fragment PDFs. After a small edit only the touched
+    section is recompiled.
+
+    The result is a preview, not the final document: pages only break between
+    sections and links are not clickable.
+    """
+
+    def __init__(self, cache: RenderCache):
+        self.cache = cache
+        self.renders = 0
+        self.fragments_compiled = 0
+        self.fragments_reused = 0
+        self.fallbacks = 0
+
+    async def render(
+        self, latex_source: str, engine: str, timeout: Optional[float] = None
+    ) -> tuple[CompileResult, dict]:
+        preamble, segments = check_eligible(latex_source, engine)
+        if not self.cache.enabled:
+            raise FragmentRenderUnsupported("fragment cache disabled")
+
+        started = time.perf_counter()
+        pass_durations = []
+        fragment_paths = []
+        reused = 0
+        for i, (_, segment) in enumerate(segments):
+            # Alles außer dem ersten Fragment braucht den Abstand zum vorherigen
+            lead = i > 0
+            key = fragment_key(engine, preamble, segment, lead)
+            entry = self.cache.get(key)
+            if entry is None:
+                result = await compile_latex(
+                    _fragment_source(preamble, segment, lead), engine=engine, timeout=timeout
+                )
+                pass_durations.extend(result.pass_durations)
+                try:
+                    entry = self.cache.put(key, Path(result.pdf_path))
+                finally:
+                    result.cleanup()
+                if entry is None or entry.path is None:
+                    raise FragmentRenderUnsupported("fragment too large for cache")
+                self.fragments_compiled += 1
+            else:
+                reused += 1
+                self.fragments_reused += 1
+            fragment_paths.append(entry.path)
+
+        assembly = await _compile_assembly(preamble, fragment_paths, engine, timeout)
+        pass_durations.extend(assembly.pass_durations)
+        self.renders += 1
+        info = {
+            "fragments": len(segments),
+            "fragments_reused": reused,
+            "duration_ms": round((time.perf_counter() - started) * 1000),
+        }
+        return CompileResult(assembly.pdf_path, engine, pass_durations, assembly.log), info
+
+    def stats(self) -> dict:
+        return {
+            "renders": self.renders,
+            "fragments_compiled": self.fragments_compiled,
+            "fragments_reused": self.fragments_reused,
+            "fallbacks": self.fallbacks,
+            "cache": self.cache.stats(),
+        }
+
+
+async def _compile_assembly(
+    preamble: str, fragment_paths: list[Path], engine: str, timeout: Optional[float]
+) -> CompileResult:
+    source = _assembly_source(preamble, fragment_paths)
+    result = await compile_latex(source, engine=engine, timeout=timeout)
+    # Ein Abschnitt höher als eine Seite lässt sich nicht als Block stapeln
+    if _OVERFULL_VBOX_RE.search(result.log):
+        result.cleanup()
+        raise FragmentRenderUnsupported("section taller than a page")
+    return result
+
+
+def create_fragment_renderer() -> FragmentRenderer:
+    cache_dir = Path(
+        os.getenv("FRAGMENT_CACHE_DIR", str(Path(tempfile.gettempdir()) / "cv-fragment-cache"))
+    )
+    cache = RenderCache(
+        cache_dir=cache_dir,
+        max_bytes=env_int("FRAGMENT_CACHE_MAX_BYTES", 128 * 1024 * 1024),
+    )
+    return FragmentRenderer(cache)
@@ -0,0 +1,83 @@
+import os
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+
+from .settings import env_bool, env_float, env_int
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+# Application-lifetime clients, created in the FastAPI lifespan handler.
+_http: Optional[httpx.AsyncClient] = None
+_openai: Optional["AsyncOpenAI"] = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=env_int("HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=env_int("HTTP_MAX_KEEPALIVE", 20),
+        keepalive_expiry=env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+
+def _http2() -> bool:
+    if not env_bool("HTTP2_ENABLED", True):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _new_openai_client() -> "AsyncOpenAI":
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY not set")
+    # Erst beim ersten LLM-Aufruf importieren: das openai-Paket kostet ~1 s Startzeit pro Worker
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    return AsyncOpenAI(
+        api_key=api_key,
+        http_client=DefaultAsyncHttpxClient(limits=_limits(), http2=_http2()),
+    )
+
+
+def _new_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        follow_redirects=True, timeout=20.0, limits=_limits(), http2=_http2()
+    )
+
+
+async def startup() -> None:
+    global _http
+    if _http is None:
+        _http = _new_http_client()
+
+
+async def shutdown() -> None:
+    global _http, _openai
+    if _openai is not None:
+        await _openai.close()
+        _openai = None
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared client for outgoing HTTP requests (keep-alive pool)."""
+    global _http
+    if _http is None:
+        _http = _new_http_client()
+    return _http
+
+
+def get_openai_client() -> "AsyncOpenAI":
+    """Shared OpenAI client, created (and the openai package imported) on first use."""
+    global _openai
+    if _openai is None:
+        _openai = _new_openai_client()
+    return _openai
@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from .settings import env_int
+
+
+TERMINAL_STATUSES = ("done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    owner TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    error TEXT,
+    artifact TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+"""
+
+
+class JobQueue:
+    """
+    Persistent job queue on a local SQLite file.
+    Shared between the API processes (submit/poll) and separate worker processes (claim/run);
+    jobs survive restarts, stale running jobs are re-queued via heartbeats.
+    """
+
+    def __init__(self, db_path: Path, artifact_dir: Path, max_attempts: int = 3):
+        self.db_path = db_path
+        self.artifact_dir = artifact_dir
+        self.max_attempts = max_attempts
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.artifact_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(str(self.db_path), timeout=10.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def artifact_path(self, job_id: str) -> Path:
+        return self.artifact_dir / f"{job_id}.pdf"
+
+    def submit(self, kind: str, payload: dict, owner: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, owner, payload, status, stage, created, updated) "
+                "VALUES (?, ?, ?, ?, 'queued', 'queued', ?, ?)",
+                (job_id, kind, owner, json.dumps(payload, ensure_ascii=False), now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def claim(self, worker_id: str) -> Optional[dict]:
+        """Atomically takes the oldest queued job and marks it running."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', stage = 'started', worker = ?, "
+                    "attempts = attempts + 1, heartbeat = ?, updated = ? WHERE id = ?",
+                    (worker_id, now, now, row["id"]),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def heartbeat(self, job_id: str, stage: Optional[str] = None) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat = ?, updated = ?, stage = COALESCE(?, stage) "
+                "WHERE id = ? AND status = 'running'",
+                (now, now, stage, job_id),
+            )
+
+    def complete(self, job_id: str, artifact: Path) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', stage = 'done', artifact = ?, error = NULL, "
+                "updated = ? WHERE id = ?",
+                (str(artifact), now, job_id),
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', stage = 'failed', error = ?, updated = ? "
+                "WHERE id = ?",
+                (error, now, job_id),
+            )
+
+    def requeue_stale(self, stale_after: float) -> int:
+        """Re-queues running jobs whose worker stopped sending heartbeats (e.g. after a crash)."""
+        cutoff = time.time() - stale_after
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', stage = 'failed', "
+                "error = 'Worker lost too many times.', updated = ? "
+                "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                (time.time(), cutoff, self.max_attempts),
+            )
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'queued', stage = 'requeued', worker = NULL, updated = ? "
+                "WHERE status = 'running' AND heartbeat < ?",
+                (time.time(), cutoff),
+            )
+            return cur.rowcount
+
+    def purge(self, older_than: float) -> int:
+        """Deletes finished jobs (and their artifacts) older than `older_than` seconds."""
+        cutoff = time.time() - older_than
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, artifact FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                (cutoff,),
+            ).fetchall()
+            for row in rows:
+                if row["artifact"]:
+                    Path(row["artifact"]).unlink(missing_ok=True)
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(row["id"],) for row in rows])
+        return len(rows)
+
+
+def create_job_queue() -> JobQueue:
+    data_dir = Path(os.getenv("JOB_DATA_DIR", str(Path(tempfile.gettempdir()) / "cv-jobs")))
+    return JobQueue(
+        db_path=Path(os.getenv("JOB_DB_PATH", str(data_dir / "jobs.sqlite3"))),
+        artifact_dir=Path(os.getenv("JOB_ARTIFACT_DIR", str(data_dir / "artifacts"))),
+        max_attempts=env_int("JOB_MAX_ATTEMPTS", 3),
+    )
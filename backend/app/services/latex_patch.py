@@ -0,0 +1,129 @@
+import re
+from typing import Optional
+
+
+class PatchError(ValueError):
+    pass
+
+
+HEADER_KEY = "header"
+
+_SECTION_RE = re.compile(r"\\section\*?\s*\{")
+_BEGIN_DOC = "\\begin{document}"
+_END_DOC = "\\end{document}"
+_ENV_RE = re.compile(r"\\(begin|end)\s*\{([^}]*)\}")
+
+
+def _read_group(text: str, open_idx: int) -> Optional[int]:
+    """Returns the index after the brace group starting at `open_idx` ('{'), or None."""
+    depth = 0
+    i = open_idx
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return None
+
+
+def _normalize_title(title: str) -> str:
+    return " ".join(title.split()).casefold()
+
+
+def split_sections(latex: str) -> tuple[str, list[tuple[str, str]], str]:
+    """
+    Splits a document into (head, segments, tail).
+    `head` runs through \\begin{document}; segments are (key, text) pairs: first the
+    header (everything before the first \\section), then one per \\section keyed by its title;
+    `tail` starts at \\end{document}.
+    """
+    begin = latex.find(_BEGIN_DOC)
+    end = latex.rfind(_END_DOC)
+    if begin < 0 or end < 0 or end < begin:
+        raise PatchError("Document has no \\begin{document} ... \\end{document} body.")
+    body_start = begin + len(_BEGIN_DOC)
+    head, body, tail = latex[:body_start], latex[body_start:end], latex[end:]
+
+    starts = []
+    for m in _SECTION_RE.finditer(body):
+        close = _read_group(body, m.end() - 1)
+        if close is None:
+            raise PatchError("Unbalanced braces in \\section title.")
+        starts.append((m.start(), body[m.end():close - 1]))
+
+    segments = [(HEADER_KEY, body[: starts[0][0]] if starts else body)]
+    for i, (pos, title) in enumerate(starts):
+        stop = starts[i + 1][0] if i + 1 < len(starts) else len(body)
+        segments.append((title, body[pos:stop]))
+    return head, segments, tail
+
+
+def apply_section_patch(latex: str, replacements: list[dict]) -> str:
+    """
+    Applies section-level replacements ({"section": <title or "header">, "content": <LaTeX>})
+    and returns the patched document. Raises PatchError if a section cannot be matched.
+    """
+    if not replacements:
+        raise PatchError("Patch contains no replacements.")
+    head, segments, tail = split_sections(latex)
+    index = {}
+    for i, (key, _) in enumerate(segments):
+        index.setdefault(_normalize_title(key), i)
+
+    patched = list(segments)
+    for repl in replacements:
+        if not isinstance(repl, dict) or "section" not in repl or "content" not in repl:
+            raise PatchError("Malformed replacement entry.")
+        key = _normalize_title(str(repl["section"]))
+        if key not in index:
+            raise PatchError(f"Unknown section: {repl['section']}")
+        content = str(repl["content"]).strip("\n")
+        i = index[key]
+        patched[i] = (patched[i][0], f"\n{content}\n\n" if content else "\n")
+    return head + "".join(text for _, text in patched) + tail
+
+
+def _strip_comments(latex: str) -> str:
+    return re.sub(r"(?<!\\)%.*", "", latex)
+
+
+def validate_latex(latex: str) -> None:
+    """Cheap structural checks for a full document; raises PatchError on problems."""
+    if "\\documentclass" not in latex:
+        raise PatchError("Missing \\documentclass.")
+    if latex.count(_BEGIN_DOC) != 1 or latex.count(_END_DOC) != 1:
+        raise PatchError("Document must contain exactly one document environment.")
+    text = _strip_comments(latex)
+    depth = 0
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth < 0:
+                raise PatchError("Unbalanced braces.")
+        i += 1
+    if depth != 0:
+        raise PatchError("Unbalanced braces.")
+    # Umgebungen nur im Body prüfen; die Präambel enthält oft halbe \begin{...} in Makros
+    body = text[text.find(_BEGIN_DOC) + len(_BEGIN_DOC): text.rfind(_END_DOC)]
+    stack = []
+    for kind, env in _ENV_RE.findall(body):
+        if kind == "begin":
+            stack.append(env)
+        elif not stack or stack.pop() != env:
+            raise PatchError(f"Unbalanced environment: {env}")
+    if stack:
+        raise PatchError(f"Unclosed environment: {stack[-1]}")
@@ -1,92 +1,442 @@
+import asyncio
+import hashlib
+import os
 import re
 import shutil
-import subprocess
+import signal
 import tempfile
+import time
+from collections import OrderedDict
 from pathlib import Path
+from typing import Optional, Union
 
+from . import metrics
+from .latex_source import SourceAnalysis, analyze_source
+from .pdf_optimize import OptimizeResult, create_pdf_optimizer
+from .settings import env_bool, env_int
+from .workspace_pool import create_workspace_pool
 
-def compile_latex_to_pdf(latex_source: str) -> str:
+
+ENGINE_NAMES = ("tectonic", "pdflatex", "xelatex")
+_engines: Optional[dict[str, str]] = None
+
+
+def available_engines(refresh: bool = False) -> dict[str, str]:
+    """Installed LaTeX engines (name -> path); looked up once and cached."""
+    global _engines
+    if _engines is None or refresh:
+        _engines = {name: path for name in ENGINE_NAMES if (path := shutil.which(name))}
+    return _engines
+
+
+def select_engine(latex_source: Union[str, SourceAnalysis]) -> str:
+    """
+    Chooses a LaTeX engine for the given source (or an existing analysis of it).
+    If the source uses fontspec/polyglossia or explicit XeLaTeX-only commands, prefer xelatex.
+    """
+    analysis = latex_source if isinstance(latex_source, SourceAnalysis) else analyze_source(latex_source)
+    engines = available_engines()
+
+    if analysis.needs_xelatex and "xelatex" in engines:
+        return "xelatex"
+    for name in ENGINE_NAMES:
+        if name in engines:
+            return name
+    raise RuntimeError(
+        "No LaTeX engine found. Install 'tectonic' (recommended) or 'pdflatex/xelatex'."
+    )
+
+
+class CompileTimeout(RuntimeError):
+    pass
+
+
+async def _run(cmd: list[str], cwd: Path, timeout: Optional[float]) -> tuple[int, str, str]:
+    """
+    Runs a TeX process without blocking the event loop.
+    On timeout the whole process group is killed so no runaway TeX processes survive.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=cwd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+        if isinstance(exc, asyncio.CancelledError):
+            raise
+        raise CompileTimeout(f"{cmd[0]} timed out after {timeout:g}s and was killed.")
+    return (
+        proc.returncode,
+        stdout.decode("utf-8", errors="replace"),
+        stderr.decode("utf-8", errors="replace"),
+    )
+
+
+# --------------------------- Precompiled preamble formats ---------------------------
+# Ein wiederkehrendes Präambel wird einmalig mit mylatexformat in ein .fmt gedumpt;
+# spätere Läufe starten direkt aus dem Format statt alle Pakete neu zu laden.
+
+PRECOMPILE_PREAMBLE = env_bool("LATEX_PRECOMPILE_PREAMBLE", True)
+FORMAT_MIN_SEEN = env_int("LATEX_FORMAT_MIN_SEEN", 2)
+FORMAT_DIR = Path(
+    os.getenv("LATEX_FORMAT_DIR", str(Path(tempfile.gettempdir()) / "cv-latex-formats"))
+)
+
+# Obergrenze für die Buchführung über Präambeln (jede Anfrage kann eine neue liefern)
+FORMAT_TRACK_MAX = max(1, env_int("LATEX_FORMAT_TRACK_MAX", 256))
+
+_BEGIN_DOCUMENT = "\\begin{document}"
+# Kleine LRUs: selten gesehene Präambeln fallen heraus, statt unbegrenzt zu wachsen
+_preamble_seen: "OrderedDict[str, int]" = OrderedDict()
+_format_failed: "OrderedDict[str, None]" = OrderedDict()
+# Nur während eines Builds belegt
+_format_locks: dict[str, asyncio.Lock] = {}
+
+
+def _remember(items: OrderedDict, key: str, value) -> None:
+    items[key] = value
+    items.move_to_end(key)
+    while len(items) > FORMAT_TRACK_MAX:
+        items.popitem(last=False)
+
+
+def _mark_failed(key: str) -> None:
+    _preamble_seen.pop(key, None)
+    _remember(_format_failed, key, None)
+
+
+def split_preamble(latex_source: str) -> Optional[tuple[str, str]]:
+    """Splits the source into (preamble, body) at \\begin{document}, or None if absent."""
+    idx = latex_source.find(_BEGIN_DOCUMENT)
+    if idx < 0:
+        return None
+    return latex_source[:idx], latex_source[idx:]
+
+
+def preamble_hash(preamble: str, engine: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(engine.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(preamble.strip().encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+async def _ensure_format(latex_source: str, engine: str, timeout: Optional[float]) -> Optional[Path]:
     """
-    Writes LaTeX source to a temp directory and compiles it using tectonic.
-    Returns the absolute path to the resulting PDF.
-    Raises CalledProcessError on failure.
+    Returns a precompiled format for the preamble of `latex_source`, building it
+    once the preamble has been seen FORMAT_MIN_SEEN times. Returns None if unavailable.
     """
+    parts = split_preamble(latex_source)
+    if parts is None:
+        return None
+    key = preamble_hash(parts[0], engine)
+    fmt_path = FORMAT_DIR / f"{key}.fmt"
+    if fmt_path.exists():
+        return fmt_path
+    if key in _format_failed:
+        return None
+    seen = _preamble_seen.get(key, 0) + 1
+    if seen < FORMAT_MIN_SEEN:
+        _remember(_preamble_seen, key, seen)
+        return None
+    _preamble_seen.pop(key, None)
+
+    lock = _format_locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            if fmt_path.exists():
+                return fmt_path
+            if key in _format_failed:
+                return None
+            return await _build_format(parts[0], key, fmt_path, engine, timeout)
+    finally:
+        # Format gebaut oder verworfen: Wartende halten den Lock selbst, spätere Aufrufe
+        # sehen schon die .fmt-Datei bzw. _format_failed
+        if _format_locks.get(key) is lock:
+            del _format_locks[key]
+
+
+async def _build_format(
+    preamble: str, key: str, fmt_path: Path, engine: str, timeout: Optional[float]
+) -> Optional[Path]:
+    """Dumps `preamble` into `fmt_path` with mylatexformat; None if that fails."""
+    FORMAT_DIR.mkdir(parents=True, exist_ok=True)
     with tempfile.TemporaryDirectory() as tmpdir:
-        tmp_path = Path(tmpdir)
-        tex_path = tmp_path / "main.tex"
-        tex_path.write_text(latex_source, encoding="utf-8")
-
-        # Choose a LaTeX engine.
-        # If the source uses fontspec/polyglossia or explicit XeLaTeX-only commands, prefer xelatex.
-        lower_src = latex_source.lower()
-        needs_xe = bool(
-            # fontspec (usepackage or requirepackage)
-            re.search(r"\\\s*(usepackage|requirepackage)\s*\{\s*fontspec\s*\}", lower_src)
-            # unicode-math strongly implies XeLaTeX/LuaLaTeX
-            or re.search(r"\\\s*(usepackage|requirepackage)\s*\{\s*unicode\-math\s*\}", lower_src)
-            # Common XeLaTeX commands
-            or "\\setmainfont" in lower_src
-            or "\\newfontfamily" in lower_src
-            or "polyglossia" in lower_src
+        build_dir = Path(tmpdir)
+        (build_dir / "preamble.tex").write_text(
+            preamble + _BEGIN_DOCUMENT + "\n\\end{document}\n", encoding="utf-8"
         )
+        cmd = [
+            engine,
+            "-ini",
+            "-interaction=nonstopmode",
+            "-halt-on-error",
+            f"-jobname={key}",
+            f"&{engine}",
+            "mylatexformat.ltx",
+            "preamble.tex",
+        ]
+        try:
+            returncode, _, _ = await _run(cmd, build_dir, timeout)
+        except (FileNotFoundError, CompileTimeout):
+            returncode = -1
+        built = build_dir / f"{key}.fmt"
+        if returncode != 0 or not built.exists():
+            # Präambel lässt sich nicht dumpen (z.B. mylatexformat fehlt) -> nicht erneut versuchen
+            _mark_failed(key)
+            return None
+        # Über eine temporäre Datei im Zielordner veröffentlichen: andere Worker sehen
+        # entweder kein oder ein vollständiges Format, nie ein halb kopiertes
+        fd, tmp_name = tempfile.mkstemp(dir=FORMAT_DIR, suffix=".part")
+        os.close(fd)
+        shutil.move(str(built), tmp_name)
+        os.replace(tmp_name, fmt_path)
+    return fmt_path
 
-        engine = None
-        if needs_xe and shutil.which("xelatex"):
-            engine = "xelatex"
-        else:
-            if shutil.which("tectonic"):
-                engine = "tectonic"
-            elif shutil.which("pdflatex"):
-                engine = "pdflatex"
-            elif shutil.which("xelatex"):
-                engine = "xelatex"
-            else:
-                raise RuntimeError(
-                    "No LaTeX engine found. Install 'tectonic' (recommended) or 'pdflatex/xelatex'."
-                )
 
-        if engine == "tectonic":
-            # Tectonic produces main.pdf in the same directory.
+def _discard_format(fmt_path: Path) -> None:
+    _mark_failed(fmt_path.stem)
+    fmt_path.unlink(missing_ok=True)
+
+
+MAX_PASSES = max(1, env_int("LATEX_MAX_PASSES", 3))
+# Entwurfs-Kompilierung (Vorschau): weniger Läufe, Zwischenläufe ohne PDF-Ausgabe
+DRAFT_MAX_PASSES = max(1, env_int("LATEX_PREVIEW_MAX_PASSES", 2))
+_DRAFT_FLAGS = {"pdflatex": "-draftmode", "xelatex": "-no-pdf"}
+
+# Meldungen im .log, nach denen ein weiterer Lauf nötig ist
+# (generisch "Rerun to get ... right", u.a. "outlines" für hyperref-Lesezeichen; TeX bricht
+# Logzeilen um, daher \s statt Leerzeichen)
+_RERUN_RE = re.compile(
+    r"Rerun\s+to\s+get\s+[\w\s/-]{1,60}?\s+right"
+    r"|Label\(s\)\s+may\s+have\s+changed"
+    r"|Rerun\s+LaTeX"
+    # rerunfilecheck: "Package rerunfilecheck Warning: File `x.out' has changed."
+    r"|Package\s+rerunfilecheck\s+Warning"
+)
+_TOC_RE = re.compile(r"\\(?:tableofcontents|listoffigures|listoftables)\b")
+# Quellen, die fast sicher einen zweiten Lauf brauchen
+_XREF_RE = re.compile(r"\\(?:ref|pageref|eqref|autoref|cref|Cref|cite|tableofcontents|listoffigures|listoftables)\b")
+
+
+def _needs_rerun(workdir: Path, tex_name: str, latex_source: str, pass_no: int) -> bool:
+    stem = Path(tex_name).stem
+    log_path = workdir / f"{stem}.log"
+    try:
+        log = log_path.read_text(encoding="utf-8", errors="replace")
+    except FileNotFoundError:
+        return False
+    if _RERUN_RE.search(log):
+        return True
+    # Verzeichnisse melden keinen Rerun; nach dem ersten Lauf existieren sie erst im .aux
+    if pass_no == 1 and _TOC_RE.search(latex_source):
+        aux_path = workdir / f"{stem}.aux"
+        try:
+            return "\\@writefile" in aux_path.read_text(encoding="utf-8", errors="replace")
+        except FileNotFoundError:
+            return False
+    return False
+
+
+async def _run_latex_passes(
+    engine: str,
+    workdir: Path,
+    tex_name: str,
+    latex_source: str,
+    timeout: Optional[float],
+    fmt_name: Optional[str],
+    draft: bool = False,
+) -> list[float]:
+    """
+    Runs (pdf|xe)latex until the log no longer asks for a rerun (at most MAX_PASSES).
+    Returns the duration of each pass in seconds.
+
+    With `draft`, at most DRAFT_MAX_PASSES run, and if the source has cross-references
+    the passes before the last one skip writing the PDF (-draftmode / -no-pdf).
+    """
+    latex_cmd = [engine, "-interaction=nonstopmode", "-halt-on-error", tex_name]
+    if fmt_name:
+        latex_cmd.insert(1, f"-fmt={fmt_name}")
+    max_passes = min(MAX_PASSES, DRAFT_MAX_PASSES) if draft else MAX_PASSES
+    intermediate = (
+        draft and max_passes > 1 and engine in _DRAFT_FLAGS and bool(_XREF_RE.search(latex_source))
+    )
+    durations = []
+    for pass_no in range(1, max_passes + 1):
+        cmd = [engine, _DRAFT_FLAGS[engine], *latex_cmd[1:]] if intermediate else latex_cmd
+        started = time.perf_counter()
+        try:
+            returncode, stdout, stderr = await _run(cmd, workdir, timeout)
+        except FileNotFoundError:
+            raise RuntimeError(f"'{engine}' not found on PATH. Please install a LaTeX engine.")
+        durations.append(time.perf_counter() - started)
+        if returncode != 0:
+            raise RuntimeError(
+                f"{engine} failed (code {returncode}). stdout:\n{stdout}\nstderr:\n{stderr}"
+            )
+        if intermediate:
+            # Nach einem Entwurfslauf fehlt das PDF noch: ein weiterer Entwurf nur, wenn danach
+            # noch ein finaler Lauf ins Limit passt
+            intermediate = pass_no + 1 < max_passes and _needs_rerun(workdir, tex_name, latex_source, pass_no)
+            continue
+        if not _needs_rerun(workdir, tex_name, latex_source, pass_no):
+            break
+    return durations
+
+
+workspace_pool = create_workspace_pool()
+pdf_optimizer = create_pdf_optimizer()
+# PDFs bis zu dieser Größe können direkt als Bytes zurückgegeben werden
+INLINE_PDF_MAX_BYTES = env_int("LATEX_INLINE_PDF_MAX_BYTES", 256 * 1024)
+
+
+def release_workdir(pdf_path) -> None:
+    """Returns the compile directory that contains `pdf_path` to the pool (no-op for other paths)."""
+    if pdf_path is None:
+        return
+    workspace_pool.release(Path(pdf_path).parent)
+
+
+class CompileResult:
+    """
+    Outcome of a compile: the PDF plus engine and per-pass timings.
+    The PDF stays in its compile directory (`pdf_path`) until `cleanup()` is called,
+    so it can be moved or streamed without copying. Small PDFs may come back as
+    in-memory bytes (`data`) instead, with the directory already removed.
+    """
+
+    def __init__(
+        self,
+        pdf_path: Optional[str],
+        engine: str,
+        pass_durations: list[float],
+        log: str = "",
+        data: Optional[bytes] = None,
+    ):
+        self.pdf_path = pdf_path
+        self.engine = engine
+        self.pass_durations = pass_durations
+        self.log = log
+        self.data = data
+        self.optimized: Optional[OptimizeResult] = None
+
+    @property
+    def passes(self) -> int:
+        return len(self.pass_durations)
+
+    def cleanup(self) -> None:
+        release_workdir(self.pdf_path)
+
+
+async def compile_latex(
+    latex_source: str,
+    engine: Optional[str] = None,
+    timeout: Optional[float] = None,
+    inline_max_bytes: int = 0,
+    optimize: bool = False,
+    draft: bool = False,
+) -> CompileResult:
+    """
+    Writes LaTeX source to a pooled work directory and compiles it using tectonic.
+    Returns a CompileResult pointing at the PDF inside that directory; the caller must
+    call `cleanup()` once the PDF has been moved or sent. PDFs up to `inline_max_bytes`
+    are returned as bytes instead and need no cleanup. With `optimize`, the PDF runs
+    through `pdf_optimizer` first (in the same compile slot); see `result.optimized`.
+    `draft` trades exact cross-references for speed (previews, see _run_latex_passes).
+    Raises RuntimeError on failure and CompileTimeout if `timeout` (seconds per engine run) is exceeded.
+    """
+    tmp_path = workspace_pool.acquire()
+    try:
+        with metrics.span("compile"):
+            result = await _compile_in(tmp_path, latex_source, engine, timeout, draft)
+    except BaseException:
+        workspace_pool.release(tmp_path)
+        metrics.observe_compile(engine or "auto", [], ok=False)
+        raise
+    metrics.observe_compile(result.engine, result.pass_durations)
+    if optimize:
+        try:
+            with metrics.span("optimize"):
+                result.optimized = await pdf_optimizer.optimize(Path(result.pdf_path), timeout)
+        except BaseException:
+            result.cleanup()
+            raise
+    if inline_max_bytes and Path(result.pdf_path).stat().st_size <= inline_max_bytes:
+        result.data = Path(result.pdf_path).read_bytes()
+        result.cleanup()
+        result.pdf_path = None
+    return result
+
+
+async def _compile_in(
+    tmp_path: Path,
+    latex_source: str,
+    engine: Optional[str],
+    timeout: Optional[float],
+    draft: bool = False,
+) -> CompileResult:
+    tex_path = tmp_path / "main.tex"
+    tex_path.write_text(latex_source, encoding="utf-8")
+
+    if engine is None:
+        engine = select_engine(latex_source)
+
+    if engine == "tectonic":
+        # Tectonic produces main.pdf in the same directory.
+        started = time.perf_counter()
+        try:
+            returncode, stdout, stderr = await _run(
+                ["tectonic", str(tex_path)], tmp_path, timeout
+            )
+        except FileNotFoundError:
+            # Defensive: in case the binary disappears between which() and run()
+            raise RuntimeError("'tectonic' not found on PATH. Please install it.")
+        if returncode != 0:
+            raise RuntimeError(
+                f"Tectonic failed (code {returncode}). stdout:\n{stdout}\nstderr:\n{stderr}"
+            )
+        pass_durations = [time.perf_counter() - started]
+    else:
+        # Fallback using (pdf|xe)latex; rerun only if the log asks for it.
+        fmt_path = None
+        if engine == "pdflatex" and PRECOMPILE_PREAMBLE:
+            fmt_path = await _ensure_format(latex_source, engine, timeout)
+        if fmt_path is None:
+            pass_durations = await _run_latex_passes(
+                engine, tmp_path, tex_path.name, latex_source, timeout, None, draft
+            )
+        else:
+            # kpathsea sucht Formate auch im Arbeitsverzeichnis
+            (tmp_path / fmt_path.name).symlink_to(fmt_path)
             try:
-                result = subprocess.run(
-                    ["tectonic", str(tex_path)],
-                    cwd=tmp_path,
-                    capture_output=True,
-                    text=True,
-                    check=False,
+                pass_durations = await _run_latex_passes(
+                    engine, tmp_path, tex_path.name, latex_source, timeout, fmt_path.stem, draft
                 )
-            except FileNotFoundError:
-                # Defensive: in case the binary disappears between which() and run()
-                raise RuntimeError("'tectonic' not found on PATH. Please install it.")
-            if result.returncode != 0:
-                raise RuntimeError(
-                    f"Tectonic failed (code {result.returncode}). stdout:\n{result.stdout}\nstderr:\n{result.stderr}"
+            except CompileTimeout:
+                raise
+            except RuntimeError:
+                # Ohne Format gegenprüfen: klappt es dann, ist das Format unbrauchbar
+                # (z.B. nach einem TeX-Update) und wird verworfen.
+                pass_durations = await _run_latex_passes(
+                    engine, tmp_path, tex_path.name, latex_source, timeout, None, draft
                 )
-        else:
-            # Fallback using (pdf|xe)latex; run twice to resolve refs.
-            latex_cmd = [engine, "-interaction=nonstopmode", "-halt-on-error", tex_path.name]
-            for i in range(2):
-                try:
-                    result = subprocess.run(
-                        latex_cmd,
-                        cwd=tmp_path,
-                        capture_output=True,
-                        text=True,
-                        check=False,
-                    )
-                except FileNotFoundError:
-                    raise RuntimeError(f"'{engine}' not found on PATH. Please install a LaTeX engine.")
-                if result.returncode != 0:
-                    raise RuntimeError(
-                        f"{engine} failed (code {result.returncode}). stdout:\n{result.stdout}\nstderr:\n{result.stderr}"
-                    )
-
-        pdf_path = tmp_path / "main.pdf"
-        if not pdf_path.exists():
-            raise RuntimeError("PDF not produced. Check LaTeX source.")
-
-        # Move PDF to a stable temp file outside the ctx so FileResponse can stream it
-        final_tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        final_tmp.close()
-        Path(final_tmp.name).write_bytes(pdf_path.read_bytes())
-        return str(Path(final_tmp.name).resolve())
+                _discard_format(fmt_path)
+
+    pdf_path = tmp_path / "main.pdf"
+    if not pdf_path.exists():
+        raise RuntimeError("PDF not produced. Check LaTeX source.")
+
+    # Kein Kopieren: das PDF bleibt im Arbeitsverzeichnis, bis der Aufrufer aufräumt
+    log_path = tmp_path / "main.log"
+    log = log_path.read_text(encoding="utf-8", errors="replace") if log_path.exists() else ""
+    return CompileResult(str(pdf_path.resolve()), engine, pass_durations, log)
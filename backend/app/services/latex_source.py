@@ -0,0 +1,102 @@
+import re
+from typing import Optional
+
+
+# Ein einziger Scan über den Text. Jedes Token beginnt mit `, \\ oder p/P; über diese
+# Zeichenklasse springt die Regex-Engine schnell, der Rest wird per Lookbehind geprüft.
+_TOKEN_RE = re.compile(
+    r"[`\\pP]"
+    r"(?:(?<=`)(?P<fence>(?=``))"
+    r"|(?<=\\)(?:(?P<docclass>documentclass)"
+    r"|(?P<begin_doc>begin\{document\})"
+    r"|(?P<xe_package>(?i:\s*(?:usepackage|requirepackage)\s*\{\s*(?:fontspec|unicode-math)\s*\}))"
+    r"|(?P<xe_command>(?i:setmainfont|newfontfamily)))"
+    r"|(?<=[pP])(?P<polyglossia>(?i:olyglossia)))"
+)
+_FENCE_OPEN_RE = re.compile(r"```(?i:latex)?\n")
+_DOCCLASS_ARGS_RE = re.compile(r"\s*(?:\[(?P<options>[^\]]*)\])?\s*\{\s*(?P<cls>[^}]*?)\s*\}")
+
+
+class SourceAnalysis:
+    """
+    Everything the backend needs to know about a piece of (LLM) output, from one scan:
+
+    - `stripped`: content of the first ```latex fence, else the trimmed text
+      (what strip_code_fences used to return)
+    - `latex`: best-effort LaTeX document — fence content, else from \\documentclass,
+      else from \\begin{document}, else the trimmed text (what _extract_latex used to return)
+    - `document_class` / `class_options` of the first \\documentclass (None if absent)
+    - `needs_xelatex`: fontspec/unicode-math/polyglossia or XeLaTeX font commands
+      inside `stripped`
+    """
+
+    def __init__(
+        self,
+        stripped: str,
+        latex: str,
+        fenced: bool,
+        document_class: Optional[str],
+        class_options: Optional[str],
+        needs_xelatex: bool,
+    ):
+        self.stripped = stripped
+        self.latex = latex
+        self.fenced = fenced
+        self.document_class = document_class
+        self.class_options = class_options
+        self.needs_xelatex = needs_xelatex
+
+
+def analyze_source(text: str) -> SourceAnalysis:
+    """
+    Analyzes `text` in a single regex pass. Not cached: the result holds the user's
+    document; callers pass the analysis on instead of scanning again.
+    """
+    text = text or ""
+    fence_start = fence_end = None
+    begin_doc = None
+    docclasses = []
+    xe_positions = []
+    for m in _TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind == "fence":
+            if fence_start is None:
+                # Nur ```(latex)\n öffnet einen Block, das nächste ``` danach schließt ihn
+                opening = _FENCE_OPEN_RE.match(text, m.start())
+                if opening:
+                    fence_start = opening.end()
+            elif fence_end is None and m.start() >= fence_start:
+                fence_end = m.start()
+        elif kind == "docclass":
+            docclasses.append(m)
+        elif kind == "begin_doc":
+            if begin_doc is None:
+                begin_doc = m.start()
+        else:
+            xe_positions.append(m.start())
+
+    fenced = fence_start is not None and fence_end is not None
+    if fenced:
+        stripped = text[fence_start:fence_end].strip()
+        latex = stripped
+        region = (fence_start, fence_end)
+    else:
+        stripped = text.strip()
+        region = (0, len(text))
+        if docclasses:
+            latex = text[docclasses[0].start():].strip()
+        elif begin_doc is not None:
+            latex = text[begin_doc:].strip()
+        else:
+            latex = stripped
+
+    document_class = class_options = None
+    docclass = next((m for m in docclasses if region[0] <= m.start() < region[1]), None)
+    if docclass is not None:
+        args = _DOCCLASS_ARGS_RE.match(text, docclass.end())
+        if args:
+            document_class = args.group("cls")
+            class_options = args.group("options")
+
+    needs_xelatex = any(region[0] <= pos < region[1] for pos in xe_positions)
+    return SourceAnalysis(stripped, latex, fenced, document_class, class_options, needs_xelatex)
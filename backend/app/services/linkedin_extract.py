@@ -0,0 +1,219 @@
+import json
+import re
+from html.parser import HTMLParser
+from typing import Any, Optional
+
+
+# Inhalte dieser Elemente tragen nichts zum Profil bei
+_SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "iframe", "canvas",
+    "nav", "footer", "aside", "form", "button", "select", "dialog",
+}
+_VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+}
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt",
+    "figcaption", "figure", "header", "li", "main", "ol", "p", "section",
+    "table", "tr", "ul", "br", "hr",
+}
+_HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+_META_KEYS = {"og:title", "og:description", "description", "profile:first_name", "profile:last_name"}
+# JSON-LD-Felder ohne Nutzen für den Lebenslauf
+_JSONLD_DROP = {"@context", "@id", "image", "sameAs", "url", "interactionStatistic", "potentialAction", "logo"}
+_JSONLD_SKIP_TYPES = {"WebPage", "WebSite", "BreadcrumbList", "ProfilePage"}
+_HIDDEN_STYLE_RE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.I)
+_WS_RE = re.compile(r"\s+")
+
+
+def _prune_jsonld(value: Any, depth: int = 0) -> Any:
+    if depth > 6:
+        return None
+    if isinstance(value, dict):
+        pruned = {}
+        for key, item in value.items():
+            if key in _JSONLD_DROP:
+                continue
+            item = _prune_jsonld(item, depth + 1)
+            if item not in (None, "", [], {}):
+                pruned[key] = item
+        return pruned
+    if isinstance(value, list):
+        return [v for v in (_prune_jsonld(v, depth + 1) for v in value) if v not in (None, "", [], {})]
+    if isinstance(value, str):
+        return _WS_RE.sub(" ", value).strip()
+    return value
+
+
+def _jsonld_entities(data: Any) -> list:
+    """Flattens @graph containers; keeps Person/Organization/... entities, drops page metadata."""
+    if isinstance(data, list):
+        return [e for item in data for e in _jsonld_entities(item)]
+    if isinstance(data, dict):
+        if "@graph" in data:
+            return _jsonld_entities(data["@graph"])
+        if data.get("@type") in _JSONLD_SKIP_TYPES:
+            return []
+        return [data]
+    return []
+
+
+class ProfileTextExtractor(HTMLParser):
+    """
+    Incremental HTML-to-text extractor for public profile pages.
+
+    Feed HTML in chunks (`feed`), then call `finish()`. Script/style/navigation
+    and hidden elements are dropped; JSON-LD blocks and profile meta tags are
+    kept as compact structured data; visible text is emitted one line per block
+    with headings as `## ...` and list items as `- ...`. Output stops growing
+    once `max_chars` is reached (`truncated` is set).
+    """
+
+    def __init__(self, max_chars: int = 40_000):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.truncated = False
+        self.title = ""
+        self.meta: dict[str, str] = {}
+        self.jsonld: list = []
+        self._lines: list[str] = []
+        self._size = 0
+        self._current: list[str] = []
+        self._prefix = ""
+        self._skip_depth = 0
+        self._stack: list[tuple[str, bool]] = []
+        self._in_title = False
+        self._jsonld_buf: Optional[list[str]] = None
+
+    # -------- Parser-Callbacks --------
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        attributes = dict(attrs)
+        if tag == "meta":
+            key = attributes.get("property") or attributes.get("name") or ""
+            content = attributes.get("content")
+            if key in _META_KEYS and content:
+                self.meta[key] = _WS_RE.sub(" ", content).strip()
+            return
+        if tag in _VOID_TAGS:
+            if tag in _BLOCK_TAGS and not self._skip_depth:
+                self._flush()
+            return
+
+        if tag == "script" and (attributes.get("type") or "").lower() == "application/ld+json":
+            self._jsonld_buf = []
+        hidden = (
+            tag in _SKIP_TAGS
+            or "hidden" in attributes
+            or attributes.get("aria-hidden") == "true"
+            or bool(_HIDDEN_STYLE_RE.search(attributes.get("style") or ""))
+        )
+        self._stack.append((tag, hidden))
+        if hidden:
+            self._skip_depth += 1
+            return
+        if self._skip_depth:
+            return
+        if tag == "title":
+            self._in_title = True
+        elif tag in _HEADINGS:
+            self._flush()
+            self._prefix = "## "
+        elif tag == "li":
+            self._flush()
+            self._prefix = "- "
+        elif tag in _BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _VOID_TAGS:
+            return
+        # Bis zum passenden Start-Tag abbauen (HTML ist oft nicht sauber verschachtelt)
+        if not any(t == tag for t, _ in self._stack):
+            return
+        while self._stack:
+            open_tag, hidden = self._stack.pop()
+            if hidden:
+                self._skip_depth -= 1
+            if open_tag == "script" and self._jsonld_buf is not None:
+                self._finish_jsonld()
+            if open_tag == tag:
+                break
+        if self._skip_depth:
+            return
+        if tag == "title":
+            self._in_title = False
+        elif tag in _HEADINGS or tag in _BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data: str) -> None:
+        if self._jsonld_buf is not None:
+            self._jsonld_buf.append(data)
+            return
+        if self._skip_depth:
+            return
+        if self._in_title:
+            self.title += data
+            return
+        self._current.append(data)
+
+    # -------- Ausgabe --------
+
+    def _finish_jsonld(self) -> None:
+        raw = "".join(self._jsonld_buf or [])
+        self._jsonld_buf = None
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return
+        for entity in _jsonld_entities(data):
+            pruned = _prune_jsonld(entity)
+            if not pruned:
+                continue
+            size = len(json.dumps(pruned, ensure_ascii=False, separators=(",", ":"))) + 1
+            if self._size + size > self.max_chars:
+                self.truncated = True
+                return
+            self.jsonld.append(pruned)
+            self._size += size
+
+    def _flush(self) -> None:
+        text = _WS_RE.sub(" ", "".join(self._current)).strip()
+        self._current = []
+        prefix, self._prefix = self._prefix, ""
+        if not text or self.truncated:
+            return
+        line = prefix + text
+        # Wiederholungen (z.B. mobile/desktop-Varianten) unterdrücken
+        if self._lines and self._lines[-1] == line:
+            return
+        if self._size + len(line) + 1 > self.max_chars:
+            self.truncated = True
+            return
+        self._lines.append(line)
+        self._size += len(line) + 1
+
+    def finish(self) -> str:
+        self.close()
+        self._flush()
+        parts = []
+        header = [f"Title: {_WS_RE.sub(' ', self.title).strip()}"] if self.title.strip() else []
+        header += [f"{key}: {value}" for key, value in self.meta.items()]
+        if header:
+            parts.append("\n".join(header))
+        if self.jsonld:
+            parts.append(
+                "Structured data (JSON-LD):\n"
+                + "\n".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) for e in self.jsonld)
+            )
+        if self._lines:
+            parts.append("Page text:\n" + "\n".join(self._lines))
+        return "\n\n".join(parts)
+
+
+def extract_profile_text(html: str, max_chars: int = 40_000) -> str:
+    """Convenience wrapper for already fully loaded HTML."""
+    extractor = ProfileTextExtractor(max_chars=max_chars)
+    extractor.feed(html)
+    return extractor.finish()
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from .settings import env_float, env_int
+
+
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def normalize_prompt_text(text: str) -> str:
+    """
+    Normalizes prompt text for cache keys: Unicode NFC, unified line endings,
+    no trailing whitespace and at most one empty line in a row.
+    """
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = "\n".join(line.rstrip() for line in text.split("\n"))
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def prompt_cache_key(model: str, messages: list[dict], params: Optional[dict] = None) -> str:
+    """Cache key of a completion: model, normalized messages and request parameters."""
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": m["role"], "content": normalize_prompt_text(m["content"])}
+            for m in messages
+        ],
+    }
+    # response_format, temperature usw. ändern die Antwort; ohne Parameter bleibt der Key wie bisher
+    if params:
+        payload["params"] = params
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Base class with hit/miss bookkeeping; subclasses implement _get/_set."""
+
+    backend = "none"
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        if value:
+            self._set(key, value)
+
+    def _get(self, key: str) -> Optional[str]:
+        return None
+
+    def _set(self, key: str, value: str) -> None:
+        pass
+
+    def _size(self) -> int:
+        return 0
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": self._size(),
+            }
+
+
+class MemoryLLMCache(LLMCache):
+    """In-process LRU with TTL."""
+
+    backend = "memory"
+
+    def __init__(self, ttl: float, max_entries: int):
+        super().__init__(ttl, max_entries)
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            created, value = item
+            if time.monotonic() - created > self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def _size(self) -> int:
+        return len(self._items)
+
+
+class SqliteLLMCache(LLMCache):
+    """File-backed cache (survives restarts, shareable between worker processes)."""
+
+    backend = "sqlite"
+
+    def __init__(self, path: Path, ttl: float, max_entries: int):
+        super().__init__(ttl, max_entries)
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if now - created > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            return value
+
+    def _set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # Abgelaufene Einträge entfernen, danach LRU auf max_entries kürzen
+            self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,))
+            cur = self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.evictions += max(0, cur.rowcount)
+
+    def _size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+def create_llm_cache() -> LLMCache:
+    backend = os.getenv("LLM_CACHE_BACKEND", "memory").strip().lower()
+    ttl = env_float("LLM_CACHE_TTL", 3600.0)
+    max_entries = env_int("LLM_CACHE_MAX_ENTRIES", 512)
+    if backend == "sqlite":
+        path = Path(
+            os.getenv("LLM_CACHE_PATH", str(Path(tempfile.gettempdir()) / "cv-llm-cache.sqlite3"))
+        )
+        return SqliteLLMCache(path, ttl, max_entries)
+    if backend == "memory":
+        return MemoryLLMCache(ttl, max_entries)
+    return LLMCache(ttl, max_entries)
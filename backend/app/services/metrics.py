@@ -0,0 +1,216 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from .settings import env_bool
+
+
+# Ausgeschaltet kosten observe()/span() nur eine Abfrage dieses Flags
+ENABLED = env_bool("METRICS_ENABLED", False)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = labelnames
+        # labels -> ([count je Bucket], sum, count)
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if idx < len(self.buckets):
+                series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = _format_labels(self.labelnames, labels, f'le="{bound:g}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                inf = _format_labels(self.labelnames, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf} {count}")
+                plain = _format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{plain} {total:g}")
+                lines.append(f"{self.name}_count{plain} {count}")
+        return lines
+
+
+openai_seconds = Histogram(
+    "cv_openai_request_seconds", "OpenAI call latency by service function.",
+    LATENCY_BUCKETS, ("function", "cache"),
+)
+openai_tokens = Histogram(
+    "cv_openai_tokens", "Tokens per OpenAI call by service function.",
+    TOKEN_BUCKETS, ("function", "kind"),
+)
+compile_pass_seconds = Histogram(
+    "cv_latex_pass_seconds", "Duration of a single LaTeX engine pass.",
+    LATENCY_BUCKETS, ("engine",),
+)
+compiles = Counter("cv_latex_compiles_total", "LaTeX compiles by chosen engine and outcome.", ("engine", "outcome"))
+queue_wait_seconds = Histogram(
+    "cv_compile_queue_wait_seconds", "Time a compile waited for a slot in the compile pool.",
+    LATENCY_BUCKETS,
+)
+coalesced = Counter(
+    "cv_coalesced_requests_total", "Calls that joined an identical in-flight job instead of starting one.",
+    ("flight",),
+)
+pdf_optimize_seconds = Histogram(
+    "cv_pdf_optimize_seconds", "Duration of the PDF optimization stage.", LATENCY_BUCKETS,
+)
+pdf_bytes = Histogram(
+    "cv_pdf_bytes", "PDF size before and after the optimization stage.", SIZE_BUCKETS, ("stage",),
+)
+request_seconds = Histogram(
+    "cv_http_request_seconds", "HTTP request latency by route.", LATENCY_BUCKETS, ("route", "status"),
+)
+response_bytes = Histogram(
+    "cv_http_response_bytes", "HTTP response size by route (responses with Content-Length).",
+    SIZE_BUCKETS, ("route",),
+)
+
+REGISTRY = (
+    openai_seconds, openai_tokens, compile_pass_seconds, compiles,
+    queue_wait_seconds, coalesced, pdf_optimize_seconds, pdf_bytes, request_seconds, response_bytes,
+)
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------- Helfer für die Service-Module --------
+
+def observe_openai(function: str, seconds: float, usage: Optional[dict] = None, cache_hit: bool = False) -> None:
+    if not ENABLED:
+        return
+    openai_seconds.observe(seconds, function, "hit" if cache_hit else "miss")
+    if usage and not cache_hit:
+        openai_tokens.observe(usage.get("prompt_tokens", 0), function, "prompt")
+        openai_tokens.observe(usage.get("completion_tokens", 0), function, "completion")
+        openai_tokens.observe(usage.get("cached_tokens", 0), function, "cached")
+
+
+def observe_compile(engine: str, pass_durations: list[float], ok: bool = True) -> None:
+    if not ENABLED:
+        return
+    compiles.inc(engine, "ok" if ok else "error")
+    for seconds in pass_durations:
+        compile_pass_seconds.observe(seconds, engine)
+
+
+def observe_queue_wait(seconds: float) -> None:
+    if ENABLED:
+        queue_wait_seconds.observe(seconds)
+
+
+def observe_coalesced(flight: str) -> None:
+    if ENABLED:
+        coalesced.inc(flight)
+
+
+def observe_pdf_optimize(seconds: float, original_size: int, size: int) -> None:
+    if not ENABLED:
+        return
+    pdf_optimize_seconds.observe(seconds)
+    pdf_bytes.observe(original_size, "original")
+    pdf_bytes.observe(size, "optimized")
+
+
+# -------- Server-Timing --------
+
+_timings: ContextVar[Optional[list]] = ContextVar("server_timings", default=None)
+_NOOP = nullcontext()
+
+
+def start_request_timings() -> list:
+    """Collects spans of the current request (call from the middleware)."""
+    timings: list = []
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def _span(name: str, timings: list) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.append((name, time.perf_counter() - started))
+
+
+def span(name: str):
+    """Times a block as a Server-Timing span; a shared no-op context when disabled."""
+    if not ENABLED:
+        return _NOOP
+    timings = _timings.get()
+    if timings is None:
+        return _NOOP
+    return _span(name, timings)
+
+
+def record_span(name: str, seconds: float) -> None:
+    """Adds an already measured span to the current request."""
+    if not ENABLED:
+        return
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def server_timing_header(timings: list) -> str:
+    # Gleichnamige Spans (z.B. mehrere Compile-Pässe) aufsummieren
+    totals: dict[str, float] = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
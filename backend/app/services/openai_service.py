@@ -1,8 +1,21 @@
+import json
 import os
 import re
-from typing import Optional
+import threading
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 
-from openai import OpenAI
+from . import metrics
+from .http_clients import get_openai_client
+from .latex_patch import HEADER_KEY, PatchError, apply_section_patch, split_sections, validate_latex
+from .latex_source import analyze_source
+from .llm_cache import create_llm_cache, prompt_cache_key
+from .settings import env_int
+from .single_flight import SingleFlight
+from .tokens import count_message_tokens, tokenizer_name
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 
 SYSTEM_PROMPT = """
@@ -36,115 +49,393 @@ Developer: Beginne mit einer kurzen, konzeptuellen Checkliste (3–7 Punkte), di
 """
 
 
-def _client() -> OpenAI:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY not set")
-    return OpenAI(api_key=api_key)
+# Antwort-Cache für identische Prompts (Retries, Doppelklicks)
+llm_cache = create_llm_cache()
+# Gleichzeitige identische Prompts (Doppelklick, zwei Tabs) teilen sich einen API-Call
+llm_flight = SingleFlight("openai")
 
+# Obergrenze für Prompt-Tokens (Vorlage + Eingabe); größere Eingaben werden vor dem Aufruf abgelehnt
+PROMPT_TOKEN_BUDGET = env_int("OPENAI_PROMPT_TOKEN_BUDGET", 100_000)
 
-def generate_latex_via_openai(input_text: str, template: Optional[str] = None) -> str:
-    """
-    Calls OpenAI to transform input_text into full LaTeX code for a CV.
-    If a LaTeX template is provided, instructs the model to adapt and fill it.
-    Returns raw LaTeX (no code fences).
-    """
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+def _client() -> "AsyncOpenAI":
+    return get_openai_client()
+
+
+def _model() -> str:
+    return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+
+# Aufbau aller Prompts: stabiles Präfix (System-Prompt, dann Vorlage) vor dem variablen Teil
+# (Notizen, Profil, Anweisung). So kann der Anbieter das Präfix zwischen Aufrufen wiederverwenden.
+
+def _template_message(template: Optional[str]) -> list[dict]:
+    if not template:
+        return []
+    # Wortgleich für Generierung und LinkedIn-Import, damit beide dasselbe Präfix teilen
+    return [{
+        "role": "user",
+        "content": (
+            "Nutze die folgende LaTeX-Vorlage als Grundlage für den Lebenslauf. Erhalte Struktur, "
+            "Kommandos und Stil, fülle Inhalte mit den Daten aus der nächsten Nachricht und lasse "
+            "nicht belegte Bereiche sauber weg.\n\n"
+            f"Vorlage:\n{template}"
+        ),
+    }]
+
+
+def _generate_messages(input_text: str, template: Optional[str]) -> list[dict]:
     # Verwende den zentral definierten System-Prompt für die CV-Generierung
-    system_msg = SYSTEM_PROMPT
     user_msg = (
         "Erzeuge aus den folgenden Notizen einen professionellen Lebenslauf. "
         "Gib nach Checkliste und kurzer Analyse ausschließlich vollständigen LaTeX-Quelltext aus.\n\n"
         f"Notizen:\n{input_text.strip()}\n"
     )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *_template_message(template),
+        {"role": "user", "content": user_msg},
+    ]
 
-    if template:
-        user_msg += (
-            "\nNutze die folgende LaTeX-Vorlage als Grundlage. Erhalte Struktur, Kommandos und Stil, "
-            "fülle Inhalte basierend auf den Notizen und lasse nicht belegte Bereiche sauber weg.\n\n"
-            f"Vorlage:\n{template}"
-        )
-
-    client = _client()
-    completion = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ],
-    )
-
-    raw = completion.choices[0].message.content or ""
-    return _extract_latex(raw)
 
-
-def edit_latex_via_openai(current_latex: str, instruction: str) -> str:
-    """
-    Calls OpenAI to modify an existing LaTeX document according to a natural-language instruction.
-    Returns full, compilable LaTeX without Markdown fences.
-    """
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+def _edit_messages(current_latex: str, instruction: str) -> list[dict]:
     # Beim Editieren weiterhin strikt nur LaTeX zurückgeben, ohne zusätzliche Vorrede
     system_msg = (
         "You are an expert LaTeX assistant. You return complete, compilable LaTeX only, "
         "with no Markdown code fences or commentary. Preserve the document class, preamble, "
         "and overall structure unless the instruction explicitly requests otherwise."
     )
+    # Dokument vor der Anweisung: Folgeanweisungen zum selben Dokument teilen das Präfix
     user_msg = (
         "You are given an existing LaTeX document and an edit request. "
         "Apply the requested change to the LaTeX. Return the FULL updated LaTeX document.\n\n"
-        f"Instruction:\n{instruction.strip()}\n\n"
-        f"Current LaTeX:\n{current_latex}"
+        f"Current LaTeX:\n{current_latex}\n\n"
+        f"Instruction:\n{instruction.strip()}"
     )
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": user_msg},
+    ]
 
-    client = _client()
-    completion = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ],
+
+def _linkedin_messages(profile_text: str, template: Optional[str]) -> list[dict]:
+    # Nutze den zentralen System-Prompt; die Extraktion der Profildaten wird im User-Kontext beschrieben
+    user_msg = (
+        "Du erhältst den aus einem LinkedIn-Profil extrahierten Inhalt: Seitentitel/Meta-Angaben, "
+        "strukturierte Daten (JSON-LD) und den sichtbaren Seitentext (## = Überschrift, - = Listenpunkt). "
+        "Er kann unvollständig oder verrauscht sein.\n"
+        "Extrahiere Name, Headline/Zusammenfassung, Erfahrung (Firmen, Rollen, Daten, Bulletpoints), Ausbildung, Skills, Projekte und Zertifikate.\n"
+        "Erzeuge danach gemäß Vorlage einen vollständigen, kompilierbaren LaTeX-Lebenslauf.\n\n"
+        "Profil:\n" + profile_text
     )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *_template_message(template),
+        {"role": "user", "content": user_msg},
+    ]
 
-    return completion.choices[0].message.content or ""
 
+class PromptTooLarge(ValueError):
+    """The prompt exceeds OPENAI_PROMPT_TOKEN_BUDGET; raised before any API call."""
 
-def generate_latex_from_linkedin_html(
-    profile_html: str, template: Optional[str] = None
-) -> str:
+    def __init__(self, tokens: int, budget: int):
+        super().__init__(
+            f"Input too large: about {tokens} prompt tokens, the limit is {budget}. "
+            "Shorten the input or the template."
+        )
+        self.tokens = tokens
+        self.budget = budget
+
+
+def _check_budget(messages: list[dict]) -> int:
+    # Alle Prompts: stabiles Präfix, nur die letzte Nachricht enthält Nutzerdaten. Nur das
+    # Präfix (System-Prompt, Vorlage) wird gecacht, Nutzertexte bleiben nicht im Speicher.
+    tokens = count_message_tokens(messages, stable=len(messages) - 1)
+    if tokens > PROMPT_TOKEN_BUDGET:
+        raise PromptTooLarge(tokens, PROMPT_TOKEN_BUDGET)
+    return tokens
+
+
+class PromptUsageTotals:
+    """Running prompt/cached token totals of all API calls (prefix reuse by the provider)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, usage: dict) -> None:
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += usage["prompt_tokens"]
+            self.cached_tokens += usage["cached_tokens"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tokenizer": tokenizer_name(),
+                "prompt_token_budget": PROMPT_TOKEN_BUDGET,
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+            }
+
+
+usage_totals = PromptUsageTotals()
+
+
+def _usage_dict(usage, latency: float, cache_hit: bool) -> dict:
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        # Vom Anbieter aus dem Prompt-Cache bediente Präfix-Tokens
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "total_tokens": getattr(usage, "total_tokens", 0) or 0,
+        "latency_ms": round(latency * 1000),
+        "cache_hit": cache_hit,
+    }
+
+
+async def _complete_with_usage(
+    messages: list[dict], function: str, **kwargs
+) -> tuple[str, dict]:
+    """
+    Runs a (cached) chat completion; returns the content and token usage/latency.
+    Prompts above the token budget raise PromptTooLarge without calling the API.
+    Identical prompts already in flight wait for that call instead of starting another.
+    `function` labels the call in the metrics (e.g. "generate", "edit").
+    """
+    started = time.perf_counter()
+    _check_budget(messages)
+    model = _model()
+    key = prompt_cache_key(model, messages, kwargs)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        usage = _usage_dict(None, time.perf_counter() - started, True)
+        metrics.observe_openai(function, time.perf_counter() - started, usage, cache_hit=True)
+        return cached, usage
+
+    async def call() -> tuple[str, dict]:
+        completion = await _client().chat.completions.create(model=model, messages=messages, **kwargs)
+        content = completion.choices[0].message.content or ""
+        llm_cache.set(key, content)
+        usage = _usage_dict(completion.usage, time.perf_counter() - started, False)
+        usage_totals.record(usage)
+        metrics.observe_openai(function, time.perf_counter() - started, usage)
+        return content, usage
+
+    with metrics.span("llm"):
+        return await llm_flight.do(key, call)
+
+
+async def _complete(messages: list[dict], function: str) -> str:
+    content, _ = await _complete_with_usage(messages, function)
+    return content
+
+
+def _stream(messages: list[dict], function: str) -> AsyncIterator[str]:
+    # Budget sofort prüfen, damit Streaming-Endpunkte noch mit 413 statt per SSE-Fehler antworten
+    _check_budget(messages)
+    return _stream_tokens(messages, function)
+
+
+async def _stream_tokens(messages: list[dict], function: str) -> AsyncIterator[str]:
+    started = time.perf_counter()
+    model = _model()
+    key = prompt_cache_key(model, messages)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        metrics.observe_openai(function, time.perf_counter() - started, cache_hit=True)
+        yield cached
+        return
+    client = _client()
+    # include_usage: Usage (inkl. gecachter Prompt-Tokens) kommt als letzter Chunk ohne choices
+    stream = await client.chat.completions.create(
+        model=model, messages=messages, stream=True, stream_options={"include_usage": True}
+    )
+    parts = []
+    usage = None
+    async for chunk in stream:
+        usage = getattr(chunk, "usage", None) or usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+    # Nur vollständig empfangene Antworten cachen
+    llm_cache.set(key, "".join(parts))
+    latency = time.perf_counter() - started
+    # Wie _complete_with_usage; Endpunkte ohne stream_options liefern keine Usage
+    usage = _usage_dict(usage, latency, False) if usage else None
+    if usage:
+        usage_totals.record(usage)
+    metrics.observe_openai(f"{function}_stream", latency, usage)
+
+
+async def generate_latex_via_openai(input_text: str, template: Optional[str] = None) -> str:
     """
-    Transform raw (public) LinkedIn profile HTML into a full LaTeX CV using OpenAI.
+    Calls OpenAI to transform input_text into full LaTeX code for a CV.
+    If a LaTeX template is provided, instructs the model to adapt and fill it.
     Returns raw LaTeX (no code fences).
     """
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    # Nutze den zentralen System-Prompt; die Extraktion aus HTML wird im User-Kontext beschrieben
-    system_msg = SYSTEM_PROMPT
+    latex, _ = await generate_latex_with_report(input_text, template)
+    return latex
+
+
+async def generate_latex_with_report(
+    input_text: str, template: Optional[str] = None
+) -> tuple[str, dict]:
+    """Like generate_latex_via_openai, plus token usage (incl. cached prompt tokens) and latency."""
+    raw, usage = await _complete_with_usage(_generate_messages(input_text, template), "generate")
+    return _extract_latex(raw), usage
+
+
+CV_DATA_PROMPT = (
+    "Du extrahierst aus Notizen die Daten für einen professionellen Lebenslauf und gibst "
+    "ausschließlich ein JSON-Objekt nach dem folgenden JSON-Schema aus (kein LaTeX, kein Markdown). "
+    "Formuliere Stationen als prägnante, keyword-optimierte Stichpunkte in der Sprache der Notizen, "
+    "erfinde nichts und lass Felder ohne Angaben leer bzw. null. Datumsangaben als \"MM/JJJJ\" oder \"JJJJ\", "
+    "laufende Stationen mit end = \"heute\".\n\nSchema:\n"
+)
+
+
+def _cv_data_messages(input_text: str, schema: dict) -> list[dict]:
+    # Schema im System-Prompt: stabiles Präfix, nur die Notizen ändern sich
+    system_msg = CV_DATA_PROMPT + json.dumps(schema, ensure_ascii=False, separators=(",", ":"))
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": f"Notizen:\n{input_text.strip()}"},
+    ]
+
+
+async def generate_cv_data_via_openai(input_text: str, schema: dict) -> tuple[dict, dict]:
+    """
+    Asks OpenAI for the CV as compact JSON following `schema` instead of a full LaTeX
+    document (no preamble or markup in the output). Returns the parsed, not yet
+    validated object and the token usage; raises ValueError if the reply is not JSON.
+    """
+    raw, usage = await _complete_with_usage(
+        _cv_data_messages(input_text, schema), "generate_data", response_format={"type": "json_object"}
+    )
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        raise ValueError("Model did not return JSON CV data.")
+    if not isinstance(data, dict):
+        raise ValueError("Model did not return a JSON object.")
+    return data, usage
+
+
+def stream_generate_latex_via_openai(
+    input_text: str, template: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Streaming variant of generate_latex_via_openai; yields raw model tokens."""
+    return _stream(_generate_messages(input_text, template), "generate")
+
+
+async def edit_latex_via_openai(current_latex: str, instruction: str) -> str:
+    """
+    Calls OpenAI to modify an existing LaTeX document according to a natural-language instruction.
+    Returns full, compilable LaTeX without Markdown fences.
+    """
+    return _extract_latex(await _complete(_edit_messages(current_latex, instruction), "edit"))
+
+
+def _patch_messages(current_latex: str, instruction: str) -> list[dict]:
+    sections = [key for key, _ in split_sections(current_latex)[1]]
+    system_msg = (
+        "You are an expert LaTeX assistant. You edit LaTeX CVs by returning section-level "
+        "replacements as JSON only, never the full document."
+    )
     user_msg = (
-        "Du erhältst den HTML-Inhalt eines LinkedIn-Profils (evtl. unvollständig oder verrauscht).\n"
-        "Extrahiere Name, Headline/Zusammenfassung, Erfahrung (Firmen, Rollen, Daten, Bulletpoints), Ausbildung, Skills, Projekte und Zertifikate.\n"
-        "Erzeuge danach gemäß Vorlage einen vollständigen, kompilierbaren LaTeX-Lebenslauf.\n\n"
-        "HTML:\n" + profile_html
+        "Apply the edit request to the LaTeX document below. Return a JSON object of the form "
+        '{"replacements": [{"section": "<section>", "content": "<complete new LaTeX of that section>"}]}. '
+        f'Valid values for "section": {json.dumps(sections, ensure_ascii=False)} '
+        f'("{HEADER_KEY}" is everything between \\begin{{document}} and the first \\section). '
+        "The content replaces the whole section including its \\section line; use an empty "
+        "string to remove it. Only include sections that change.\n\n"
+        f"Current LaTeX:\n{current_latex}\n\n"
+        f"Instruction:\n{instruction.strip()}"
     )
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": user_msg},
+    ]
 
-    if template:
-        user_msg += (
-            "\n\nNutze die folgende LaTeX-Vorlage als Grundlage. Erhalte Struktur und Stil; fülle sie mit den extrahierten Daten.\n\n"
-            f"Vorlage:\n{template}"
+
+def _apply_patch_response(current_latex: str, raw: str) -> str:
+    try:
+        replacements = json.loads(raw).get("replacements")
+    except (ValueError, AttributeError):
+        raise PatchError("Model did not return a JSON patch.")
+    patched = apply_section_patch(current_latex, replacements or [])
+    validate_latex(patched)
+    return patched
+
+
+async def edit_latex_with_report(
+    current_latex: str, instruction: str, mode: str = "full"
+) -> tuple[str, dict]:
+    """
+    Edits LaTeX in "full" mode (model returns the whole document) or "patch" mode
+    (model returns section replacements that are applied and validated locally).
+    A failing patch falls back to full mode. Returns the LaTeX and a report with
+    the effective mode, token usage and latency of each model call.
+    """
+    started = time.perf_counter()
+    report = {"requested_mode": mode, "mode": mode, "fallback": None, "calls": []}
+    latex = None
+    if mode == "patch":
+        try:
+            messages = _patch_messages(current_latex, instruction)
+            raw, usage = await _complete_with_usage(
+                messages, "edit_patch", response_format={"type": "json_object"}
+            )
+            report["calls"].append({"mode": "patch", **usage})
+            latex = _apply_patch_response(current_latex, raw)
+        except PatchError as e:
+            report["mode"] = "full"
+            report["fallback"] = str(e)
+    if latex is None:
+        # Vollmodus liefert die rohe Modellantwort (Checkliste, Code-Fences) -> wie /api/generate extrahieren
+        raw, usage = await _complete_with_usage(
+            _edit_messages(current_latex, instruction), "edit"
         )
+        latex = _extract_latex(raw)
+        report["calls"].append({"mode": "full", **usage})
+    report["total_tokens"] = sum(call["total_tokens"] for call in report["calls"])
+    report["cached_tokens"] = sum(call["cached_tokens"] for call in report["calls"])
+    report["latency_ms"] = round((time.perf_counter() - started) * 1000)
+    return latex, report
 
-    client = _client()
-    completion = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ],
-    )
 
-    raw = completion.choices[0].message.content or ""
+def stream_edit_latex_via_openai(current_latex: str, instruction: str) -> AsyncIterator[str]:
+    """Streaming variant of edit_latex_via_openai; yields raw model tokens."""
+    return _stream(_edit_messages(current_latex, instruction), "edit")
+
+
+async def generate_latex_from_linkedin_profile(
+    profile_text: str, template: Optional[str] = None
+) -> str:
+    """
+    Transform an extracted (public) LinkedIn profile (see linkedin_extract) into a full
+    LaTeX CV using OpenAI. Returns raw LaTeX (no code fences).
+    """
+    raw = await _complete(_linkedin_messages(profile_text, template), "linkedin")
     return _extract_latex(raw)
 
 
+def stream_latex_from_linkedin_profile(
+    profile_text: str, template: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Streaming variant of generate_latex_from_linkedin_profile; yields raw model tokens."""
+    return _stream(_linkedin_messages(profile_text, template), "linkedin")
+
+
 def _extract_latex(text: str) -> str:
     """Extract likely LaTeX from a response that may include preamble text.
 
@@ -156,20 +447,72 @@ def _extract_latex(text: str) -> str:
     """
     if not text:
         return ""
-    # Strip code fences if the model added them despite instructions
-    fence = re.search(r"```(?:latex)?\n([\s\S]*?)```", text, re.IGNORECASE)
-    if fence:
-        return fence.group(1).strip()
-
-    # Try to capture from \documentclass to end
-    m = re.search(r"(\\documentclass[\s\S]*)", text)
-    if m:
-        return m.group(1).strip()
-
-    # Fallback: from begin{document}
-    m = re.search(r"(\\begin\{document\}[\s\S]*)", text)
-    if m:
-        return m.group(1).strip()
-
-    # As last resort, return trimmed text
-    return text.strip()
+    # Fences, \documentclass und \begin{document} in einem Durchlauf (latex_source)
+    return analyze_source(text).latex
+
+
+class LatexStreamExtractor:
+    """
+    Incremental counterpart of _extract_latex for streamed responses.
+
+    Text before the LaTeX (checklist, reasoning) is held back until either a code fence
+    or \\documentclass shows up; from then on LaTeX is forwarded as it arrives and a
+    closing fence ends the output. If neither marker appears, finish() falls back to
+    _extract_latex on the whole response.
+    """
+
+    _FENCE_OPEN = re.compile(r"```(?:latex)?\n", re.IGNORECASE)
+    _DOCCLASS = "\\documentclass"
+    # So viele Zeichen zurückhalten, dass ein Fence über Chunk-Grenzen erkannt wird
+    _HOLDBACK = 2
+
+    def __init__(self):
+        self._buffer = ""
+        self._started = False
+        self._done = False
+        self._emitted = False
+
+    def feed(self, chunk: str) -> str:
+        if self._done or not chunk:
+            return ""
+        self._buffer += chunk
+        if not self._started:
+            fence = self._FENCE_OPEN.search(self._buffer)
+            doc_idx = self._buffer.find(self._DOCCLASS)
+            if fence and (doc_idx < 0 or fence.start() < doc_idx):
+                self._buffer = self._buffer[fence.end():]
+            elif doc_idx >= 0:
+                self._buffer = self._buffer[doc_idx:]
+            else:
+                return ""
+            self._started = True
+        return self._drain(final=False)
+
+    def _drain(self, final: bool) -> str:
+        end = self._buffer.find("```")
+        if end >= 0:
+            out, self._buffer, self._done = self._buffer[:end], "", True
+        elif final:
+            out, self._buffer = self._buffer, ""
+        else:
+            cut = max(0, len(self._buffer) - self._HOLDBACK)
+            out, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        if out:
+            self._emitted = True
+        return out
+
+    def finish(self) -> str:
+        if self._done:
+            return ""
+        self._done = True
+        if self._started:
+            return self._drain(final=True).rstrip()
+        out = _extract_latex(self._buffer)
+        self._buffer = ""
+        if out:
+            self._emitted = True
+        return out
+
+    @property
+    def emitted(self) -> bool:
+        return self._emitted
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+from . import metrics
+from .settings import env_bool
+
+
+# Reihenfolge ist die Pipeline: erst Ghostscript (Fonts), dann qpdf (Linearisieren)
+TOOL_NAMES = ("gs", "qpdf")
+
+
+def _command(tool: str, source: Path, target: Path) -> list[str]:
+    if tool == "gs":
+        # pdfwrite schreibt das PDF neu: Fonts als Subsets, doppelte Fonts/Bilder zusammengelegt,
+        # Streams komprimiert. Bilder werden nicht heruntergerechnet.
+        return [
+            "gs", "-q", "-dNOPAUSE", "-dBATCH", "-dSAFER",
+            "-sDEVICE=pdfwrite",
+            "-dCompatibilityLevel=1.5",
+            "-dSubsetFonts=true",
+            "-dCompressFonts=true",
+            "-dEmbedAllFonts=true",
+            "-dDetectDuplicateImages=true",
+            "-dAutoRotatePages=/None",
+            f"-sOutputFile={target}",
+            str(source),
+        ]
+    return [
+        "qpdf",
+        "--linearize",
+        "--object-streams=generate",
+        "--compress-streams=y",
+        "--recompress-flate",
+        "--compression-level=9",
+        str(source),
+        str(target),
+    ]
+
+
+class OptimizeResult:
+    """Sizes before/after the pipeline, its duration and the tools whose output was kept."""
+
+    def __init__(self, original_size: int, size: int, seconds: float, tools: list[str]):
+        self.original_size = original_size
+        self.size = size
+        self.seconds = seconds
+        self.tools = tools
+
+    def headers(self) -> dict:
+        return {
+            "X-Pdf-Original-Size": str(self.original_size),
+            "X-Pdf-Size": str(self.size),
+            "X-Pdf-Optimize-Ms": f"{self.seconds * 1000:.0f}",
+            "X-Pdf-Optimizer": ",".join(self.tools) or "none",
+        }
+
+
+class PdfOptimizer:
+    """
+    Optional post-processing of compiled PDFs with locally installed tools.
+
+    Ghostscript rewrites the PDF with subset, deduplicated fonts and compressed streams;
+    its output is kept only if it is smaller. qpdf then linearizes the file for fast
+    web view and packs objects into compressed object streams. Missing tools are
+    skipped; if a tool fails, the previous stage's PDF is used, so optimizing never
+    fails a render.
+    """
+
+    def __init__(self, enabled: bool, tools: list[str]):
+        self.tools = [name for name in TOOL_NAMES if name in tools and shutil.which(name)]
+        self.enabled = enabled and bool(self.tools)
+        self.runs = 0
+        self.failures = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.seconds = 0.0
+
+    async def _run(self, cmd: list[str], timeout: Optional[float]) -> bool:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            returncode = await asyncio.wait_for(proc.wait(), timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            proc.kill()
+            await proc.wait()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            return False
+        # qpdf: 3 = erfolgreich mit Warnungen
+        return returncode == 0 or (cmd[0] == "qpdf" and returncode == 3)
+
+    async def optimize(self, pdf_path: Path, timeout: Optional[float] = None) -> Optional[OptimizeResult]:
+        """Optimizes `pdf_path` in place; None if disabled."""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        original_size = pdf_path.stat().st_size
+        current, size, applied = pdf_path, original_size, []
+        for tool in self.tools:
+            target = pdf_path.with_name(f"{pdf_path.stem}.{tool}.pdf")
+            try:
+                ok = await self._run(_command(tool, current, target), timeout)
+            except FileNotFoundError:
+                ok = False
+            new_size = target.stat().st_size if ok and target.exists() else 0
+            # Neu geschriebenes PDF nur übernehmen, wenn es kleiner ist; qpdf linearisiert immer
+            if not new_size or (tool == "gs" and new_size >= size):
+                self.failures += not new_size
+                target.unlink(missing_ok=True)
+                continue
+            if current != pdf_path:
+                current.unlink(missing_ok=True)
+            current, size = target, new_size
+            applied.append(tool)
+        if current != pdf_path:
+            os.replace(current, pdf_path)
+
+        seconds = time.perf_counter() - started
+        self.runs += 1
+        self.bytes_before += original_size
+        self.bytes_after += size
+        self.seconds += seconds
+        metrics.observe_pdf_optimize(seconds, original_size, size)
+        return OptimizeResult(original_size, size, seconds, applied)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "tools": self.tools,
+            "runs": self.runs,
+            "failures": self.failures,
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after,
+            "saved_ratio": round(1 - self.bytes_after / self.bytes_before, 4) if self.bytes_before else 0.0,
+            "avg_ms": round(self.seconds * 1000 / self.runs, 1) if self.runs else 0.0,
+        }
+
+
+def create_pdf_optimizer() -> PdfOptimizer:
+    tools = os.getenv("PDF_OPTIMIZE_TOOLS", ",".join(TOOL_NAMES))
+    return PdfOptimizer(
+        enabled=env_bool("PDF_OPTIMIZE", False),
+        tools=[name.strip() for name in tools.split(",") if name.strip()],
+    )
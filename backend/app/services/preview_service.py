@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from .latex_service import _run, compile_latex
+from .render_cache import RenderCache, normalize_latex
+from .settings import env_int
+
+
+# pdftoppm (poppler) rastert eine Seite schneller als Ghostscript; gs ist der Fallback
+RASTERIZER_NAMES = ("pdftoppm", "gs")
+MEDIA_TYPES = {"png": "image/png", "webp": "image/webp"}
+
+DEFAULT_DPI = env_int("PREVIEW_DPI", 96)
+MIN_DPI = 36
+MAX_DPI = max(MIN_DPI, env_int("PREVIEW_MAX_DPI", 200))
+
+_rasterizer: Optional[str] = None
+
+
+def available_rasterizer(refresh: bool = False) -> Optional[str]:
+    """First installed rasterizer (looked up once and cached), or None."""
+    global _rasterizer
+    if _rasterizer is None or refresh:
+        _rasterizer = next((name for name in RASTERIZER_NAMES if shutil.which(name)), "")
+    return _rasterizer or None
+
+
+def _load_webp():
+    """Pillow with WebP support if installed, otherwise None (previews fall back to PNG)."""
+    try:
+        from PIL import Image, features
+
+        return Image if features.check("webp") else None
+    except Exception:
+        return None
+
+
+_webp_image = _load_webp()
+
+
+def preview_format(requested: str) -> str:
+    return "webp" if requested == "webp" and _webp_image is not None else "png"
+
+
+def clamp_dpi(dpi: Optional[int]) -> int:
+    return min(max(dpi or DEFAULT_DPI, MIN_DPI), MAX_DPI)
+
+
+def preview_cache_key(latex_source: str, engine: str, dpi: int, fmt: str) -> str:
+    # Alles, was das Bild bestimmt; ergibt zugleich den ETag
+    digest = hashlib.sha256()
+    digest.update(f"{engine}\0{dpi}\0{fmt}\0".encode("utf-8"))
+    digest.update(normalize_latex(latex_source).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _command(rasterizer: str, pdf_path: Path, target: Path, dpi: int) -> list[str]:
+    if rasterizer == "pdftoppm":
+        # -singlefile: Ausgabe heißt <prefix>.png statt <prefix>-1.png
+        return [
+            "pdftoppm", "-png", "-r", str(dpi), "-f", "1", "-l", "1", "-singlefile",
+            str(pdf_path), str(target.with_suffix("")),
+        ]
+    return [
+        "gs", "-q", "-dNOPAUSE", "-dBATCH", "-dSAFER",
+        "-sDEVICE=png16m", f"-r{dpi}", "-dFirstPage=1", "-dLastPage=1",
+        "-dTextAlphaBits=4", "-dGraphicsAlphaBits=4",
+        f"-sOutputFile={target}", str(pdf_path),
+    ]
+
+
+def _to_webp(png_path: Path) -> Path:
+    target = png_path.with_suffix(".webp")
+    with _webp_image.open(png_path) as image:
+        image.save(target, "WEBP", quality=80, method=2)
+    png_path.unlink(missing_ok=True)
+    return target
+
+
+async def rasterize_first_page(
+    pdf_path: Path, out_dir: Path, dpi: int, fmt: str, timeout: Optional[float] = None
+) -> Path:
+    """Renders page 1 of `pdf_path` into `out_dir` as PNG (or WebP); returns the image path."""
+    rasterizer = available_rasterizer()
+    if rasterizer is None:
+        raise RuntimeError("No PDF rasterizer found. Install 'pdftoppm' (poppler-utils) or 'gs'.")
+    target = out_dir / "preview.png"
+    returncode, stdout, stderr = await _run(_command(rasterizer, pdf_path, target, dpi), out_dir, timeout)
+    if returncode != 0 or not target.exists():
+        raise RuntimeError(f"{rasterizer} failed (code {returncode}). stderr:\n{stderr or stdout}")
+    if fmt == "webp":
+        return await asyncio.get_running_loop().run_in_executor(None, _to_webp, target)
+    return target
+
+
+async def compile_preview(
+    latex_source: str, engine: str, dpi: int, fmt: str, out_dir: Path, timeout: Optional[float] = None
+) -> Path:
+    """
+    Draft compile plus rasterization of page 1, run as one job in the compile pool.
+    The draft PDF is discarded; only the image (in `out_dir`) is kept.
+    """
+    result = await compile_latex(latex_source, engine=engine, timeout=timeout, draft=True)
+    try:
+        return await rasterize_first_page(Path(result.pdf_path), out_dir, dpi, fmt, timeout)
+    finally:
+        result.cleanup()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check with weak comparison (RFC 9110)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def create_preview_cache() -> RenderCache:
+    cache_dir = Path(
+        os.getenv("PREVIEW_CACHE_DIR", str(Path(tempfile.gettempdir()) / "cv-preview-cache"))
+    )
+    # Vorschaubilder sind klein: standardmäßig alle auch im Speicher halten
+    return RenderCache(
+        cache_dir=cache_dir,
+        max_bytes=env_int("PREVIEW_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+        memory_max_bytes=env_int("PREVIEW_CACHE_MEMORY_MAX_BYTES", 16 * 1024 * 1024),
+        memory_item_max_bytes=env_int("PREVIEW_CACHE_MEMORY_ITEM_MAX_BYTES", 512 * 1024),
+        suffix=".img",
+    )
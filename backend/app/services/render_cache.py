@@ -0,0 +1,264 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from .file_lock import file_lock
+from .settings import env_int
+
+
+def normalize_latex(latex_source: str) -> str:
+    """
+    Normalizes LaTeX source for cache keys.
+    Line endings are unified and trailing whitespace is dropped (TeX ignores it anyway).
+    """
+    text = latex_source.replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+def render_cache_key(latex_source: str, engine: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(engine.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_latex(latex_source).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CachedPdf:
+    """A cache entry: either an on-disk file (`path`) or in-memory bytes (`data`)."""
+
+    def __init__(self, key: str, path: Optional[Path] = None, data: Optional[bytes] = None):
+        self.key = key
+        self.path = path
+        self.data = data
+        self.file: Optional[BinaryIO] = None
+
+    @property
+    def size(self) -> int:
+        if self.data is not None:
+            return len(self.data)
+        if self.file is not None:
+            return os.fstat(self.file.fileno()).st_size
+        return self.path.stat().st_size if self.path else 0
+
+    def pin(self) -> bool:
+        """
+        Opens the file so it stays readable even if another worker evicts (unlinks) it
+        meanwhile; False if it is already gone. The reader closes `file` when done.
+        """
+        if self.data is not None or self.file is not None:
+            return True
+        try:
+            self.file = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        return True
+
+    def read_bytes(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        if self.file is not None:
+            with self.file:
+                return self.file.read()
+        return self.path.read_bytes()
+
+
+class RenderCache:
+    """
+    Content-addressed PDF cache with a size-bounded LRU on disk and an optional
+    in-memory tier for small PDFs. Other artifacts (preview images) use their own
+    instance with a different file `suffix`.
+
+    The disk tier may be shared by several worker processes: entries written by
+    another worker are picked up on lookup, and eviction re-reads the directory
+    under a lock file and removes the least recently used files (by mtime) down
+    to EVICT_LOW_WATER of the limit. The memory tier is per process.
+    """
+
+    # Beim Räumen unter das Limit gehen, damit nicht jeder put erneut das Verzeichnis scannt
+    EVICT_LOW_WATER = 0.9
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int,
+        memory_max_bytes: int = 0,
+        memory_item_max_bytes: int = 0,
+        suffix: str = ".pdf",
+    ):
+        self.cache_dir = cache_dir
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self.memory_item_max_bytes = memory_item_max_bytes
+        self._lock = threading.Lock()
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path_for(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.suffix}"
+
+    def _scan(self) -> list[tuple[float, str, int]]:
+        # Einträge nach mtime, älteste zuerst; get() setzt die mtime bei jedem Treffer
+        entries = []
+        for p in self.cache_dir.glob(f"*{self.suffix}"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, p.stem, st.st_size))
+        return sorted(entries)
+
+    def _index(self, entries: list[tuple[float, str, int]]) -> None:
+        self._disk.clear()
+        self._disk_bytes = 0
+        for _, key, size in entries:
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _load_index(self) -> None:
+        with self._lock:
+            self._index(self._scan())
+            self._evict_disk()
+
+    def get(self, key: str) -> Optional[CachedPdf]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return CachedPdf(key, data=data)
+            path = self._path_for(key)
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                # Nie geschrieben oder von einem anderen Worker geräumt
+                if key in self._disk:
+                    self._disk_bytes -= self._disk.pop(key)
+                self.misses += 1
+                return None
+            if key not in self._disk:
+                # Von einem anderen Worker geschrieben
+                self._disk[key] = size
+                self._disk_bytes += size
+            self._disk.move_to_end(key)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self.hits += 1
+            return CachedPdf(key, path=path)
+
+    def put(self, key: str, pdf_path: Path) -> Optional[CachedPdf]:
+        """
+        Moves a freshly compiled PDF into the cache.
+        Returns the cache entry, or None if the cache is disabled (caller keeps ownership).
+        """
+        if not self.enabled:
+            return None
+        pdf_path = Path(pdf_path)
+        size = pdf_path.stat().st_size
+        if size > self.max_bytes:
+            return None
+        target = self._path_for(key)
+        # Erst neben das Ziel schreiben, dann atomar ersetzen
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        os.close(fd)
+        shutil.move(str(pdf_path), tmp_name)
+        os.replace(tmp_name, target)
+
+        data = None
+        if self.memory_item_max_bytes and size <= self.memory_item_max_bytes:
+            data = target.read_bytes()
+
+        with self._lock:
+            if key in self._disk:
+                self._disk_bytes -= self._disk.pop(key)
+            self._disk[key] = size
+            self._disk_bytes += size
+            if data is not None:
+                self._remember(key, data)
+            self._evict_disk(keep=key)
+        if data is not None:
+            return CachedPdf(key, data=data)
+        return CachedPdf(key, path=target)
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory and self._memory_bytes > self.memory_max_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+
+    def _evict_disk(self, keep: Optional[str] = None) -> None:
+        if self._disk_bytes <= self.max_bytes:
+            return
+        # Der lokale Index kennt nur die eigenen Schreibvorgänge; maßgeblich ist das Verzeichnis
+        with file_lock(self.cache_dir / ".lock"):
+            entries = self._scan()
+            total = sum(size for _, _, size in entries)
+            low_water = int(self.max_bytes * self.EVICT_LOW_WATER)
+            kept = []
+            for entry in entries:
+                _, key, size = entry
+                if total <= low_water or key == keep:
+                    kept.append(entry)
+                    continue
+                self._path_for(key).unlink(missing_ok=True)
+                total -= size
+                if key in self._memory:
+                    self._memory_bytes -= len(self._memory.pop(key))
+                self.evictions += 1
+            self._index(kept)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
+
+
+def create_render_cache() -> RenderCache:
+    cache_dir = Path(
+        os.getenv("RENDER_CACHE_DIR", str(Path(tempfile.gettempdir()) / "cv-render-cache"))
+    )
+    return RenderCache(
+        cache_dir=cache_dir,
+        max_bytes=env_int("RENDER_CACHE_MAX_BYTES", 256 * 1024 * 1024),
+        memory_max_bytes=env_int("RENDER_CACHE_MEMORY_MAX_BYTES", 32 * 1024 * 1024),
+        memory_item_max_bytes=env_int("RENDER_CACHE_MEMORY_ITEM_MAX_BYTES", 256 * 1024),
+    )
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from . import metrics
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one underlying job.
+
+    The first caller starts `factory()` as a task; callers arriving while it runs wait
+    for the same task and receive its result (or exception). The job is cancelled only
+    when every waiting caller has been cancelled. Results are not kept after the job
+    finishes — caching is left to the caller.
+
+    If a result cannot be handed to several callers as-is (e.g. a file the caller
+    deletes), pass `share`: it converts the result once, and only when more than one
+    caller is waiting for it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.shared = 0
+
+    async def _run(
+        self,
+        key: str,
+        flight: _Flight,
+        factory: Callable[[], Awaitable[Any]],
+        share: Optional[Callable[[Any], Awaitable[Any]]],
+    ) -> Any:
+        try:
+            result = await factory()
+            if flight.waiters > 1:
+                self.shared += 1
+                if share is not None:
+                    result = await share(result)
+            return result
+        finally:
+            # Ohne await zwischen Prüfung und Austragen: Spätere Aufrufer starten neu
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def do(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        share: Optional[Callable[[Any], Awaitable[Any]]] = None,
+    ) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.ensure_future(self._run(key, flight, factory, share))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            metrics.observe_coalesced(self.name)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "shared_results": self.shared,
+            "in_flight": len(self._flights),
+        }
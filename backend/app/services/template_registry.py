@@ -0,0 +1,173 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .file_lock import file_lock
+from .latex_service import split_preamble
+
+
+DEFAULT_TEMPLATE_ID = "cv_template"
+LAYOUT_SUFFIX = ".tex.j2"
+
+
+def sanitize_template_id(template_id: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_\-]", "", template_id or "").strip()
+
+
+class TemplateInfo:
+    """Parsed template: metadata plus the LaTeX source kept in memory."""
+
+    def __init__(self, path: Path, source: str):
+        self.id = path.stem
+        self.name = path.stem.replace("_", " ").title()
+        self.source = source
+        self.path = path
+        self.content = path.read_text(encoding="utf-8")
+        self.size = len(self.content.encode("utf-8"))
+        parts = split_preamble(self.content)
+        preamble = parts[0] if parts else ""
+        self.preamble_hash = hashlib.sha256(preamble.strip().encode("utf-8")).hexdigest()[:16]
+        # Optionales Layout für strukturierte CV-Daten (<id>.tex.j2 neben der Vorlage)
+        layout_path = path.with_name(f"{path.stem}{LAYOUT_SUFFIX}")
+        self.layout = layout_path.read_text(encoding="utf-8") if layout_path.is_file() else None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "source": self.source,
+            "size": self.size,
+            "preamble_hash": self.preamble_hash,
+            "structured": self.layout is not None,
+        }
+
+
+class TemplateRegistry:
+    """
+    In-memory index of TEMPLATE_DIR plus the packaged templates.
+    The index is rebuilt only when a directory mtime changes (checked at most every
+    `refresh_interval` seconds); writes are atomic, so readers never see partial files.
+    Writers hold a lock file in TEMPLATE_DIR, so several workers can share the directory.
+    """
+
+    def __init__(self, template_dir: Path, packaged_dir: Path, refresh_interval: float = 1.0):
+        self.template_dir = template_dir
+        self.packaged_dir = packaged_dir
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._templates: dict[str, TemplateInfo] = {}
+        self._dir_state: Optional[tuple] = None
+        self._checked = 0.0
+        self.reloads = 0
+        try:
+            self.template_dir.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            pass
+
+    def _state(self) -> tuple:
+        state = []
+        for directory in (self.template_dir, self.packaged_dir):
+            try:
+                state.append(directory.stat().st_mtime_ns)
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    def _load(self) -> dict[str, TemplateInfo]:
+        templates: dict[str, TemplateInfo] = {}
+        # Eigene Vorlagen überschreiben paketierte mit gleicher id
+        for directory, source in ((self.packaged_dir, "builtin"), (self.template_dir, "custom")):
+            if not directory.exists():
+                continue
+            for p in sorted(directory.glob("*.tex")):
+                try:
+                    info = TemplateInfo(p, source)
+                except (FileNotFoundError, UnicodeDecodeError):
+                    continue
+                # Eigene Kopie ohne .tex.j2 (Seed im Image, PUT /api/template) behält das paketierte Layout
+                builtin = templates.get(p.stem)
+                if info.layout is None and builtin is not None:
+                    info.layout = builtin.layout
+                templates[p.stem] = info
+        return templates
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked < self.refresh_interval:
+            return
+        with self._lock:
+            self._checked = now
+            state = self._state()
+            if not force and state == self._dir_state:
+                return
+            self._templates = self._load()
+            self._dir_state = state
+            self.reloads += 1
+
+    def list(self) -> list[dict]:
+        self.refresh()
+        templates = self._templates
+        custom = [t for t in templates.values() if t.source == "custom"]
+        builtin = [t for t in templates.values() if t.source == "builtin"]
+        items = [t.to_dict() for t in sorted(custom, key=lambda t: t.id)]
+        items += [t.to_dict() for t in sorted(builtin, key=lambda t: t.id)]
+        if not items:
+            # Ensure at least default is shown by id
+            items.append({"id": DEFAULT_TEMPLATE_ID, "name": "Cv Template", "source": "implicit"})
+        return items
+
+    def info(self, template_id: str) -> TemplateInfo:
+        safe_id = sanitize_template_id(template_id)
+        if not safe_id:
+            raise FileNotFoundError("Invalid template id")
+        self.refresh()
+        info = self._templates.get(safe_id)
+        if info is None:
+            raise FileNotFoundError(f"Template not found: {safe_id}")
+        return info
+
+    def get(self, template_id: str) -> str:
+        return self.info(template_id).content
+
+    def layout(self, template_id: str) -> tuple[str, str]:
+        """(template source, layout) for rendering structured CV data; FileNotFoundError without layout."""
+        info = self.info(template_id)
+        if info.layout is None:
+            raise FileNotFoundError(f"Template has no structured layout: {info.id}")
+        return info.content, info.layout
+
+    def default(self) -> str:
+        try:
+            return self.get(DEFAULT_TEMPLATE_ID)
+        except FileNotFoundError:
+            raise FileNotFoundError("No LaTeX template found.")
+
+    def write(self, template_id: str, content: str) -> None:
+        """Atomically replaces (or creates) a template in TEMPLATE_DIR."""
+        safe_id = sanitize_template_id(template_id)
+        if not safe_id:
+            raise FileNotFoundError("Invalid template id")
+        self.template_dir.mkdir(parents=True, exist_ok=True)
+        target = self.template_dir / f"{safe_id}.tex"
+        # Prozessübergreifend serialisieren: gleichzeitige Speichervorgänge mehrerer Worker
+        # ersetzen die Datei nacheinander, die letzte Änderung gewinnt vollständig
+        with file_lock(self.template_dir / ".lock"):
+            fd, tmp_name = tempfile.mkstemp(dir=self.template_dir, prefix=f".{safe_id}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                    fh.write(content)
+                    fh.flush()
+                    os.fsync(fh.fileno())
+                os.replace(tmp_name, target)
+            except BaseException:
+                Path(tmp_name).unlink(missing_ok=True)
+                raise
+        self.refresh(force=True)
+
+    def stats(self) -> dict:
+        return {"templates": len(self._templates), "reloads": self.reloads}
@@ -0,0 +1,61 @@
+import os
+import threading
+from functools import lru_cache
+from typing import Callable, Optional
+
+
+# Aufschlag pro Chat-Nachricht (Rolle, Trenner) laut OpenAI-Cookbook
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_counter: Optional[tuple[Callable[[str], int], str]] = None
+_counter_lock = threading.Lock()
+
+
+def _load_counter() -> tuple[Callable[[str], int], str]:
+    """tiktoken for the configured model if installed, otherwise ~4 characters per token."""
+    try:
+        import tiktoken
+
+        model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        try:
+            enc = tiktoken.encoding_for_model(model)
+        except KeyError:
+            enc = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(enc.encode(text, disallowed_special=())), enc.name
+    except Exception:
+        # Nicht installiert oder BPE-Datei nicht ladbar (offline)
+        return lambda text: (len(text) + 3) // 4, "approx"
+
+
+def _get_counter() -> tuple[Callable[[str], int], str]:
+    # Erst beim ersten Zählen laden: tiktoken liest beim Start die BPE-Datei (ggf. aus dem Netz)
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                _counter = _load_counter()
+    return _counter
+
+
+def tokenizer_name() -> str:
+    """Name of the encoding used for counting ("approx" without tiktoken)."""
+    return _get_counter()[1]
+
+
+def count_tokens(text: str) -> int:
+    """Token count of `text`. Not cached: the text may contain user data."""
+    return _get_counter()[0](text)
+
+
+@lru_cache(maxsize=64)
+def count_stable_tokens(text: str) -> int:
+    """Cached count for stable prompt parts only (system prompts, templates)."""
+    return count_tokens(text)
+
+
+def count_message_tokens(messages: list[dict], stable: int = 0) -> int:
+    """Token count of a chat prompt; the first `stable` messages are counted via the cache."""
+    return sum(
+        (count_stable_tokens if i < stable else count_tokens)(m["content"]) + MESSAGE_OVERHEAD_TOKENS
+        for i, m in enumerate(messages)
+    )
@@ -0,0 +1,157 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .settings import env_int
+
+
+WORKDIR_PREFIX = "cv-latex-"
+
+
+def _default_root() -> Path:
+    # RAM-backed, falls vorhanden und beschreibbar
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm
+    return Path(tempfile.gettempdir())
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkspacePool:
+    """
+    Reusable LaTeX build directories, one per concurrent compile.
+
+    Up to `size` idle directories are kept under `root` (ideally a tmpfs such as
+    /dev/shm). `acquire()` hands out an idle directory or creates a new one;
+    `release()` scrubs everything except the seeded files and parks it for the
+    next compile, or deletes it when enough directories are idle. Files from
+    `seed_dir` (e.g. font maps) are symlinked into every directory once.
+    """
+
+    def __init__(self, root: Path, size: int, seed_dir: Optional[Path] = None):
+        self.root = root
+        self.size = max(0, size)
+        self.seed_dir = seed_dir
+        self._prefix = f"{WORKDIR_PREFIX}{os.getpid()}-"
+        self._lock = threading.Lock()
+        self._idle: list[Path] = []
+        self._leased: set[Path] = set()
+        self.acquired = 0
+        self.reused = 0
+        self.created = 0
+        self.discarded = 0
+        self.cleanup_seconds = 0.0
+        self.cleanup_max_seconds = 0.0
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._seeds = self._seed_names()
+        self._purge_stale()
+        for _ in range(self.size):
+            self._idle.append(self._create())
+
+    def _seed_names(self) -> set[str]:
+        if self.seed_dir is None or not self.seed_dir.is_dir():
+            return set()
+        return {p.name for p in self.seed_dir.iterdir() if p.is_file()}
+
+    def _purge_stale(self) -> None:
+        # Verzeichnisse abgestürzter Prozesse entfernen (PID steht im Namen)
+        for p in self.root.glob(f"{WORKDIR_PREFIX}*"):
+            pid = p.name[len(WORKDIR_PREFIX):].split("-", 1)[0]
+            if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                shutil.rmtree(p, ignore_errors=True)
+
+    def _create(self) -> Path:
+        path = Path(tempfile.mkdtemp(prefix=self._prefix, dir=self.root))
+        for name in self._seeds:
+            (path / name).symlink_to(self.seed_dir / name)
+        self.created += 1
+        return path
+
+    def acquire(self) -> Path:
+        with self._lock:
+            self.acquired += 1
+            if self._idle:
+                path = self._idle.pop()
+                self.reused += 1
+            else:
+                path = None
+        if path is None:
+            path = self._create()
+        with self._lock:
+            self._leased.add(path)
+        return path
+
+    def _scrub(self, path: Path) -> None:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name in self._seeds:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+
+    def release(self, path: Path) -> None:
+        """Returns a directory handed out by `acquire()`; unknown paths are ignored."""
+        with self._lock:
+            if path not in self._leased:
+                return
+            self._leased.discard(path)
+            keep = len(self._idle) < self.size
+        started = time.perf_counter()
+        try:
+            if keep:
+                self._scrub(path)
+            else:
+                shutil.rmtree(path)
+        except OSError:
+            shutil.rmtree(path, ignore_errors=True)
+            keep = False
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            if keep:
+                self._idle.append(path)
+            else:
+                self.discarded += 1
+            self.cleanup_seconds += elapsed
+            self.cleanup_max_seconds = max(self.cleanup_max_seconds, elapsed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            released = self.acquired - len(self._leased)
+            return {
+                "root": str(self.root),
+                "size": self.size,
+                "idle": len(self._idle),
+                "in_use": len(self._leased),
+                "acquired": self.acquired,
+                "reused": self.reused,
+                "created": self.created,
+                "discarded": self.discarded,
+                "reuse_rate": round(self.reused / self.acquired, 4) if self.acquired else 0.0,
+                "avg_cleanup_ms": round(self.cleanup_seconds / released * 1000, 3) if released else 0.0,
+                "max_cleanup_ms": round(self.cleanup_max_seconds * 1000, 3),
+            }
+
+
+def create_workspace_pool() -> WorkspacePool:
+    root = Path(os.getenv("LATEX_WORKSPACE_DIR") or _default_root())
+    seed_dir = os.getenv("LATEX_WORKSPACE_SEED_DIR")
+    return WorkspacePool(
+        root=root,
+        size=env_int("LATEX_WORKSPACE_POOL_SIZE", env_int("LATEX_MAX_PARALLEL", os.cpu_count() or 2)),
+        seed_dir=Path(seed_dir) if seed_dir else None,
+    )
@@ -0,0 +1,126 @@
+"""
+Job worker: processes queued generate-pdf jobs outside the uvicorn request workers.
+
+Run with:
+    python -m app.worker
+"""
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import socket
+import time
+
+from .services import http_clients
+from .services.job_queue import JobQueue, create_job_queue
+from .services.latex_service import available_engines, compile_latex, pdf_optimizer
+from .services.openai_service import generate_latex_via_openai
+from .services.settings import env_float, env_int
+
+
+logger = logging.getLogger("app.worker")
+
+POLL_INTERVAL = env_float("JOB_POLL_INTERVAL", 1.0)
+HEARTBEAT_INTERVAL = env_float("JOB_HEARTBEAT_INTERVAL", 5.0)
+STALE_AFTER = env_float("JOB_STALE_AFTER", 60.0)
+JOB_TTL = env_float("JOB_TTL", 24 * 3600.0)
+CONCURRENCY = max(1, env_int("JOB_WORKER_CONCURRENCY", 2))
+COMPILE_TIMEOUT = env_float("LATEX_COMPILE_TIMEOUT", 60.0) or None
+
+
+async def _heartbeat(queue: JobQueue, job_id: str) -> None:
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        queue.heartbeat(job_id)
+
+
+async def run_generate_pdf(queue: JobQueue, job: dict) -> None:
+    payload = job["payload"]
+    queue.heartbeat(job["id"], "generating")
+    # generate_latex_via_openai liefert bereits LaTeX ohne Code-Fences
+    latex = await generate_latex_via_openai(
+        input_text=payload["input_text"], template=payload.get("template")
+    )
+    queue.heartbeat(job["id"], "compiling")
+    result = await compile_latex(latex, timeout=COMPILE_TIMEOUT, optimize=pdf_optimizer.enabled)
+    artifact = queue.artifact_path(job["id"])
+    try:
+        shutil.move(result.pdf_path, artifact)
+    finally:
+        result.cleanup()
+    queue.complete(job["id"], artifact)
+
+
+HANDLERS = {"generate-pdf": run_generate_pdf}
+
+
+async def process(queue: JobQueue, job: dict) -> None:
+    handler = HANDLERS.get(job["kind"])
+    if handler is None:
+        queue.fail(job["id"], f"Unknown job kind: {job['kind']}")
+        return
+    beat = asyncio.create_task(_heartbeat(queue, job["id"]))
+    started = time.perf_counter()
+    try:
+        await handler(queue, job)
+        logger.info("Job %s done in %.1fs", job["id"], time.perf_counter() - started)
+    except Exception as e:
+        logger.warning("Job %s failed: %s", job["id"], e)
+        queue.fail(job["id"], str(e) or e.__class__.__name__)
+    finally:
+        beat.cancel()
+
+
+async def worker_loop(queue: JobQueue, worker_id: str, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        job = queue.claim(worker_id)
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await process(queue, job)
+
+
+async def maintenance_loop(queue: JobQueue, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        requeued = queue.requeue_stale(STALE_AFTER)
+        if requeued:
+            logger.info("Re-queued %s stale job(s)", requeued)
+        queue.purge(JOB_TTL)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=STALE_AFTER / 2)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main() -> None:
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    queue = create_job_queue()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Laufende Jobs zu Ende bringen, keine neuen mehr annehmen
+        loop.add_signal_handler(sig, stop.set)
+
+    await http_clients.startup()
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(
+        "Worker %s started with concurrency %s, LaTeX engines: %s",
+        base_id,
+        CONCURRENCY,
+        ", ".join(available_engines()) or "none",
+    )
+    try:
+        await asyncio.gather(
+            maintenance_loop(queue, stop),
+            *(worker_loop(queue, f"{base_id}:{i}", stop) for i in range(CONCURRENCY)),
+        )
+    finally:
+        await http_clients.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+Compares the LinkedIn import prompt built from raw HTML (truncated at 150k chars, the
+previous behaviour) with the prompt built from the extracted profile text.
+
+Reports prompt size in tokens (tiktoken if installed, otherwise ~4 chars/token),
+extraction latency and, with --llm, end-to-end completion latency against the
+configured OpenAI endpoint (OPENAI_API_KEY / OPENAI_BASE_URL / OPENAI_MODEL).
+
+Usage (from backend/):
+    python -m benchmarks.bench_linkedin_extract [--runs 20] [--llm] [fixtures/*.html ...]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from pathlib import Path
+
+from app.services import openai_service
+from app.services.linkedin_extract import ProfileTextExtractor
+from app.services.template_registry import DEFAULT_TEMPLATE_ID
+
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+RAW_LIMIT = 150_000
+CHUNK_SIZE = 16 * 1024
+
+
+def _token_counter():
+    try:
+        import tiktoken
+
+        enc = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(enc.encode(text)), "tiktoken"
+    except ImportError:
+        return lambda text: (len(text) + 3) // 4, "approx (chars/4)"
+
+
+def _extract(html: str) -> str:
+    # Wie beim Download in Blöcken füttern
+    extractor = ProfileTextExtractor()
+    for i in range(0, len(html), CHUNK_SIZE):
+        extractor.feed(html[i:i + CHUNK_SIZE])
+        if extractor.truncated:
+            break
+    return extractor.finish()
+
+
+def _prompt_text(messages: list[dict]) -> str:
+    return "\n".join(m["content"] for m in messages)
+
+
+async def _llm_latency(messages: list[dict]) -> tuple[float, int]:
+    started = time.perf_counter()
+    resp = await openai_service._client().chat.completions.create(
+        model=openai_service._model(), messages=messages, temperature=0.2
+    )
+    usage = getattr(resp, "usage", None)
+    return time.perf_counter() - started, getattr(usage, "prompt_tokens", 0) or 0
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("fixtures", nargs="*", help="HTML files (default: benchmarks/fixtures/*.html)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--llm", action="store_true", help="also measure completion latency")
+    parser.add_argument(
+        "--template",
+        default=str(Path(__file__).resolve().parents[1] / "app" / "templates" / f"{DEFAULT_TEMPLATE_ID}.tex"),
+    )
+    args = parser.parse_args()
+    paths = [Path(p) for p in args.fixtures] or sorted(FIXTURE_DIR.glob("*.html"))
+    template = Path(args.template).read_text(encoding="utf-8")
+    count_tokens, counter_name = _token_counter()
+    print(f"token counter: {counter_name}")
+
+    for path in paths:
+        html = path.read_text(encoding="utf-8")
+        durations = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            text = _extract(html)
+            durations.append(time.perf_counter() - started)
+
+        before = openai_service._linkedin_messages(html[:RAW_LIMIT], template)
+        after = openai_service._linkedin_messages(text, template)
+        tokens_before = count_tokens(_prompt_text(before))
+        tokens_after = count_tokens(_prompt_text(after))
+
+        print(f"\n{path.name}")
+        print(f"  html          {len(html):>9,} chars (sent: {min(len(html), RAW_LIMIT):,})")
+        print(f"  extracted     {len(text):>9,} chars")
+        print(f"  prompt tokens {tokens_before:>9,} -> {tokens_after:,} ({tokens_after / tokens_before:.1%})")
+        print(
+            f"  extraction    median={statistics.median(durations) * 1000:.2f} ms  "
+            f"max={max(durations) * 1000:.2f} ms  runs={len(durations)}"
+        )
+        if args.llm:
+            latency_before, usage_before = await _llm_latency(before)
+            latency_after, usage_after = await _llm_latency(after)
+            print(
+                f"  completion    {latency_before * 1000:.0f} ms ({usage_before:,} prompt tokens) -> "
+                f"{latency_after * 1000:.0f} ms ({usage_after:,} prompt tokens)"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Compares pdflatex compile latency with and without a precompiled preamble format.
+
+Usage (from backend/):
+    python -m benchmarks.bench_preamble_format [--runs 10] [--template app/templates/cv_template.tex]
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from app.services import latex_service
+
+
+async def _measure(latex: str, runs: int) -> list[float]:
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        # Direkt kompilieren, nicht über den Render-Cache: jeder Lauf soll pdflatex messen
+        result = await latex_service.compile_latex(latex, engine="pdflatex")
+        durations.append(time.perf_counter() - started)
+        result.cleanup()
+    return durations
+
+
+def _summary(label: str, durations: list[float]) -> str:
+    return (
+        f"{label:<16} runs={len(durations):<3} "
+        f"mean={statistics.mean(durations) * 1000:8.1f} ms  "
+        f"median={statistics.median(durations) * 1000:8.1f} ms  "
+        f"min={min(durations) * 1000:8.1f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--template",
+        default=str(Path(__file__).resolve().parents[1] / "app" / "templates" / "cv_template.tex"),
+    )
+    args = parser.parse_args()
+    latex = Path(args.template).read_text(encoding="utf-8")
+
+    with tempfile.TemporaryDirectory() as fmt_dir:
+        latex_service.FORMAT_DIR = Path(fmt_dir)
+        latex_service.FORMAT_MIN_SEEN = 1
+
+        latex_service.PRECOMPILE_PREAMBLE = False
+        plain = await _measure(latex, args.runs)
+
+        latex_service.PRECOMPILE_PREAMBLE = True
+        started = time.perf_counter()
+        await _measure(latex, 1)  # baut das Format
+        build = time.perf_counter() - started
+        warm = await _measure(latex, args.runs)
+
+    print(_summary("plain", plain))
+    print(_summary("precompiled", warm))
+    print(f"format build (first compile incl. dump): {build * 1000:.1f} ms")
+    print(f"speedup (median): {statistics.median(plain) / statistics.median(warm):.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
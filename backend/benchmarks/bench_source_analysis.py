@@ -0,0 +1,118 @@
+"""
+Microbenchmark: legacy per-call source scanning (strip_code_fences + _extract_latex +
+select_engine with lowercasing and shutil.which) vs. the single-pass analyze_source
+with cached engine discovery.
+
+Usage (from backend/):
+    python -m benchmarks.bench_source_analysis [--repeat 200] [--sizes 1,10,100]
+"""
+import argparse
+import re
+import shutil
+import statistics
+import time
+from pathlib import Path
+
+from app.services import latex_service
+from app.services.latex_source import analyze_source
+
+
+TEMPLATE = Path(__file__).resolve().parents[1] / "app" / "templates" / "cv_template.tex"
+
+
+# -------- Bisherige Implementierung (zum Vergleich) --------
+
+def _legacy_strip_code_fences(text: str) -> str:
+    code_block = re.search(r"```(?:latex)?\n([\s\S]*?)```", text, re.IGNORECASE)
+    if code_block:
+        return code_block.group(1).strip()
+    return text.strip()
+
+
+def _legacy_extract_latex(text: str) -> str:
+    fence = re.search(r"```(?:latex)?\n([\s\S]*?)```", text, re.IGNORECASE)
+    if fence:
+        return fence.group(1).strip()
+    m = re.search(r"(\\documentclass[\s\S]*)", text)
+    if m:
+        return m.group(1).strip()
+    m = re.search(r"(\\begin\{document\}[\s\S]*)", text)
+    if m:
+        return m.group(1).strip()
+    return text.strip()
+
+
+def _legacy_select_engine(latex_source: str) -> str:
+    lower_src = latex_source.lower()
+    needs_xe = bool(
+        re.search(r"\\\s*(usepackage|requirepackage)\s*\{\s*fontspec\s*\}", lower_src)
+        or re.search(r"\\\s*(usepackage|requirepackage)\s*\{\s*unicode\-math\s*\}", lower_src)
+        or "\\setmainfont" in lower_src
+        or "\\newfontfamily" in lower_src
+        or "polyglossia" in lower_src
+    )
+    if needs_xe and shutil.which("xelatex"):
+        return "xelatex"
+    for name in ("tectonic", "pdflatex", "xelatex"):
+        if shutil.which(name):
+            return name
+    return "none"
+
+
+def legacy(raw: str) -> str:
+    latex = _legacy_strip_code_fences(_legacy_extract_latex(raw))
+    return _legacy_select_engine(latex)
+
+
+def single_pass(raw: str) -> str:
+    analysis = analyze_source(raw)
+    try:
+        return latex_service.select_engine(analysis)
+    except RuntimeError:
+        return "none"
+
+
+def _llm_output(template: str, copies: int) -> str:
+    # Typische Modellantwort: Checkliste, dann LaTeX im Code-Fence; Body vervielfacht
+    head, sep, body = template.partition("\\begin{document}")
+    body = body.replace("\\end{document}", "")
+    return (
+        "Checkliste:\n- Vorlage übernommen\n- Daten eingesetzt\n\n```latex\n"
+        + head + sep + body * copies + "\\end{document}\n```\nFertig."
+    )
+
+
+def _measure(func, text: str, repeat: int, clear_cache: bool) -> list[float]:
+    durations = []
+    for _ in range(repeat):
+        if clear_cache:
+            analyze_source.cache_clear()
+        started = time.perf_counter()
+        func(text)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--sizes", default="1,10,100", help="body copies per input")
+    args = parser.parse_args()
+    template = TEMPLATE.read_text(encoding="utf-8")
+    latex_service.available_engines()
+
+    print(f"{'input':>12}  {'legacy':>10}  {'single-pass':>12}  {'cached':>10}  speedup")
+    for copies in (int(c) for c in args.sizes.split(",")):
+        text = _llm_output(template, copies)
+        assert legacy(text) == single_pass(text)
+        old = statistics.median(_measure(legacy, text, args.repeat, False))
+        new = statistics.median(_measure(single_pass, text, args.repeat, True))
+        hot = statistics.median(_measure(single_pass, text, args.repeat, False))
+        print(
+            f"{len(text) // 1024:>9} KB  {old * 1e6:>8.1f}us  {new * 1e6:>10.1f}us  "
+            f"{hot * 1e6:>8.1f}us  {old / new:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Local stand-in for the OpenAI chat completions API (and an Auth0 JWKS endpoint) for the
+load test. Returns canned completions built from cv_template.tex after a configurable delay.
+
+Configuration (environment):
+    FAKE_OPENAI_DELAY        seconds before a completion is returned (default 0.5)
+    FAKE_OPENAI_STREAM_CHUNK characters per streamed delta (default 64)
+    FAKE_OPENAI_JWKS         JSON key set served at /.well-known/jwks.json
+
+Usage (from backend/):
+    python -m uvicorn benchmarks.fake_openai:app --port 8931
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+TEMPLATE = Path(__file__).resolve().parents[1] / "app" / "templates" / "cv_template.tex"
+
+DELAY = float(os.getenv("FAKE_OPENAI_DELAY", "0.5"))
+STREAM_CHUNK = max(1, int(os.getenv("FAKE_OPENAI_STREAM_CHUNK", "64")))
+
+app = FastAPI()
+_template = TEMPLATE.read_text(encoding="utf-8")
+
+
+def _digest(messages: list[dict]) -> str:
+    # Pro Prompt eine eigene Antwort, damit Cache-Treffer nur bei gleichem Prompt entstehen
+    return hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+CV_DATA = {
+    "name": "Max Mustermann",
+    "contact": {"email": "max@example.com", "phone": "+49 000 0000000", "github": "github.com/max"},
+    "education": [{"title": "M.Sc. Informatik", "organization": "TU Berlin", "start": "2014", "end": "2016"}],
+    "experience": [{
+        "title": "Backend Lead", "organization": "Beispiel GmbH", "location": "Berlin",
+        "start": "2019", "end": "heute", "highlights": ["FastAPI-Services für 1 Mio. Nutzer", "Team von 5"],
+    }],
+    "skills": [{"category": "Technische Skills", "skills": ["Python", "PostgreSQL", "Docker"]}],
+    "languages": ["Deutsch", "Englisch"],
+}
+
+
+def _content(body: dict) -> str:
+    messages = body.get("messages") or []
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        system = messages[0].get("content") or "" if messages else ""
+        if "Schema:" in system:
+            # Strukturierter Modus: kompaktes CV-JSON statt LaTeX
+            return json.dumps({**CV_DATA, "headline": f"Backend-Entwickler ({_digest(messages)})"})
+        # Patch-Modus: keine Änderung, das Backend validiert das Dokument trotzdem
+        return json.dumps({"replacements": []})
+    # Kennung im Rumpf: gleiche Präambel wie die Vorlage (vorkompiliertes Format greift)
+    latex = _template.replace("\\begin{document}", f"\\begin{{document}}\n% fake-openai {_digest(messages)}", 1)
+    return f"Checkliste:\n- Vorlage übernommen\n\n```latex\n{latex}\n```"
+
+
+def _usage(body: dict, content: str) -> dict:
+    prompt = sum(len(m.get("content") or "") for m in body.get("messages") or []) // 4
+    completion = len(content) // 4
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+def _chunk(delta: Optional[dict], finish_reason=None, usage: Optional[dict] = None) -> str:
+    payload = {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "fake",
+        # Usage-Chunk (stream_options.include_usage) hat keine choices
+        "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage is not None:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    content = _content(body)
+    await asyncio.sleep(DELAY)
+    if body.get("stream"):
+        async def events():
+            yield _chunk({"role": "assistant", "content": ""})
+            for i in range(0, len(content), STREAM_CHUNK):
+                yield _chunk({"content": content[i:i + STREAM_CHUNK]})
+                await asyncio.sleep(0)
+            yield _chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield _chunk(None, usage=_usage(body, content))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": _usage(body, content),
+    }
+
+
+@app.get("/.well-known/jwks.json")
+def jwks():
+    return json.loads(os.getenv("FAKE_OPENAI_JWKS") or '{"keys": []}')
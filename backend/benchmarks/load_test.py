@@ -0,0 +1,478 @@
+"""
+Load test for the backend hot paths against a local OpenAI stand-in.
+
+Starts benchmarks.fake_openai (canned completions with a configurable delay, plus the
+JWKS used to sign a test token) and the FastAPI app under uvicorn, then drives
+/api/render, /api/generate, /api/generate-pdf and /api/edit at increasing concurrency.
+Reports p50/p95/p99 latency, throughput, error count, CPU (app process tree incl.
+LaTeX engines) and peak RSS, and writes the results to benchmarks/results/ as JSON
+so runs of two commits can be compared with --compare.
+
+Payloads are cv_template.tex and larger variants (body repeated); every request is
+unique by default so the LLM and render caches miss (--distinct N reuses N payloads).
+CPU/RSS are read from /proc and reported as n/a on other platforms.
+
+Usage (from backend/):
+    python -m benchmarks.load_test [--concurrency 1,4,16] [--requests 40] [--llm-delay 0.5]
+        [--endpoints render,generate,generate-pdf,edit] [--distinct 0] [--workers 1]
+        [--output FILE] [--compare benchmarks/results/<previous>.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+TEMPLATE = BACKEND_DIR / "app" / "templates" / "cv_template.tex"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+AUDIENCE = "https://bench.local/api"
+AUTH0_DOMAIN = "bench.local"
+KEY_ID = "bench"
+
+ENDPOINTS = ("render", "generate", "generate-pdf", "edit")
+NOTES = (
+    "Max Mustermann, Softwareentwickler in Berlin. 6 Jahre Python (FastAPI, Django), "
+    "3 Jahre bei Beispiel GmbH als Backend Lead, davor Werkstudent bei Muster AG. "
+    "M.Sc. Informatik TU Berlin. Skills: Python, PostgreSQL, Docker, Kubernetes. Anfrage {n}."
+)
+
+
+# -------- Fixtures --------
+
+def latex_variants(template: str, copies: tuple = (1, 4, 16)) -> list[str]:
+    """cv_template.tex and longer documents with the body repeated `copies` times."""
+    head, sep, body = template.partition("\\begin{document}")
+    body = body.replace("\\end{document}", "")
+    return [head + sep + body * n + "\\end{document}\n" for n in copies]
+
+
+class Payloads:
+    def __init__(self, variants: list[str], distinct: int, run_id: str):
+        self.variants = variants
+        self.distinct = distinct
+        self.run_id = run_id
+
+    def _n(self, i: int) -> int:
+        return i % self.distinct if self.distinct else i
+
+    def _latex(self, i: int) -> str:
+        n = self._n(i)
+        # Kommentar macht das Dokument eindeutig, ohne das PDF zu verändern; im Rumpf, damit
+        # die Präambel gleich bleibt und der Pfad über das vorkompilierte Format greift
+        return self.variants[n % len(self.variants)].replace(
+            "\\begin{document}", f"\\begin{{document}}\n% bench {self.run_id}-{n}", 1
+        )
+
+    def body(self, endpoint: str, i: int) -> dict:
+        n = self._n(i)
+        if endpoint == "render":
+            return {"latex": self._latex(i)}
+        if endpoint == "edit":
+            return {"latex": self._latex(i), "instruction": f"Ergänze den Skill Rust ({self.run_id}-{n})."}
+        return {"input_text": NOTES.format(n=f"{self.run_id}-{n}"), "template_id": "cv_template"}
+
+
+# -------- Prozesse --------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _signing_material() -> tuple[bytes, str]:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+    jwk.update({"kid": KEY_ID, "use": "sig", "alg": "RS256"})
+    return pem, json.dumps({"keys": [jwk]})
+
+
+def _token(pem: bytes) -> str:
+    now = int(time.time())
+    claims = {
+        "sub": "bench|load-test",
+        "aud": AUDIENCE,
+        "iss": f"https://{AUTH0_DOMAIN}/",
+        "iat": now,
+        "exp": now + 24 * 3600,
+    }
+    return jwt.encode(claims, pem, algorithm="RS256", headers={"kid": KEY_ID})
+
+
+def _uvicorn(target: str, port: int, env: dict, workers: int = 1) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning"]
+    if workers > 1:
+        cmd += ["--workers", str(workers)]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env={**os.environ, **env})
+
+
+async def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{url}: process exited with {proc.returncode}")
+            try:
+                if (await client.get(url, timeout=1.0)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def _stop(proc: Optional[subprocess.Popen]) -> None:
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# -------- CPU/RSS aus /proc --------
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _proc_stat(pid: int) -> Optional[tuple[int, float, int]]:
+    """(ppid, cpu seconds incl. reaped children, rss bytes) or None."""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return None
+    fields = stat.rsplit(")", 1)[1].split()
+    ppid = int(fields[1])
+    utime, stime, cutime, cstime = (int(f) for f in fields[11:15])
+    rss = 0
+    for line in status.splitlines():
+        if line.startswith("VmRSS:"):
+            rss = int(line.split()[1]) * 1024
+            break
+    return ppid, (utime + stime + cutime + cstime) / _CLK_TCK, rss
+
+
+def process_tree_usage(root_pid: int) -> Optional[tuple[float, int]]:
+    """CPU seconds and RSS of `root_pid` and all its descendants (uvicorn workers, TeX engines)."""
+    if not Path("/proc/self/stat").exists():
+        return None
+    stats = {}
+    for entry in Path("/proc").iterdir():
+        if entry.name.isdigit():
+            st = _proc_stat(int(entry.name))
+            if st is not None:
+                stats[int(entry.name)] = st
+    if root_pid not in stats:
+        return None
+    children: dict[int, list[int]] = {}
+    for pid, (ppid, _, _) in stats.items():
+        children.setdefault(ppid, []).append(pid)
+    cpu, rss, todo = 0.0, 0, [root_pid]
+    while todo:
+        pid = todo.pop()
+        _, pid_cpu, pid_rss = stats[pid]
+        cpu += pid_cpu
+        rss += pid_rss
+        todo.extend(children.get(pid, ()))
+    return cpu, rss
+
+
+class UsageSampler:
+    """Samples the app's process tree while a load level runs (peak RSS, CPU delta)."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self._cpu_start = None
+        self._cpu_end = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _sample(self) -> Optional[float]:
+        usage = process_tree_usage(self.pid)
+        if usage is None:
+            return None
+        self.peak_rss = max(self.peak_rss, usage[1])
+        return usage[0]
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self._sample()
+
+    def start(self) -> None:
+        self._cpu_start = self._sample()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._cpu_end = self._sample()
+
+    @property
+    def cpu_seconds(self) -> Optional[float]:
+        if self._cpu_start is None or self._cpu_end is None:
+            return None
+        return self._cpu_end - self._cpu_start
+
+
+# -------- Last erzeugen --------
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+async def run_level(
+    client: httpx.AsyncClient, endpoint: str, concurrency: int, requests: int,
+    payloads: Payloads, offset: int, app_pid: int,
+) -> dict:
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    received = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index, received
+        while next_index < requests:
+            i = offset + next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                resp = await client.post(f"/api/{endpoint}", json=payloads.body(endpoint, i))
+                received += len(resp.content)
+                if resp.status_code != 200:
+                    key = f"{resp.status_code}: {resp.text[:120]}"
+                    errors[key] = errors.get(key, 0) + 1
+                    continue
+            except httpx.HTTPError as e:
+                key = type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    sampler = UsageSampler(app_pid)
+    sampler.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    await sampler.stop()
+
+    latencies.sort()
+    cpu = sampler.cpu_seconds
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": sum(errors.values()),
+        "error_samples": dict(sorted(errors.items(), key=lambda kv: -kv[1])[:3]),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        "response_bytes": received,
+        "cpu_s": round(cpu, 3) if cpu is not None else None,
+        # Kerne, die das Backend im Mittel ausgelastet hat
+        "cpu_cores": round(cpu / wall, 3) if cpu is not None and wall else None,
+        "peak_rss_mb": round(sampler.peak_rss / 2**20, 1) if sampler.peak_rss else None,
+    }
+
+
+# -------- Ausgabe --------
+
+def _fmt(value, spec: str) -> str:
+    return "n/a" if value is None else format(value, spec)
+
+
+def print_results(results: list[dict]) -> None:
+    print(
+        f"{'endpoint':<13} {'conc':>4} {'ok':>5} {'err':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'p99 ms':>9} {'cpu':>6} {'rss MB':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['endpoint']:<13} {r['concurrency']:>4} {r['ok']:>5} {r['errors']:>4} "
+            f"{r['throughput_rps']:>8.2f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+            f"{_fmt(r['cpu_cores'], '>6.2f')} {_fmt(r['peak_rss_mb'], '>8.1f')}"
+        )
+        for sample, count in r["error_samples"].items():
+            print(f"{'':<13} {count:>4}x {sample}")
+
+
+def _delta(new, old) -> str:
+    if not old or new is None:
+        return "     n/a"
+    return f"{(new - old) / old:+8.1%}"
+
+
+def print_comparison(results: list[dict], baseline: dict) -> None:
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\ncompared to {baseline['commit']} ({baseline['created']}):")
+    if not any((r["endpoint"], r["concurrency"]) in previous for r in results):
+        print("  no common endpoint/concurrency levels")
+        return
+    print(f"{'endpoint':<13} {'conc':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'cpu':>8}")
+    for r in results:
+        old = previous.get((r["endpoint"], r["concurrency"]))
+        if old is None:
+            continue
+        print(
+            f"{r['endpoint']:<13} {r['concurrency']:>4} "
+            f"{_delta(r['throughput_rps'], old['throughput_rps'])} {_delta(r['p50_ms'], old['p50_ms'])} "
+            f"{_delta(r['p95_ms'], old['p95_ms'])} {_delta(r['p99_ms'], old['p99_ms'])} "
+            f"{_delta(r['cpu_s'], old['cpu_s'])}"
+        )
+
+
+def _git_revision() -> tuple[str, bool]:
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--", "."], cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout.strip())
+        return rev, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+# -------- Ablauf --------
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated load levels")
+    parser.add_argument("--requests", type=int, default=40, help="requests per endpoint and level")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--llm-delay", type=float, default=0.5, help="fake OpenAI latency in seconds")
+    parser.add_argument("--distinct", type=int, default=0, help="distinct payloads per endpoint (0 = all unique)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the app")
+    parser.add_argument("--timeout", type=float, default=300.0, help="client timeout per request")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", help="previous result file to compare against")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+    commit, dirty = _git_revision()
+    run_id = f"{int(time.time())}"
+    payloads = Payloads(latex_variants(TEMPLATE.read_text(encoding="utf-8")), args.distinct, run_id)
+
+    pem, jwks = _signing_material()
+    fake_port, app_port = _free_port(), _free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake = app = None
+    with tempfile.TemporaryDirectory(prefix="cv-bench-") as scratch:
+        try:
+            fake = _uvicorn(
+                "benchmarks.fake_openai:app", fake_port,
+                {"FAKE_OPENAI_DELAY": str(args.llm_delay), "FAKE_OPENAI_JWKS": jwks},
+            )
+            await _wait_ready(f"{fake_url}/.well-known/jwks.json", fake)
+            app = _uvicorn(
+                "app.main:app", app_port,
+                {
+                    "OPENAI_API_KEY": "bench",
+                    "OPENAI_BASE_URL": f"{fake_url}/v1",
+                    "AUTH0_DOMAIN": AUTH0_DOMAIN,
+                    "AUTH0_AUDIENCE": AUDIENCE,
+                    "AUTH0_JWKS_URL": f"{fake_url}/.well-known/jwks.json",
+                    # Frische Caches und Queues pro Lauf
+                    "RENDER_CACHE_DIR": str(Path(scratch) / "render-cache"),
+                    "FRAGMENT_CACHE_DIR": str(Path(scratch) / "fragment-cache"),
+                    "LLM_CACHE_BACKEND": "memory",
+                    "JOB_DATA_DIR": str(Path(scratch) / "jobs"),
+                },
+                workers=args.workers,
+            )
+            await _wait_ready(f"http://127.0.0.1:{app_port}/api/health", app)
+
+            headers = {"Authorization": f"Bearer {_token(pem)}"}
+            limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+            results = []
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{app_port}", headers=headers,
+                timeout=args.timeout, limits=limits,
+            ) as client:
+                offset = 0
+                for endpoint in endpoints:
+                    # Aufwärmen: Engine-Erkennung, JWKS, Verbindungen
+                    await client.post(f"/api/{endpoint}", json=payloads.body(endpoint, -1))
+                    for level in levels:
+                        results.append(await run_level(
+                            client, endpoint, level, args.requests, payloads, offset, app.pid
+                        ))
+                        offset += args.requests
+                        print(
+                            f"{endpoint} x{level}: {results[-1]['throughput_rps']:.2f} rps, "
+                            f"p95 {results[-1]['p95_ms']:.0f} ms", file=sys.stderr,
+                        )
+        finally:
+            _stop(app)
+            _stop(fake)
+
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "concurrency": levels,
+            "requests": args.requests,
+            "llm_delay_s": args.llm_delay,
+            "distinct": args.distinct,
+            "workers": args.workers,
+            "cpu_count": os.cpu_count(),
+            "python": sys.version.split()[0],
+        },
+        "results": results,
+    }
+    print()
+    print_results(results)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        for key in ("llm_delay_s", "requests", "distinct", "workers", "cpu_count"):
+            if baseline["config"].get(key) != report["config"][key]:
+                print(f"warning: {key} differs from the baseline ({baseline['config'].get(key)})")
+        print_comparison(results, baseline)
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit}{'-dirty' if dirty else ''}-{stamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nresults written to {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+"""
+Production entry point: gunicorn with uvicorn workers.
+
+    gunicorn app.main:app -c gunicorn.conf.py
+
+Each worker is a separate process with its own event loop, compile pool, in-memory
+caches and metrics. Shared state lives on disk: templates (TEMPLATE_DIR), render
+cache (RENDER_CACHE_DIR), LaTeX formats (LATEX_FORMAT_DIR), batches (BATCH_DIR),
+jobs (JOB_DATA_DIR) and — in this mode by default — the LLM cache (SQLite).
+
+Configuration (environment):
+    WEB_CONCURRENCY   number of workers (default: CPU cores)
+    BIND              listen address (default 0.0.0.0:8000)
+    GRACEFUL_TIMEOUT  seconds a worker may drain in-flight requests on shutdown (default 30)
+"""
+import os
+
+
+def _cpu_count() -> int:
+    try:
+        # Im Container zählt das zugewiesene CPU-Set, nicht die Kerne des Hosts
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+_cores = _cpu_count()
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = max(1, int(os.getenv("WEB_CONCURRENCY", str(_cores))))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Kein preload: jeder Worker baut eigene Clients, Pools und SQLite-Verbindungen auf
+preload_app = False
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+keepalive = 5
+
+
+def on_starting(server) -> None:
+    # Kompilierslots auf die Worker verteilen, damit zusammen nicht mehr als ein
+    # TeX-Prozess pro Kern läuft (explizite Werte haben Vorrang)
+    os.environ.setdefault("LATEX_MAX_PARALLEL", str(max(1, _cores // workers)))
+    # Der In-Memory-LLM-Cache wäre pro Worker getrennt; SQLite teilen alle Worker
+    os.environ.setdefault("LLM_CACHE_BACKEND", "sqlite")
+    # Unter gunicorns graceful_timeout bleiben, sonst wird der Worker beim Drain beendet
+    os.environ.setdefault("SHUTDOWN_DRAIN_TIMEOUT", str(max(1, graceful_timeout - 5)))
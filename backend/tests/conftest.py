@@ -0,0 +1,68 @@
+import os
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+# Vor dem Import der App: alle Caches und Datenverzeichnisse in ein Wegwerf-Verzeichnis
+_tmp = tempfile.mkdtemp(prefix="cv-tests-")
+for name in ("TEMPLATE_DIR", "RENDER_CACHE_DIR", "PREVIEW_CACHE_DIR", "FRAGMENT_CACHE_DIR",
+             "LATEX_FORMAT_DIR", "BATCH_DIR", "JOB_DATA_DIR"):
+    os.environ.setdefault(name, os.path.join(_tmp, name.lower()))
+os.environ.setdefault("LLM_CACHE_BACKEND", "memory")
+
+
+class FakeCompletions:
+    """Stand-in for client.chat.completions; replies are returned in order, the last one repeats."""
+
+    def __init__(self):
+        self.replies: list[str] = ["```latex\n\\documentclass{article}\n\\begin{document}\nHi\n\\end{document}\n```"]
+        self.calls: list[dict] = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        content = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        usage = SimpleNamespace(
+            prompt_tokens=10, completion_tokens=5, total_tokens=15,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=4),
+        )
+        if kwargs.get("stream"):
+            return self._stream(content, usage, (kwargs.get("stream_options") or {}).get("include_usage"))
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    async def _stream(self, content: str, usage, include_usage: bool):
+        # Wie die API: Usage nur mit stream_options.include_usage, als letzter Chunk ohne choices
+        for i in range(0, len(content), 8):
+            delta = SimpleNamespace(content=content[i:i + 8])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        if include_usage:
+            yield SimpleNamespace(choices=[], usage=usage)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Replaces the OpenAI client with FakeCompletions and starts with an empty prompt cache."""
+    from app.services import openai_service
+    from app.services.llm_cache import MemoryLLMCache
+
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(openai_service, "_client", lambda: client)
+    monkeypatch.setattr(openai_service, "llm_cache", MemoryLLMCache(3600.0, 64))
+    return completions
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """TestClient for the app with Auth0 verification bypassed."""
+    from fastapi.testclient import TestClient
+
+    from app import main
+
+    monkeypatch.setattr(main, "AUTH0_DOMAIN", "tests.local")
+    monkeypatch.setattr(main, "AUTH0_AUDIENCE", "https://tests.local/api")
+    monkeypatch.setattr(main, "AUTH0_ISSUER", "https://tests.local/")
+    monkeypatch.setattr(main, "jwks_cache", object())
+    monkeypatch.setattr(main.token_cache, "get", lambda token: {"sub": "tests|user"})
+    return TestClient(main.app, headers={"Authorization": "Bearer test"})
@@ -0,0 +1,29 @@
+from app import main
+from app.services.batch_service import BatchJob
+
+
+def _as(client, monkeypatch, sub):
+    monkeypatch.setattr(main.token_cache, "get", lambda token: {"sub": sub})
+    return client
+
+
+def test_batch_is_only_visible_to_its_creator(client, monkeypatch):
+    async def fake_item(index, item):
+        return b"%PDF-1.5\n"
+
+    monkeypatch.setattr(main, "_generate_batch_item", fake_item)
+    created = _as(client, monkeypatch, "auth0|alice").post(
+        "/api/batch/generate-pdf", json={"items": [{"input_text": "Notizen"}], "output": "job"}
+    )
+    assert created.status_code == 200
+    batch_id = created.json()["batch_id"]
+
+    assert client.get(f"/api/batch/{batch_id}").status_code == 200
+    # Zustand auf der Platte trägt den Ersteller (andere Worker prüfen dagegen)
+    assert BatchJob.load(main.batch_store.batch_dir / batch_id).owner == "auth0|alice"
+
+    _as(client, monkeypatch, "auth0|mallory")
+    status = client.get(f"/api/batch/{batch_id}")
+    item = client.get(f"/api/batch/{batch_id}/items/0")
+    assert status.status_code == 404 and status.json()["detail"] == "Batch not found."
+    assert item.status_code == 404 and item.json()["detail"] == "Batch not found."
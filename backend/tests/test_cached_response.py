@@ -0,0 +1,37 @@
+from app import main
+from app.services.render_cache import CachedPdf, RenderCache
+
+
+LATEX = "\\documentclass{article}\n\\begin{document}\nHallo\n\\end{document}\n"
+PDF = b"%PDF-1.5\n" + b"x" * 300_000
+
+
+def test_hit_survives_eviction_between_lookup_and_send(client, monkeypatch, tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(main, "render_cache", cache)
+    monkeypatch.setattr(main, "select_engine", lambda analysis: "pdflatex")
+    key = main._render_key(LATEX.strip(), "full", "pdflatex")
+    source = tmp_path / "cv.pdf"
+    source.write_bytes(PDF)
+    cache.put(key, source)
+
+    build = main._pdf_response
+
+    def build_then_evict(entry, *args, **kwargs):
+        response = build(entry, *args, **kwargs)
+        # Anderer Worker räumt den Eintrag, nachdem die Antwort gebaut, aber bevor sie gesendet ist
+        entry.path.unlink()
+        return response
+
+    monkeypatch.setattr(main, "_pdf_response", build_then_evict)
+    response = client.post("/api/render", json={"latex": LATEX})
+
+    assert response.status_code == 200
+    assert response.headers["X-Render-Cache"] == "HIT"
+    assert response.headers["Content-Length"] == str(len(PDF))
+    assert response.content == PDF
+
+
+def test_evicted_entry_is_treated_as_miss():
+    entry = CachedPdf("k", path=main.Path("/nonexistent/cv.pdf"))
+    assert entry.pin() is False
@@ -0,0 +1,71 @@
+from pathlib import Path
+
+import pytest
+
+from app.main import CVData
+from app.services.cv_render import LayoutError, escape_latex, render_cv
+from app.services.latex_patch import validate_latex
+
+
+TEMPLATES = Path(__file__).resolve().parents[1] / "app" / "templates"
+PREAMBLE = "\\documentclass{article}\n\\usepackage{hyperref}\n"
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("R&D", "R\\&D"),
+        ("100% remote", "100\\% remote"),
+        ("C# und F#", "C\\# und F\\#"),
+        ("$5 {x}", "\\$5 \\{x\\}"),
+        ("snake_case", "snake\\_case"),
+        ("~/bin ^2", "\\textasciitilde{}/bin \\textasciicircum{}2"),
+        # Backslash zuerst ersetzt, ohne die eingefügten Klammern erneut zu escapen
+        ("a\\b", "a\\textbackslash{}b"),
+        ("Müller – Köln", "Müller – Köln"),
+    ],
+)
+def test_escape_latex(text, expected):
+    assert escape_latex(text) == expected
+
+
+def test_values_are_escaped_unless_marked_latex():
+    layout = "\\VAR{name}\n\\VAR{headline|latex}\n\\VAR{missing.deep}\n"
+    latex = render_cv({"name": "Anna & Co_KG", "headline": "\\textit{Dev}"}, PREAMBLE + "\\begin{document}\n\\end{document}\n", layout)
+    assert latex.startswith(PREAMBLE + "\\begin{document}\n")
+    assert "Anna \\& Co\\_KG" in latex
+    assert "\\textit{Dev}" in latex
+    assert latex.endswith("\\end{document}\n")
+
+
+def test_url_filter_adds_scheme_and_escapes():
+    layout = "\\href{\\VAR{u|url}}{\\VAR{u|display_url}}"
+    latex = render_cv({"u": "www.example.org/a%20b#top"}, PREAMBLE + "\\begin{document}", layout)
+    assert "\\href{https://www.example.org/a\\%20b\\#top}{example.org/a\\%20b\\#top}" in latex
+
+
+def test_invalid_layout_and_template_raise():
+    with pytest.raises(LayoutError, match="Invalid layout"):
+        render_cv({}, PREAMBLE + "\\begin{document}", "\\BLOCK{if name}")
+    with pytest.raises(LayoutError, match="no \\\\begin"):
+        render_cv({}, PREAMBLE, "x")
+
+
+def test_packaged_layout_renders_valid_document():
+    data = CVData(
+        name="Max Müller",
+        headline="Data & ML",
+        contact={"email": "max@example.org", "linkedin": "linkedin.com/in/max_m"},
+        experience=[{"title": "Dev", "organization": "ACME", "start": "2020", "end": "heute",
+                     "highlights": ["50% schneller", "C# & SQL"]}],
+        skills=[{"category": "Sprachen", "skills": ["Python", "C++"]}],
+    ).model_dump()
+    latex = render_cv(
+        data,
+        (TEMPLATES / "cv_template.tex").read_text(encoding="utf-8"),
+        (TEMPLATES / "cv_template.tex.j2").read_text(encoding="utf-8"),
+    )
+    validate_latex(latex)
+    assert "Max Müller" in latex and "Data \\& ML" in latex
+    assert "50\\% schneller" in latex and "C\\# \\& SQL" in latex
+    assert "mailto:max@example.org" in latex
@@ -0,0 +1,50 @@
+from app.services.latex_source import analyze_source
+
+DOC = "\\documentclass{article}\n\\begin{document}\nHallo\n\\end{document}"
+FENCED_REPLY = f"Checkliste:\n- Abschnitt ergänzt\n\n```latex\n{DOC}\n```\nFertig."
+
+
+def test_analyze_source_strips_fence_and_leading_text():
+    analysis = analyze_source(FENCED_REPLY)
+    assert analysis.fenced
+    assert analysis.latex == DOC
+    assert analysis.document_class == "article"
+    assert not analysis.needs_xelatex
+
+
+def test_analyze_source_without_fence_starts_at_documentclass():
+    analysis = analyze_source(f"Hier ist der Lebenslauf:\n{DOC}")
+    assert not analysis.fenced
+    assert analysis.latex == DOC
+
+
+def test_analyze_source_detects_xelatex_packages():
+    source = "\\documentclass[11pt]{article}\n\\usepackage{fontspec}\n\\begin{document}x\\end{document}"
+    analysis = analyze_source(source)
+    assert analysis.needs_xelatex
+    assert analysis.class_options == "11pt"
+
+
+def test_edit_full_mode_strips_fences(client, llm):
+    llm.replies = [FENCED_REPLY]
+    r = client.post("/api/edit", json={"latex": DOC, "instruction": "Ergänze Rust."})
+    assert r.status_code == 200
+    assert r.json()["latex"] == DOC
+    assert r.json()["report"]["mode"] == "full"
+
+
+def test_edit_patch_fallback_strips_fences(client, llm):
+    # Unbrauchbare Patch-Antwort -> Vollmodus, dessen Antwort ebenfalls extrahiert wird
+    llm.replies = ["kein JSON", FENCED_REPLY]
+    r = client.post("/api/edit", json={"latex": DOC, "instruction": "Ergänze Rust.", "mode": "patch"})
+    assert r.status_code == 200
+    assert r.json()["latex"] == DOC
+    assert r.json()["report"]["mode"] == "full"
+    assert r.json()["report"]["fallback"]
+
+
+def test_generate_strips_fences(client, llm):
+    llm.replies = [FENCED_REPLY]
+    r = client.post("/api/generate", json={"input_text": "Max Mustermann, Backend-Entwickler"})
+    assert r.status_code == 200
+    assert r.json()["latex"] == DOC
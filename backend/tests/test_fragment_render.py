@@ -0,0 +1,129 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app import main
+from app.services import fragment_render
+from app.services.fragment_render import (
+    FragmentRenderer,
+    FragmentRenderUnsupported,
+    _assembly_source,
+    _fragment_source,
+    check_eligible,
+    fragment_key,
+)
+from app.services.latex_service import CompileResult
+from app.services.render_cache import CachedPdf, RenderCache
+
+
+PREAMBLE = "\\documentclass{article}\n\\pagestyle{plain}\n"
+
+
+def _doc(*sections: str, preamble: str = PREAMBLE) -> str:
+    body = "".join(f"\\section{{{title}}}\nText zu {title}\n" for title in sections)
+    return preamble + "\\begin{document}\nKopf\n" + body + "\\end{document}\n"
+
+
+@pytest.fixture
+def compiled(monkeypatch, tmp_path):
+    """Replaces compile_latex with a stub that writes a dummy PDF and records each source."""
+    sources: list[str] = []
+
+    async def fake_compile_latex(source, engine="pdflatex", timeout=None):
+        sources.append(source)
+        pdf = tmp_path / f"out-{len(sources)}.pdf"
+        pdf.write_bytes(b"%PDF-1.5\n" + str(len(sources)).encode())
+        return CompileResult(str(pdf), engine, [0.01])
+
+    monkeypatch.setattr(fragment_render, "compile_latex", fake_compile_latex)
+    return sources
+
+
+def test_check_eligible_splits_header_and_sections():
+    preamble, segments = check_eligible(_doc("Erfahrung", "Ausbildung"), "pdflatex")
+    assert preamble == PREAMBLE
+    assert [key for key, _ in segments] == ["header", "Erfahrung", "Ausbildung"]
+
+
+@pytest.mark.parametrize(
+    "latex, engine",
+    [
+        (_doc("A", "B"), "xelatex"),
+        (_doc("A", "B", preamble="\\documentclass{moderncv}\n"), "pdflatex"),
+        (_doc(), "pdflatex"),
+        (_doc("A", "B").replace("Text zu B", "siehe \\ref{x}"), "pdflatex"),
+        (_doc("A", "B").replace("Text zu B", "\\newpage"), "pdflatex"),
+    ],
+)
+def test_unpredictable_documents_are_rejected(latex, engine):
+    with pytest.raises(FragmentRenderUnsupported):
+        check_eligible(latex, engine)
+
+
+def test_only_the_edited_section_is_recompiled(compiled, tmp_path):
+    renderer = FragmentRenderer(RenderCache(tmp_path / "fragments", max_bytes=10_000))
+    _, info = asyncio.run(renderer.render(_doc("Erfahrung", "Ausbildung"), "pdflatex"))
+    assert info["fragments"] == 3 and info["fragments_reused"] == 0
+    # Drei Fragmente und die Montage
+    assert len(compiled) == 4
+
+    edited = _doc("Erfahrung", "Ausbildung").replace("Text zu Ausbildung", "Neuer Text")
+    result, info = asyncio.run(renderer.render(edited, "pdflatex"))
+    assert info["fragments_reused"] == 2
+    assert len(compiled) == 6
+    assert "Neuer Text" in compiled[4]
+    assert compiled[5].count("\\includegraphics") == 3
+    assert Path(result.pdf_path).exists()
+    assert renderer.stats()["fragments_compiled"] == 4
+
+
+def test_disabled_cache_falls_back(compiled, tmp_path):
+    renderer = FragmentRenderer(RenderCache(tmp_path / "off", max_bytes=0))
+    with pytest.raises(FragmentRenderUnsupported):
+        asyncio.run(renderer.render(_doc("A", "B"), "pdflatex"))
+    assert compiled == []
+
+
+
+def test_assembly_keeps_page_style():
+    source = _assembly_source(PREAMBLE, [Path("/c/a.pdf"), Path("/c/b.pdf")])
+    assert "\\pagestyle{empty}" not in source
+    assert source.index("a.pdf") < source.index("b.pdf")
+    # Kein fester Abstand: er kommt aus den Fragmenten selbst
+    assert "\\vskip" not in source
+
+
+def test_following_fragments_keep_the_preamble_section_spacing():
+    preamble = PREAMBLE + "\\usepackage{titlesec}\n\\titlespacing*{\\section}{0pt}{20pt}{6pt}\n"
+    segment = "\\section{Erfahrung}\nText\n"
+    lead = _fragment_source(preamble, segment, lead=True)
+    first = _fragment_source(preamble, segment)
+    # Kasten vor \section, damit TeX den Abstand am Seitenanfang nicht verwirft
+    assert "\\begin{preview}\n\\null\n\\section{Erfahrung}" in lead
+    assert "\\null" not in first
+    assert "\\titlespacing*{\\section}{0pt}{20pt}{6pt}" in lead
+    assert fragment_key("pdflatex", preamble, segment, True) != fragment_key("pdflatex", preamble, segment)
+
+
+def test_incremental_cache_key_differs_from_full_build():
+    latex = PREAMBLE + "\\begin{document}\n\\section{A}\nx\n\\end{document}\n"
+    assert main._render_key(latex, "incremental", "pdflatex") != main._render_key(latex, "full", "pdflatex")
+
+
+def test_incremental_response_is_labelled_preview(client, monkeypatch):
+    async def fake_compile_cached(latex, mode="full", engine=None):
+        return CachedPdf("k", data=b"%PDF-1.5\n"), "HIT", {}
+
+    monkeypatch.setattr(main, "compile_cached", fake_compile_cached)
+    monkeypatch.setattr(main, "select_engine", lambda analysis: "pdflatex")
+    latex = PREAMBLE + "\\begin{document}\nx\n\\end{document}\n"
+
+    preview = client.post("/api/render", json={"latex": latex, "mode": "incremental"})
+    full = client.post("/api/render", json={"latex": latex})
+
+    assert preview.status_code == 200, preview.text
+    assert preview.headers["X-Render-Preview"] == "1"
+    assert 'filename="cv-preview.pdf"' in preview.headers["Content-Disposition"]
+    assert "X-Render-Preview" not in full.headers
+    assert 'filename="cv.pdf"' in full.headers["Content-Disposition"]
@@ -0,0 +1,39 @@
+import asyncio
+
+from app.services import latex_service
+
+
+def _source(i: int) -> str:
+    return f"\\documentclass{{article}}\n% Präambel {i}\n\\begin{{document}}\nText\n\\end{{document}}\n"
+
+
+def test_preamble_bookkeeping_is_bounded(monkeypatch, tmp_path):
+    monkeypatch.setattr(latex_service, "FORMAT_DIR", tmp_path)
+    monkeypatch.setattr(latex_service, "FORMAT_TRACK_MAX", 8)
+    monkeypatch.setattr(latex_service, "FORMAT_MIN_SEEN", 2)
+    monkeypatch.setattr(latex_service, "_preamble_seen", latex_service.OrderedDict())
+
+    for i in range(50):
+        assert asyncio.run(latex_service._ensure_format(_source(i), "pdflatex", 5)) is None
+
+    assert len(latex_service._preamble_seen) == 8
+    # Die zuletzt gesehenen Präambeln bleiben erhalten
+    last = latex_service.preamble_hash(latex_service.split_preamble(_source(49))[0], "pdflatex")
+    assert last in latex_service._preamble_seen
+
+
+def test_failed_build_drops_counter_and_lock(monkeypatch, tmp_path):
+    monkeypatch.setattr(latex_service, "FORMAT_DIR", tmp_path)
+    monkeypatch.setattr(latex_service, "FORMAT_TRACK_MAX", 4)
+    monkeypatch.setattr(latex_service, "FORMAT_MIN_SEEN", 1)
+    monkeypatch.setattr(latex_service, "_preamble_seen", latex_service.OrderedDict())
+    monkeypatch.setattr(latex_service, "_format_failed", latex_service.OrderedDict())
+    monkeypatch.setattr(latex_service, "_format_locks", {})
+
+    for i in range(10):
+        # Engine fehlt -> Build scheitert und wird als fehlgeschlagen vermerkt
+        assert asyncio.run(latex_service._ensure_format(_source(i), "no-such-engine", 5)) is None
+
+    assert latex_service._format_locks == {}
+    assert latex_service._preamble_seen == {}
+    assert len(latex_service._format_failed) == 4
@@ -0,0 +1,81 @@
+import pytest
+
+from app.services.latex_patch import PatchError, apply_section_patch, split_sections, validate_latex
+
+
+DOC = (
+    "\\documentclass{article}\n"
+    "\\begin{document}\n"
+    "\\textbf{Max Mustermann}\n\n"
+    "\\section{Erfahrung}\n"
+    "Entwickler bei ACME.\n\n"
+    "\\section*{Ausbildung \\& {Studium}}\n"
+    "B.Sc. Informatik.\n\n"
+    "\\end{document}\n"
+)
+
+
+def test_split_sections_keys_header_and_titles():
+    head, segments, tail = split_sections(DOC)
+    assert head.endswith("\\begin{document}")
+    assert [key for key, _ in segments] == ["header", "Erfahrung", "Ausbildung \\& {Studium}"]
+    assert tail == "\\end{document}\n"
+    assert head + "".join(text for _, text in segments) + tail == DOC
+
+
+def test_replaces_only_the_named_section():
+    patched = apply_section_patch(
+        DOC, [{"section": "Erfahrung", "content": "\\section{Erfahrung}\nTeamleiter bei ACME."}]
+    )
+    assert "Teamleiter bei ACME." in patched
+    assert "Entwickler bei ACME." not in patched
+    assert "B.Sc. Informatik." in patched and "Max Mustermann" in patched
+    validate_latex(patched)
+
+
+def test_titles_match_case_and_whitespace_insensitively():
+    patched = apply_section_patch(
+        DOC, [{"section": "  ausbildung   \\& {studium} ", "content": "\\section{Ausbildung}\nM.Sc."}]
+    )
+    assert "M.Sc." in patched and "B.Sc." not in patched
+
+
+def test_header_replacement_and_section_removal():
+    patched = apply_section_patch(
+        DOC,
+        [
+            {"section": "header", "content": "\\textbf{Erika Mustermann}"},
+            {"section": "Erfahrung", "content": ""},
+        ],
+    )
+    assert "Erika Mustermann" in patched and "Max Mustermann" not in patched
+    assert "\\section{Erfahrung}" not in patched
+    validate_latex(patched)
+
+
+@pytest.mark.parametrize(
+    "replacements, message",
+    [
+        ([], "no replacements"),
+        ([{"section": "Hobbys", "content": "x"}], "Unknown section"),
+        ([{"content": "x"}], "Malformed"),
+        (["Erfahrung"], "Malformed"),
+    ],
+)
+def test_invalid_patches_raise(replacements, message):
+    with pytest.raises(PatchError, match=message):
+        apply_section_patch(DOC, replacements)
+
+
+def test_document_without_body_raises():
+    with pytest.raises(PatchError):
+        apply_section_patch("\\section{A}", [{"section": "A", "content": ""}])
+
+
+def test_validate_rejects_broken_structure():
+    with pytest.raises(PatchError, match="braces"):
+        validate_latex(DOC.replace("Entwickler", "{Entwickler"))
+    with pytest.raises(PatchError, match="environment"):
+        validate_latex(DOC.replace("B.Sc.", "\\begin{itemize} B.Sc."))
+    # Escapte Klammern und Kommentare zählen nicht
+    validate_latex(DOC.replace("B.Sc.", "\\{ 50\\% % }"))
@@ -0,0 +1,38 @@
+import pytest
+
+from app.services.latex_service import _needs_rerun
+
+
+def _write_log(tmp_path, text):
+    (tmp_path / "cv.log").write_text(text, encoding="utf-8")
+
+
+@pytest.mark.parametrize(
+    "log",
+    [
+        "LaTeX Warning: Label(s) may have changed. Rerun to get cross-references right.",
+        "LaTeX Warning: There were undefined references.\nRerun to get citations right.",
+        "Package hyperref Warning: Rerun to get /PageLabels entry right.",
+        # rerunfilecheck mit umbrochenen Logzeilen (hyperref-Lesezeichen)
+        "Package rerunfilecheck Warning: File `cv.out' has changed.\n"
+        "(rerunfilecheck)                Rerun to get outlines right\n"
+        "(rerunfilecheck)                or use package `bookmark'.",
+        "Package longtable Warning: Table widths have changed. Rerun LaTeX.",
+    ],
+)
+def test_rerun_warnings_trigger_another_pass(tmp_path, log):
+    _write_log(tmp_path, log)
+    assert _needs_rerun(tmp_path, "cv.tex", r"\documentclass{article}", 1)
+
+
+def test_rerunfilecheck_info_does_not_trigger_pass(tmp_path):
+    _write_log(
+        tmp_path,
+        "Package rerunfilecheck Info: File `cv.out' has not changed.\n"
+        "(rerunfilecheck)             Checksum: 0123456789ABCDEF;42.",
+    )
+    assert not _needs_rerun(tmp_path, "cv.tex", r"\documentclass{article}", 1)
+
+
+def test_missing_log_needs_no_rerun(tmp_path):
+    assert not _needs_rerun(tmp_path, "cv.tex", r"\documentclass{article}", 1)
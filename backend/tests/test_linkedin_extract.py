@@ -0,0 +1,94 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.services.linkedin_extract import ProfileTextExtractor, extract_profile_text
+
+
+FIXTURES = Path(__file__).resolve().parents[1] / "benchmarks" / "fixtures"
+
+PAGE = """<!doctype html><html><head>
+<title>Erika Muster | LinkedIn</title>
+<meta property="og:description" content="Data   Engineer bei ACME">
+<meta name="viewport" content="width=device-width">
+<style>.x { color: red }</style>
+<script>var tracking = "Geheim";</script>
+<script type="application/ld+json">
+{"@context": "https://schema.org", "@graph": [
+  {"@type": "WebPage", "name": "Seite"},
+  {"@type": "Person", "name": "Erika Muster", "image": "x.png", "jobTitle": "Data Engineer",
+   "alumniOf": [{"@type": "Organization", "name": "TU Berlin", "url": "https://tu.berlin"}]}
+]}
+</script>
+</head><body>
+<nav>Startseite Jobs</nav>
+<main>
+<h1>Erika   Muster</h1>
+<section><h2>Erfahrung</h2>
+<ul><li>Data Engineer &amp; Teamlead, ACME</li><li>Analystin, Beta GmbH</li></ul>
+</section>
+<div style="display: none">Versteckt</div>
+<div aria-hidden="true">Auch versteckt</div>
+<p>Python</p><p>Python</p>
+<p>Offenes <b>Tag <i>ohne Ende</p>
+</main>
+<footer>Impressum</footer>
+</body></html>"""
+
+
+def test_extracts_title_meta_jsonld_and_visible_text():
+    text = extract_profile_text(PAGE)
+    assert "Title: Erika Muster | LinkedIn" in text
+    assert "og:description: Data Engineer bei ACME" in text
+    assert "viewport" not in text
+    assert "## Erika Muster" in text and "## Erfahrung" in text
+    assert "- Data Engineer & Teamlead, ACME" in text
+    assert "Offenes Tag ohne Ende" in text
+    # Wiederholte Zeilen nur einmal
+    assert text.count("\nPython") == 1
+    for noise in ("color: red", "Geheim", "Startseite", "Versteckt", "Impressum"):
+        assert noise not in text
+
+
+def test_jsonld_is_pruned_to_profile_entities():
+    extractor = ProfileTextExtractor()
+    extractor.feed(PAGE)
+    extractor.finish()
+    assert extractor.jsonld == [
+        {"@type": "Person", "name": "Erika Muster", "jobTitle": "Data Engineer",
+         "alumniOf": [{"@type": "Organization", "name": "TU Berlin"}]}
+    ]
+
+
+@pytest.mark.parametrize("size", [1, 17, 256])
+def test_chunked_feed_matches_single_feed(size):
+    extractor = ProfileTextExtractor()
+    for i in range(0, len(PAGE), size):
+        extractor.feed(PAGE[i:i + size])
+    assert extractor.finish() == extract_profile_text(PAGE)
+
+
+def test_output_is_capped_at_max_chars():
+    html = "<body>" + "".join(f"<p>Zeile {i} mit etwas Text</p>" for i in range(1000)) + "</body>"
+    extractor = ProfileTextExtractor(max_chars=500)
+    extractor.feed(html)
+    text = extractor.finish()
+    assert extractor.truncated
+    assert len(text) <= 500 + len("Page text:\n")
+
+
+def test_invalid_jsonld_is_ignored():
+    text = extract_profile_text('<script type="application/ld+json">{kaputt</script><p>Text</p>')
+    assert text == "Page text:\nText"
+
+
+@pytest.mark.parametrize("name", sorted(p.name for p in FIXTURES.glob("*.html")))
+def test_saved_pages_shrink_and_keep_content(name):
+    html = (FIXTURES / name).read_text(encoding="utf-8")
+    text = extract_profile_text(html)
+    assert text and len(text) < len(html) / 2
+    assert "<script" not in text and "<div" not in text
+    for line in text.split("\n"):
+        if line.startswith("{"):
+            json.loads(line)
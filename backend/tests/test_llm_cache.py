@@ -0,0 +1,33 @@
+import asyncio
+
+from app.services import openai_service
+from app.services.llm_cache import prompt_cache_key
+
+
+MESSAGES = [{"role": "system", "content": "System"}, {"role": "user", "content": "Notizen"}]
+
+
+def test_cache_key_includes_request_parameters():
+    plain = prompt_cache_key("m", MESSAGES)
+    assert plain == prompt_cache_key("m", MESSAGES, {})
+    assert plain != prompt_cache_key("m", MESSAGES, {"response_format": {"type": "json_object"}})
+    assert prompt_cache_key("m", MESSAGES, {"temperature": 0}) != prompt_cache_key("m", MESSAGES, {"temperature": 1})
+
+
+def test_free_text_reply_is_not_served_to_json_request(llm):
+    llm.replies = ["Freitext", '{"replacements": []}']
+
+    text, _ = asyncio.run(openai_service._complete_with_usage(MESSAGES, "edit"))
+    raw, usage = asyncio.run(
+        openai_service._complete_with_usage(MESSAGES, "edit_patch", response_format={"type": "json_object"})
+    )
+
+    assert text == "Freitext"
+    assert raw == '{"replacements": []}'
+    assert usage["cache_hit"] is False
+    assert len(llm.calls) == 2
+    # Gleiche Parameter dürfen weiter aus dem Cache kommen
+    again, usage = asyncio.run(
+        openai_service._complete_with_usage(MESSAGES, "edit_patch", response_format={"type": "json_object"})
+    )
+    assert again == raw and usage["cache_hit"] is True
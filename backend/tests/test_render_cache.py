@@ -0,0 +1,80 @@
+import os
+from pathlib import Path
+
+from app.services.render_cache import RenderCache, render_cache_key
+
+
+def _pdf(tmp_path: Path, name: str, size: int = 100) -> Path:
+    path = tmp_path / f"{name}.src"
+    path.write_bytes(b"%" + name.encode() * (size - 1))
+    return path
+
+
+def _put(cache: RenderCache, tmp_path: Path, key: str, mtime: float, size: int = 100):
+    entry = cache.put(key, _pdf(tmp_path, key, size))
+    # Reihenfolge im LRU über die mtime festlegen (Dateisystemzeit ist zu grob)
+    os.utime(cache._path_for(key), (mtime, mtime))
+    return entry
+
+
+def test_cache_key_ignores_line_endings_and_trailing_whitespace():
+    a = render_cache_key("\\section{A}  \r\nText\r\n", "pdflatex")
+    assert a == render_cache_key("\\section{A}\nText", "pdflatex")
+    assert a != render_cache_key("\\section{A}\nText", "xelatex")
+
+
+def test_put_moves_file_and_get_returns_it(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=1000)
+    source = _pdf(tmp_path, "a")
+    entry = cache.put("a", source)
+    assert not source.exists()
+    assert entry.path == cache._path_for("a") and entry.size == 100
+    assert cache.get("a").path == entry.path
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=300)
+    for i, key in enumerate("abc"):
+        _put(cache, tmp_path, key, 1000 + i)
+    # Treffer frischt a auf; b und c sind jetzt die ältesten
+    assert cache.get("a") is not None
+    _put(cache, tmp_path, "d", 5000)
+
+    # Auf 90 % des Limits geräumt: b und c fallen heraus
+    assert cache.get("b") is None and cache.get("c") is None
+    assert cache.get("a") is not None and cache.get("d") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 2 and stats["disk_bytes"] == 200
+
+
+def test_oversized_or_disabled_cache_leaves_file_with_caller(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=50)
+    source = _pdf(tmp_path, "big")
+    assert cache.put("big", source) is None and source.exists()
+    disabled = RenderCache(tmp_path / "off", max_bytes=0)
+    assert disabled.put("x", source) is None and disabled.get("x") is None
+    assert not (tmp_path / "off").exists()
+
+
+def test_small_entries_are_served_from_memory_with_bounded_size(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=10_000, memory_max_bytes=250, memory_item_max_bytes=100)
+    for key in "abc":
+        assert cache.put(key, _pdf(tmp_path, key)).data is not None
+    assert cache.put("big", _pdf(tmp_path, "big", 200)).data is None
+    stats = cache.stats()
+    assert stats["memory_entries"] == 2 and stats["memory_bytes"] == 200
+    # a ist aus dem Speicher verdrängt, liegt aber noch auf der Platte
+    assert cache.get("a").path is not None
+    assert cache.get("c").data is not None
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_entries_are_shared_between_instances(tmp_path):
+    first = RenderCache(tmp_path / "cache", max_bytes=1000)
+    second = RenderCache(tmp_path / "cache", max_bytes=1000)
+    first.put("a", _pdf(tmp_path, "a"))
+    assert second.get("a") is not None
+    # Neuer Prozess übernimmt den Bestand beim Start
+    assert RenderCache(tmp_path / "cache", max_bytes=1000).stats()["disk_entries"] == 1
@@ -0,0 +1,51 @@
+import pytest
+
+from app.services.openai_service import LatexStreamExtractor, _extract_latex
+
+
+LATEX = "\\documentclass{article}\n\\begin{document}\nHallo `Welt`\n\\end{document}"
+CHECKLIST = "- Struktur prüfen\n- Daten übernehmen\n\n"
+
+
+def _run(text: str, size: int) -> tuple[str, list[str]]:
+    extractor = LatexStreamExtractor()
+    pieces = [extractor.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    pieces.append(extractor.finish())
+    return "".join(pieces), pieces
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+@pytest.mark.parametrize(
+    "reply",
+    [
+        CHECKLIST + "```latex\n" + LATEX + "\n```\nViel Erfolg!",
+        CHECKLIST + "```\n" + LATEX + "\n```",
+        CHECKLIST + LATEX,
+        LATEX,
+    ],
+)
+def test_stream_output_matches_batch_extraction(reply, size):
+    out, _ = _run(reply, size)
+    assert out.strip() == _extract_latex(reply) == LATEX
+
+
+def test_checklist_is_held_back_and_latex_streams_early():
+    extractor = LatexStreamExtractor()
+    assert extractor.feed(CHECKLIST) == ""
+    assert not extractor.emitted
+    first = extractor.feed("```latex\n\\documentclass{article}\n")
+    assert first.startswith("\\documentclass")
+    assert extractor.emitted
+
+
+def test_nothing_after_closing_fence():
+    extractor = LatexStreamExtractor()
+    extractor.feed("```latex\n" + LATEX + "\n```")
+    assert extractor.feed("\nWeitere Hinweise") == ""
+    assert extractor.finish() == ""
+
+
+def test_reply_without_markers_falls_back_on_finish():
+    extractor = LatexStreamExtractor()
+    assert extractor.feed("Keine LaTeX-Ausgabe") == ""
+    assert extractor.finish() == _extract_latex("Keine LaTeX-Ausgabe")
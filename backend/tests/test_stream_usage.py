@@ -0,0 +1,24 @@
+import asyncio
+
+from app.services import openai_service
+from app.services.openai_service import PromptUsageTotals
+
+
+async def _collect(stream):
+    return "".join([part async for part in stream])
+
+
+def test_streamed_completion_records_usage(llm, monkeypatch):
+    totals = PromptUsageTotals()
+    monkeypatch.setattr(openai_service, "usage_totals", totals)
+    llm.replies = ["\\documentclass{article}\n\\begin{document}\nHi\n\\end{document}"]
+
+    text = asyncio.run(_collect(openai_service.stream_generate_latex_via_openai("Notizen")))
+
+    assert text == llm.replies[0]
+    assert llm.calls[0]["stream_options"] == {"include_usage": True}
+    stats = totals.stats()
+    assert stats["calls"] == 1 and stats["prompt_tokens"] == 10 and stats["cached_tokens"] == 4
+    # Zweiter Aufruf kommt aus dem Cache, ohne erneut zu zählen
+    assert asyncio.run(_collect(openai_service.stream_generate_latex_via_openai("Notizen"))) == text
+    assert len(llm.calls) == 1 and totals.stats()["calls"] == 1
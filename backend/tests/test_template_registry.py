@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from app.services.template_registry import TemplateRegistry
+
+
+PACKAGED = Path(__file__).resolve().parents[1] / "app" / "templates"
+
+
+def test_custom_copy_without_layout_keeps_packaged_layout(tmp_path):
+    # Wie im Image: TEMPLATE_DIR enthält eine Kopie von cv_template.tex ohne .tex.j2
+    (tmp_path / "cv_template.tex").write_text(
+        (PACKAGED / "cv_template.tex").read_text(encoding="utf-8"), encoding="utf-8"
+    )
+    registry = TemplateRegistry(template_dir=tmp_path, packaged_dir=PACKAGED)
+
+    (entry,) = [t for t in registry.list() if t["id"] == "cv_template"]
+    assert entry["source"] == "custom" and entry["structured"] is True
+    source, layout = registry.layout("cv_template")
+    assert source == (tmp_path / "cv_template.tex").read_text(encoding="utf-8")
+    assert layout == (PACKAGED / "cv_template.tex.j2").read_text(encoding="utf-8")
+
+
+def test_layout_survives_template_update(tmp_path):
+    registry = TemplateRegistry(template_dir=tmp_path, packaged_dir=PACKAGED)
+    registry.write("cv_template", "\\documentclass{article}\n\\begin{document}\n\\end{document}\n")
+    source, layout = registry.layout("cv_template")
+    assert source.startswith("\\documentclass{article}")
+    assert "\\VAR{name}" in layout
+
+
+def test_custom_layout_wins(tmp_path):
+    (tmp_path / "cv_template.tex").write_text("\\documentclass{article}\n", encoding="utf-8")
+    (tmp_path / "cv_template.tex.j2").write_text("\\VAR{name}", encoding="utf-8")
+    registry = TemplateRegistry(template_dir=tmp_path, packaged_dir=PACKAGED)
+    assert registry.layout("cv_template")[1] == "\\VAR{name}"
@@ -0,0 +1,31 @@
+from app.services import openai_service, tokens
+
+
+def test_encoder_is_loaded_lazily(monkeypatch):
+    loads = []
+
+    def fake_loader():
+        loads.append(1)
+        return (lambda text: len(text.split()), "fake")
+
+    monkeypatch.setattr(tokens, "_counter", None)
+    monkeypatch.setattr(tokens, "_load_counter", fake_loader)
+    assert loads == []
+    assert tokens.count_tokens("eins zwei drei") == 3
+    assert tokens.tokenizer_name() == "fake"
+    assert loads == [1]
+
+
+def test_budget_check_caches_only_stable_prefix(monkeypatch):
+    monkeypatch.setattr(tokens, "_counter", (lambda text: len(text), "fake"))
+    tokens.count_stable_tokens.cache_clear()
+    notes = "Max Mustermann, Musterstraße 1, 12345 Musterstadt"
+    messages = openai_service._generate_messages(notes, r"\documentclass{article}")
+
+    total = openai_service._check_budget(messages)
+
+    assert total == sum(len(m["content"]) + tokens.MESSAGE_OVERHEAD_TOKENS for m in messages)
+    # System-Prompt und Vorlage im Cache, die Notizen nicht
+    assert tokens.count_stable_tokens.cache_info().currsize == 2
+    openai_service._check_budget(messages)
+    assert tokens.count_stable_tokens.cache_info().hits == 2
@@ -22,22 +22,37 @@ api.interceptors.request.use(async (config) => {
 
 export const getTemplate = () => api.get('/template').then(r => r.data)
 export const updateTemplate = (template) => api.put('/template', { template }).then(r => r.data)
-export const generateLatex = (inputText, templateId = null, templateOverride = null) => api.post('/generate', {
+export const generateLatex = (inputText, templateId = null, templateOverride = null, mode = 'latex') => api.post('/generate', {
   input_text: inputText,
+  mode,
   ...(templateId ? { template_id: templateId } : {}),
   ...(templateOverride ? { template_override: templateOverride } : {}),
 }).then(r => r.data)
-export const renderPdf = (latex) => api.post('/render', { latex }, { responseType: 'blob' })
+// Structured mode returns `data` next to `latex`; switching templates then needs no LLM call
+export const applyTemplate = (data, templateId = null) => api.post('/template/apply', {
+  data,
+  ...(templateId ? { template_id: templateId } : {}),
+}).then(r => r.data)
+export const renderPdf = (latex, mode = 'full') => api.post('/render', { latex, mode }, { responseType: 'blob' })
+// PNG/WebP of page 1; pass the previous ETag so an unchanged document costs a 304 (status 304, no blob)
+export const renderPreview = (latex, { dpi = null, format = 'png', etag = null } = {}) => api.post('/render/preview', {
+  latex,
+  format,
+  ...(dpi ? { dpi } : {}),
+}, {
+  responseType: 'blob',
+  headers: etag ? { 'If-None-Match': etag } : {},
+  validateStatus: (status) => status === 200 || status === 304,
+}).then(r => ({ status: r.status, etag: r.headers.etag || etag, blob: r.status === 200 ? r.data : null }))
 export const generatePdf = (inputText, templateId = null) => api.post('/generate-pdf', {
   input_text: inputText,
   ...(templateId ? { template_id: templateId } : {}),
 }, { responseType: 'blob' })
-export const editLatex = (latex, instruction) => api.post('/edit', { latex, instruction }).then(r => r.data)
+export const editLatex = (latex, instruction, mode = 'full') => api.post('/edit', { latex, instruction, mode }).then(r => r.data)
 export const importFromLinkedIn = (url, templateId = null, templateOverride = null) => api.post('/import/linkedin', {
   url,
   ...(templateId ? { template_id: templateId } : {}),
   ...(templateOverride ? { template_override: templateOverride } : {}),
 }).then(r => r.data)
-// Note: structured generation removed; always generate full LaTeX
 
 export default api